@@ -0,0 +1,72 @@
+"""
+Cold start benchmark for StewardServer.
+
+Each run starts a fresh interpreter, imports steward.server and constructs a StewardServer
+(no broker needed), then reads back the boot profile.  Exits with status 1 when the median
+cold start is over budget, so it can gate CI.
+
+    python benchmarks/bench_boot.py [-n 5] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from steward.profiler import boot_profiler
+with boot_profiler.phase("import steward.server"):
+    from steward.server import StewardServer
+StewardServer()
+report = boot_profiler.report()
+report["cold_start_ms"] = (time.perf_counter() - start) * 1000
+print(json.dumps(report))
+"""
+
+
+def cold_start(work_dir):
+    env = dict(os.environ, PYTHONPATH=ROOT, STEWARD_BOOT_PROFILE="1")
+    result = subprocess.run([sys.executable, "-c", CHILD],
+                            cwd=work_dir, env=env, capture_output=True, text=True, check=True)
+    # plugins print while loading, the report is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=5, help="number of cold starts")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv('STEWARD_BOOT_BUDGET_MS', 1500)),
+                        help="fail when the median cold start takes longer than this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = [cold_start(work_dir) for _ in range(args.n)]
+
+    times = sorted(report["cold_start_ms"] for report in reports)
+    median = statistics.median(times)
+    print(f"cold start: median {median:.0f}ms, min {times[0]:.0f}ms, max {times[-1]:.0f}ms, "
+          f"{reports[-1]['modules']} modules loaded")
+
+    print()
+    print(f"{'phase':<40}{'ms':>10}{'modules':>10}")
+    for record in reports[-1]["phases"]:
+        label = "  " * record["depth"] + record["phase"]
+        detail = record.get("plugin") or record.get("target")
+        if detail:
+            label += f" ({detail})"
+        print(f"{label:<40}{record['wall_ms']:>10.1f}{record['new_modules']:>10}")
+
+    if median > args.budget_ms:
+        print(f"\nFAIL: median cold start {median:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+    print(f"\nOK: within the {args.budget_ms:.0f}ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+End-to-end benchmark of the event bus: a StewardServer with its bundled plugins and a client,
+connected through the in-process loopback transport, so no broker is needed.
+
+Scenarios:
+
+    GET_TIME                    smallest request/response
+    FILE_READ_CONTENTS_1KB      file read, 1KB / 1MB / 50MB response payloads
+    FILE_READ_CONTENTS_1MB
+    FILE_READ_CONTENTS_50MB
+    LIST_CLIENTS_10K            LIST_CLIENTS with 10,000 registered clients
+    INSPIRATIONAL_QUOTE         quote from a warm database (no network)
+
+Each scenario reports round trip latency (sequential requests) and throughput (requests
+kept in flight).  By default events are encoded as they would be over MQTT; --wire objects
+measures the zero-copy loopback path.
+
+Results are written as JSON and compared with a stored baseline.  A metric worse than the
+baseline by more than --tolerance (p50 latency and throughput), or any failed request, fails
+the run (exit status 1).  Baselines are specific to
+a machine: record one with --update-baseline before comparing.
+
+    python benchmarks/bench_bus.py [--quick] [--output results.json] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "bench_bus.json")
+
+# metrics compared with the baseline, and whether bigger is better
+COMPARED = {"p50_ms": False, "throughput_rps": True}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, int(round(fraction * len(values))) - 1))]
+
+
+class Bus:
+    """
+    A server and one client on a private loopback broker, in a scratch HOME and working directory.
+    """
+    def __init__(self, work_dir, encode):
+        from steward.replay import ReplayClient
+        from steward.server import StewardServer
+        from steward.transport import LoopbackBroker
+
+        self.work_dir = work_dir
+        self.broker = LoopbackBroker(encode=encode)
+        self.server = StewardServer(level="ERROR", transport=self.broker)
+        self.server_thread = threading.Thread(target=self.server.connect, daemon=True)
+        self.server_thread.start()
+
+        self.client = ReplayClient(level="ERROR", transport=self.broker)
+        self.client.connect(blocking=False)
+
+    def request(self, name, payload=None, timeout=60):
+        reply = self.client.request(name, payload, timeout).result(timeout)
+        if reply.is_error:
+            raise RuntimeError(f"{name} failed: {reply.payload}")
+        return reply
+
+    def close(self):
+        self.client.disconnect()
+        self.server.disconnect()
+        self.server_thread.join(5)
+
+
+def measure(bus, name, payload, iterations, window, rounds=3):
+    for _ in range(max(1, iterations // 10)):
+        bus.request(name, payload)
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        bus.request(name, payload)
+        latencies.append(time.perf_counter() - start)
+
+    # throughput: best of `rounds`, each keeping `window` requests in flight
+    failures = [0]
+    best = 0
+    for _ in range(rounds):
+        best = max(best, throughput(bus, name, payload, iterations, window, failures))
+
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(best, 1),
+        "failures": failures[0],
+    }
+
+
+def throughput(bus, name, payload, iterations, window, failures):
+    slots = threading.Semaphore(window)
+    done = threading.Event()
+    remaining = [iterations]
+    lock = threading.Lock()
+
+    def finished(future):
+        slots.release()
+        with lock:
+            if future.exception() or future.result().is_error:
+                failures[0] += 1
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        slots.acquire()
+        bus.client.request(name, payload, 60).add_done_callback(finished)
+    done.wait(300)
+    return iterations / (time.perf_counter() - start)
+
+
+def register_clients(bus, count):
+    from steward.event import StewardEvent, EventType
+    from steward.transport import LoopbackClient
+
+    registrar = LoopbackClient("bench-registrar", broker=bus.broker)
+    registrar.connect()
+    for n in range(count):
+        event = StewardEvent(EventType.NOTICE, "CLIENT_REGISTER", payload={"id": f"bench-{n:05d}", "type": "bench", "codecs": ["json"]})
+        registrar.publish("steward/broadcast", event if not bus.broker.encode else event.toJSON())
+
+    deadline = time.monotonic() + 120
+    while len(bus.request("LIST_CLIENTS").payload) < count:
+        if time.monotonic() > deadline:
+            raise RuntimeError("clients did not register in time")
+        time.sleep(0.1)
+
+
+def seed_quotes(home):
+    from steward.plugins.inspirational_quotes.db import DB
+
+    datadir = os.path.join(home, ".steward", "InspirationalQuotes")
+    os.makedirs(datadir, exist_ok=True)
+    db = DB(os.path.join(datadir, "quotes.db"))
+    for n in range(50):
+        db.add_quote(f"Benchmark quote {n}", "bench")
+
+
+def run(args):
+    scale = 0.1 if args.quick else 1.0
+    iterations = lambda count: max(5, int(count * scale))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # STEWARD_DIR is taken from HOME when steward is imported, so set it first
+        os.environ["HOME"] = work_dir
+        os.chdir(work_dir)
+        os.environ.setdefault("STEWARD_LOG_QUEUE", "1")
+
+        seed_quotes(work_dir)
+        files = {}
+        for label, size in (("1KB", 1024), ("1MB", 1024 * 1024), ("50MB", 50 * 1024 * 1024)):
+            path = files[label] = os.path.join(work_dir, f"read_{label}.txt")
+            with open(path, "w") as f:
+                f.write("x" * size)
+
+        bus = Bus(work_dir, encode=args.wire == "encoded")
+        try:
+            scenarios = [
+                ("GET_TIME", "GET_TIME", None, iterations(2000), 64),
+                ("FILE_READ_CONTENTS_1KB", "FILE_READ_CONTENTS", {"path": files["1KB"]}, iterations(2000), 64),
+                ("FILE_READ_CONTENTS_1MB", "FILE_READ_CONTENTS", {"path": files["1MB"]}, iterations(200), 8),
+                ("FILE_READ_CONTENTS_50MB", "FILE_READ_CONTENTS", {"path": files["50MB"]}, iterations(20), 2),
+                ("INSPIRATIONAL_QUOTE", "INSPIRATIONAL_QUOTE", None, iterations(500), 16),
+            ]
+            for scenario, name, payload, count, window in scenarios:
+                if args.only and scenario not in args.only:
+                    continue
+                results[scenario] = measure(bus, name, payload, count, window)
+                print(f"  {scenario}: {results[scenario]}", file=sys.stderr)
+
+            if not args.only or "LIST_CLIENTS_10K" in args.only:
+                register_clients(bus, 10000)
+                results["LIST_CLIENTS_10K"] = measure(bus, "LIST_CLIENTS", None, iterations(100), 4)
+                print(f"  LIST_CLIENTS_10K: {results['LIST_CLIENTS_10K']}", file=sys.stderr)
+        finally:
+            bus.close()
+            os.chdir(ROOT)
+
+    return {
+        "benchmark": "bench_bus",
+        "wire": args.wire,
+        "quick": args.quick,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "recorded_at": int(time.time()),
+        "scenarios": results,
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Print a comparison table and return the regressions.  Latencies that moved by less than
+    `min_delta_ms` are left alone, sub-millisecond timings jitter far more than `tolerance`.
+    """
+    regressions = []
+    print(f"{'scenario':<26}{'metric':<16}{'baseline':>12}{'now':>12}{'change':>10}")
+    for scenario, metrics in results["scenarios"].items():
+        if metrics["failures"]:
+            print(f"{scenario:<26}{'failures':<16}{'':>12}{metrics['failures']:>12}{'':>10}  REGRESSION")
+            regressions.append((scenario, "failures"))
+
+        base = baseline.get("scenarios", {}).get(scenario)
+        for metric, higher_is_better in COMPARED.items():
+            now = metrics[metric]
+            if not base or not base.get(metric):
+                print(f"{scenario:<26}{metric:<16}{'-':>12}{now:>12.2f}{'':>10}")
+                continue
+
+            change = (now - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if not higher_is_better and abs(now - base[metric]) < min_delta_ms:
+                flag = ""
+            print(f"{scenario:<26}{metric:<16}{base[metric]:>12.2f}{now:>12.2f}{change:>+10.0%}{flag}")
+            if flag:
+                regressions.append((scenario, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="a tenth of the iterations")
+    parser.add_argument("--wire", choices=("encoded", "objects"), default="encoded", help="encode events, or pass them as objects")
+    parser.add_argument("--only", type=lambda value: value.split(","), default=None, help="comma separated scenarios to run")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown before a metric counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore latency changes smaller than this")
+    parser.add_argument("--update-baseline", action="store_true", help="save these results as the new baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.isfile(args.baseline):
+        print(json.dumps(results, indent=2))
+        print(f"No baseline at {args.baseline}, run with --update-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("wire"), baseline.get("quick")) != (results["wire"], results["quick"]):
+        print(f"Warning: baseline was recorded with wire={baseline.get('wire')} quick={baseline.get('quick')}")
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+    print("\nOK: no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Microbenchmark for StewardEvent: construct, serialize and parse throughput.
+
+The "legacy" rows use a copy of the original dict-backed event (nanoid per event, eager
+recursive fromJSON) so the before/after numbers come from the same run.
+
+    python benchmarks/bench_event.py [-n 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nanoid import generate
+from steward.event import StewardEvent, LazyStewardEvent, EventType
+from steward.codecs import BinaryCodec, decode_event
+
+
+class LegacyStewardEvent:
+    def __init__(self, event_type, name=None, trigger_event=None, payload=None):
+        self.id = f"E:{generate(size=10)}"
+        self.event_type = event_type
+        self.name = name
+        self.timestamp = int(time.time() * 1000)
+        self.triggering_event = trigger_event
+        self.payload = payload
+
+    def toJSON(self):
+        payload_json = json.dumps(self.payload) if self.payload else None
+        return json.dumps({
+            "id": self.id,
+            "event_type": self.event_type.name,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "triggering_event": self.triggering_event.toJSON() if self.triggering_event else None,
+            "payload": payload_json
+        })
+
+    @staticmethod
+    def fromJSON(json_str):
+        data = json.loads(json_str)
+        trigger_event = LegacyStewardEvent.fromJSON(data["triggering_event"]) if data["triggering_event"] else None
+        payload = json.loads(data["payload"]) if data["payload"] else None
+        return LegacyStewardEvent(EventType[data["event_type"]], data.get("name"), trigger_event, payload)
+
+
+PAYLOAD = {"path": "/home/user/notes.txt", "contents": "x" * 200}
+
+
+def rate(n, func):
+    start = time.perf_counter()
+    func(n)
+    return n / (time.perf_counter() - start)
+
+
+def construct(cls):
+    def run(n):
+        for _ in range(n):
+            cls(EventType.COMMAND, "FILE_WRITE_CONTENTS", payload=PAYLOAD)
+    return run
+
+
+def serialize(event, encode):
+    def run(n):
+        for _ in range(n):
+            encode(event)
+    return run
+
+
+def parse(data, decode):
+    def run(n):
+        for _ in range(n):
+            decode(data)
+    return run
+
+
+def memory_per_event(cls, n=10000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    events = [cls(EventType.NOTICE, "CLIENT_REGISTER") for _ in range(n)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del events
+    return size / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=100000, help="iterations per measurement")
+    args = parser.parse_args()
+    n = args.n
+
+    legacy = LegacyStewardEvent(EventType.COMMAND, "FILE_WRITE_CONTENTS", payload=PAYLOAD)
+    event = StewardEvent(EventType.COMMAND, "FILE_WRITE_CONTENTS", payload=PAYLOAD)
+    binary = BinaryCodec()
+    legacy_json = legacy.toJSON()
+    event_json = event.toJSON()
+    event_frame = binary.encode(event)
+
+    rows = [
+        ("construct", "legacy", rate(n, construct(LegacyStewardEvent))),
+        ("construct", "slots", rate(n, construct(StewardEvent))),
+        ("serialize", "legacy json", rate(n, serialize(legacy, LegacyStewardEvent.toJSON))),
+        ("serialize", "json", rate(n, serialize(event, StewardEvent.toJSON))),
+        ("serialize", "binary", rate(n, serialize(event, binary.encode))),
+        ("parse", "legacy json", rate(n, parse(legacy_json, LegacyStewardEvent.fromJSON))),
+        ("parse", "json (eager)", rate(n, parse(event_json, StewardEvent.fromJSON))),
+        ("parse", "json (header)", rate(n, parse(event_json, LazyStewardEvent.fromJSON))),
+        ("parse", "binary (header)", rate(n, parse(event_frame, decode_event))),
+    ]
+
+    print(f"{'operation':<12}{'variant':<18}{'events/s':>14}")
+    for operation, variant, value in rows:
+        print(f"{operation:<12}{variant:<18}{value:>14,.0f}")
+
+    print()
+    print(f"bytes per event: legacy {memory_per_event(LegacyStewardEvent):.0f}, slots {memory_per_event(StewardEvent):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Logging throughput: log records per second on the calling thread, for the per-message log
+line in MessageAgent.message_processor.
+
+The "legacy" rows use a copy of the original formatters (deepcopy per record), synchronous
+console and rotating file handlers, and an eagerly formatted WARN line with the full payload.
+Queued rows also report the time for the listener thread to drain its queue.
+
+    python benchmarks/bench_logging.py [-n 20000] [--payload-size 65536]
+"""
+import argparse
+import contextlib
+import copy
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steward.logger import COLORS, LazyPayload, get_logger, stop_listeners
+
+
+class LegacyColoredFormatter(logging.Formatter):
+    def format(self, record):
+        clone = copy.deepcopy(record)
+        levelname = clone.levelname
+        color = COLORS.get(levelname, COLORS['DEFAULT'])
+        clone.levelname = f"{color}{levelname}{COLORS['DEFAULT']}"
+        return super().format(clone)
+
+
+class LegacyFileFormatter(logging.Formatter):
+    def format(self, record):
+        clone = copy.deepcopy(record)
+        return super().format(clone)
+
+
+def legacy_logger(name, file, stream):
+    output = logging.getLogger(name)
+    output.setLevel("DEBUG")
+    output.propagate = False
+    ch = logging.StreamHandler(stream)
+    ch.setFormatter(LegacyColoredFormatter('[%(asctime)s][%(levelname)s] %(message)s'))
+    output.addHandler(ch)
+    fh = RotatingFileHandler(file, maxBytes=10 * 1024 * 1024, backupCount=10)
+    fh.setFormatter(LegacyFileFormatter('[%(asctime)s][%(levelname)s] %(message)s'))
+    output.addHandler(fh)
+    return output
+
+
+def steward_logger_for(name, file, stream, level, queued):
+    with contextlib.redirect_stdout(stream):
+        output = get_logger(name=name, level=level, console=True, file=file, queued=queued)
+    output.propagate = False
+    return output
+
+
+def run(n, log):
+    start = time.perf_counter()
+    for _ in range(n):
+        log()
+    return time.perf_counter() - start
+
+
+def drain():
+    start = time.perf_counter()
+    stop_listeners()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=20000, help="records per measurement")
+    parser.add_argument("--payload-size", type=int, default=64 * 1024, help="message payload size in bytes")
+    args = parser.parse_args()
+    n = args.n
+
+    topic = "steward/STEWARD-abc123"
+    payload = b'{"id": "E:abc", "payload": "' + b"x" * args.payload_size + b'"}'
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir, open(os.devnull, "w") as devnull:
+        path = lambda name: os.path.join(work_dir, f"{name}.log")
+
+        legacy = legacy_logger("bench-legacy", path("legacy"), devnull)
+        rows.append(("legacy (warn, full payload)", run(n, lambda: legacy.warning(f"MSG: [{topic} {str(payload)}")), 0))
+
+        direct = steward_logger_for("bench-direct", path("direct"), devnull, "DEBUG", queued=False)
+        rows.append(("direct (debug, lazy payload)", run(n, lambda: direct.debug("MSG: [%s] %s", topic, LazyPayload(payload))), 0))
+
+        queued = steward_logger_for("bench-queued", path("queued"), devnull, "DEBUG", queued=True)
+        elapsed = run(n, lambda: queued.debug("MSG: [%s] %s", topic, LazyPayload(payload)))
+        rows.append(("queued (debug, lazy payload)", elapsed, drain()))
+
+        quiet = steward_logger_for("bench-quiet", path("quiet"), devnull, "INFO", queued=True)
+        rows.append(("queued (debug off)", run(n, lambda: quiet.debug("MSG: [%s] %s", topic, LazyPayload(payload))), drain()))
+
+    print(f"{'variant':<32}{'records/s':>14}{'drain ms':>12}")
+    for variant, elapsed, drained in rows:
+        print(f"{variant:<32}{n / elapsed:>14,.0f}{drained * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
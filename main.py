@@ -1,6 +1,19 @@
-from steward.server import StewardServer
+import asyncio
+import os
+
+from steward.profiler import boot_profiler
+
+with boot_profiler.phase("import steward.server"):
+    from steward.server import StewardServer
 from steward.logger import root_logger
 
-root_logger().info("Starting Steward Server")
-srv = StewardServer(level="DEBUG")
-srv.connect()
+# isolated plugin workers are spawned processes, which import this module again
+if __name__ == "__main__":
+    root_logger().info("Starting Steward Server")
+    srv = StewardServer(level="DEBUG")
+
+    if os.getenv('STEWARD_RUNTIME', 'threads') == 'asyncio':
+        asyncio.run(srv.connect_async())
+    else:
+        srv.connect()
+
@@ -0,0 +1,23 @@
+"""
+Command line tools.
+
+    python -m steward replay --help
+"""
+import argparse
+import sys
+
+from steward import replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="steward")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay.add_arguments(commands.add_parser("replay", help="replay journaled traffic against a running server",
+                                             description=replay.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter))
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
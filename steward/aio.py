@@ -0,0 +1,188 @@
+"""
+asyncio runtime for the Steward server and client.
+
+AsyncioHelper drives paho's socket from the event loop (add_reader/add_writer) instead of
+paho's own network thread.  AsyncDispatchEngine replaces the thread pool DispatchEngine:
+`async def` handlers run on the loop, plain handlers are sent to a thread pool executor so
+blocking plugin code (requests, SQLAlchemy, open) never stalls the loop.
+"""
+import asyncio
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import paho.mqtt.client as mqtt
+
+from steward.event import EventType
+from steward.lanes import DEFAULT_LANE_WEIGHTS, Lanes, parse_lane_setting
+
+
+class AsyncioHelper:
+    """
+    Hook a paho client's socket into an asyncio event loop.
+
+    Based on the loop_asyncio example that ships with paho-mqtt.
+    """
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        if getattr(client, "is_loopback", False) is True:
+            # no socket to watch, the loopback client delivers straight onto the loop
+            client.use_loop(loop)
+            return
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc:
+            self.misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        # keepalives and retries
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
+def is_async_handler(handler):
+    return inspect.iscoroutinefunction(handler)
+
+
+class AsyncLaneQueue(Lanes):
+    """
+    Priority lanes for the event loop (see steward.lanes).  put() runs on the loop and must not
+    block, so a full lane drops its new item, as shed lanes do in the thread pool engine,
+    unless it is a control item.  get() waits for an item and serves the lanes by weighted
+    round robin.
+    """
+    def __init__(self, weights, limits, shed=()):
+        super().__init__(weights, limits, shed)
+        # one permit per queued item
+        self._items = asyncio.Semaphore(0)
+
+    def put(self, item, lane, control=False):
+        if self.is_full(lane) and not control:
+            self.dropped[lane] += 1
+            return False
+        self.append(item, lane)
+        self._items.release()
+        return True
+
+    async def get(self):
+        await self._items.acquire()
+        return self.take()
+
+
+class AsyncDispatchEngine:
+    """
+    Run dispatch jobs as tasks on an event loop.
+
+    Jobs wait in an AsyncLaneQueue and `concurrency` consumer tasks work through it, so at most
+    that many events are in flight at once.  When more are waiting, the consumers take them by
+    lane weight (STEWARD_LANE_WEIGHTS), the same as the thread pool engine's workers.  Jobs in
+    one lane start in arrival order, but unlike the thread pool engine, events from the same
+    topic may finish out of order.  submit() is called on the loop thread and cannot block it,
+    so a full lane (`queue_size`, or its STEWARD_LANE_LIMITS entry) drops the job and counts it;
+    lifecycle notices are queued regardless.
+
+    `executor` is the thread pool that synchronous handlers run on.
+    """
+    is_async = True
+
+    def __init__(self, loop, concurrency=1000, queue_size=10000, executor_workers=32, logger=None, lane_weights=None, lane_limits=None):
+        self.loop = loop
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.logger = logger
+        self.lane_weights = lane_weights or parse_lane_setting(DEFAULT_LANE_WEIGHTS)
+        self.lane_limits = {event_type: queue_size for event_type in EventType}
+        self.lane_limits.update(lane_limits or {})
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="steward-handler")
+        self._queue = None
+        self._tasks = []
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    @property
+    def dropped(self):
+        return sum(self._queue.dropped.values()) if self._queue is not None else 0
+
+    def start(self):
+        if self._tasks:
+            return
+
+        if self._queue is None:
+            self._queue = AsyncLaneQueue(self.lane_weights, self.lane_limits)
+        self._tasks = [self.loop.create_task(self._consumer()) for _ in range(self.concurrency)]
+
+    def stop(self, timeout=5):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, topic, job, *args, lane=EventType.UNKNOWN, control=False):
+        if not self._tasks:
+            self.start()
+
+        lane = lane or EventType.UNKNOWN
+        if not self._queue.put((job, args), lane, control):
+            if self.logger:
+                self.logger.error(f"Dispatch lane {lane.name} full, dropping event for {topic} ({self.dropped} dropped)")
+            return False
+
+        return True
+
+    def dropped_by_type(self):
+        dropped = self._queue.dropped if self._queue is not None else {}
+        return {event_type.name: dropped.get(event_type, 0) for event_type in EventType}
+
+    async def _consumer(self):
+        while True:
+            job, args = await self._queue.get()
+            try:
+                await job(*args)
+            except Exception as e:
+                if self.logger:
+                    self.logger.exception(f"Event handler failed: {e}")
+
+    def run_handler(self, handler, *args):
+        """
+        Await an async handler, or run a sync one on the executor.
+        """
+        if is_async_handler(handler):
+            return handler(*args)
+        return self.loop.run_in_executor(self.executor, handler, *args)
+
+
+def make_engine(loop, logger=None):
+    """
+    Build an AsyncDispatchEngine configured from the environment.
+    """
+    return AsyncDispatchEngine(
+        loop,
+        concurrency=int(os.getenv('STEWARD_ASYNC_CONCURRENCY', 1000)),
+        queue_size=int(os.getenv('STEWARD_ASYNC_QUEUE_SIZE', 10000)),
+        executor_workers=int(os.getenv('STEWARD_ASYNC_EXECUTOR_WORKERS', 32)),
+        logger=logger,
+        lane_weights=parse_lane_setting(os.getenv('STEWARD_LANE_WEIGHTS', DEFAULT_LANE_WEIGHTS)),
+        lane_limits=parse_lane_setting(os.getenv('STEWARD_LANE_LIMITS', ''))
+    )
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import paho.mqtt.client as mqtt
@@ -8,14 +9,20 @@ from typing import List
 from nanoid import generate
 from dotenv import load_dotenv
 from steward.event import StewardEvent, EventType
-from steward.logger import get_logger
+from steward.logger import get_logger, LazyPayload
 from steward.message_agent import MessageAgent
 from steward.decorators import is_event_handler
+from steward.codecs import DEFAULT_CODEC, get_codec, supported_codecs
+from steward.aio import AsyncioHelper
+from steward.publisher import BatchingPublisher
+from steward.transport import create_client
+from steward.clients.file_stream import FileStreamReceiver
+from steward.clients.dir_listing import DirectoryListing
 
 load_dotenv()
 
 class StewardClient:
-    def __init__(self, level="INFO"):
+    def __init__(self, level="INFO", transport=None):
         self.id = generate(alphabet="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",size=12)
         self.logger = get_logger(name=self.id, level=level, console=True, file="logs/client.log")
         self.msgagent = MessageAgent(logger=self.logger)
@@ -23,17 +30,30 @@ class StewardClient:
         self._active_connections = List[mqtt.Client]
         self.client_type = "general"
         self.client_topic = f"steward/{self.id}"
+        # JSON until the server agrees on something better during registration
+        self.codec = DEFAULT_CODEC
 
-        self.client = mqtt.Client(client_id=self.id)
+        self.client = create_client(self.id, transport)
         self.mqtt_host = os.getenv('STEWARD_MQTT_HOST', 'localhost') 
         self.mqtt_port = int(os.getenv('STEWARD_MQTT_PORT', 1883))
         self.mqtt_ws_port = int(os.getenv('STEWARD_MQTT_WS_PORT', 51234))
+        self.publisher = BatchingPublisher(self.client, logger=self.logger)
+        # FILE_READ_STREAM transfers in progress, by stream ID
+        self.streams = {}
+        # DIR_LIST / DIR_WALK listings in progress, by listing ID
+        self.listings = {}
+        # FILE_WATCH callbacks, by watch ID
+        self.watches = {}
 
         self.msgagent.find_event_handlers(self)
         signal.signal(signal.SIGINT, self.handle_disconnect)
         signal.signal(signal.SIGTERM, self.handle_disconnect)
 
-    def connect(self):
+    def connect(self, blocking=True):
+        """
+        Connect to the broker.  With blocking=False the MQTT loop runs on a background thread
+        and connect() returns once the connection is started, so request() can be used.
+        """
         self.logger.debug(f"Connecting to MQTT broker: {self.mqtt_host}:{self.mqtt_port}")
         
         
@@ -42,19 +62,45 @@ class StewardClient:
 
         self.client.enable_logger()
         self.client.connect(self.mqtt_host, self.mqtt_port, 60)        
+        self.msgagent.start()
+
+        if not blocking:
+            self.client.loop_start()
+            return
 
         try:
             self.client.loop_forever()
 
         except Exception as e:
             self.logger.error(f"Error: {e}")
+
+    async def connect_async(self):
+        """
+        Connect using the asyncio runtime on the current event loop.
+
+        Returns once the connection is started.  The MQTT socket is then driven by the loop,
+        so `await client.request_async(...)` can be used from coroutines on the same loop.
+        """
+        self.logger.debug(f"Connecting to MQTT broker (asyncio): {self.mqtt_host}:{self.mqtt_port}")
+        loop = asyncio.get_running_loop()
+
+        self.msgagent.use_asyncio(loop)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.msgagent.message_processor
+        AsyncioHelper(loop, self.client)
+
+        self.client.enable_logger()
+        self.client.connect(self.mqtt_host, self.mqtt_port, 60)
+        self.msgagent.start()
                          
     def disconnect(self):
         self.logger.info("Shutting down")
         stop_event = StewardEvent(EventType.NOTICE, "CLIENT_STOP", payload={"id": self.id})
-        self.client.publish(self.client_topic, stop_event.toJSON())
+        self.publish(self.client_topic, stop_event)
+        self.publisher.stop()
         self.client.disconnect()
         self.client.loop_stop()
+        self.msgagent.stop()
 
 
     def handle_disconnect(self, SIGNAL, FRAME):    
@@ -70,47 +116,188 @@ class StewardClient:
         
     def on_close(self, client, userdata, rc):
         event = StewardEvent(EventType.NOTICE, "CLIENT_DISCONNECT", payload={"id": self.id})
-        self.client.publish(self.client_topic, event.toJSON())
+        self.publish(self.client_topic, event)
         self.logger.debug(f"Client disconnected with result code {rc}")
 
+    def publish(self, topic, event):
+        """
+        Publish an event using the codec negotiated with the server.
+        """
+        self.msgagent.remember(event)
+        self.publisher.publish_event(topic, event, self.codec)
+
+    def request(self, name, payload=None, timeout=30, event_type=EventType.COMMAND):
+        """
+        Send a request and return a concurrent.futures.Future for the reply.
+
+        The future resolves to the RESPONSE or ERROR event answering the request (check
+        `is_error`), or fails with TimeoutError after `timeout` seconds.  Any number of
+        requests can be in flight at once.
+        """
+        event = StewardEvent(event_type, name, payload=payload)
+        future = self.msgagent.pending.add(event.id, timeout)
+        self.publish(self.client_topic, event)
+        return future
+
+    async def request_async(self, name, payload=None, timeout=30, event_type=EventType.COMMAND):
+        """
+        Awaitable version of request().
+        """
+        return await asyncio.wrap_future(self.request(name, payload, timeout, event_type))
+
+    def read_file_stream(self, path, destination, resume=False, chunk_size=None, window=None, idle_timeout=30):
+        """
+        Stream the server file `path` into the local file `destination`, in chunks.  Returns a
+        FileStreamReceiver; call result() on it to wait.  With resume=True an existing
+        destination is kept and the transfer continues from its length.
+        """
+        offset = os.path.getsize(destination) if resume and os.path.exists(destination) else 0
+        receiver = FileStreamReceiver(self, path, destination, offset, chunk_size, window, idle_timeout)
+        self.streams[receiver.stream_id] = receiver
+        try:
+            return receiver.start()
+        except Exception:
+            self.streams.pop(receiver.stream_id, None)
+            raise
+
+    def list_directory(self, path, include=None, exclude=None, types=None, limit=None, page_size=None, idle_timeout=30):
+        """
+        List the server directory `path`.  Returns a DirectoryListing, which yields the entries
+        as the pages arrive.
+        """
+        return self._start_listing("DIR_LIST", path, idle_timeout, include=include, exclude=exclude, types=types, limit=limit, page_size=page_size)
+
+    def walk_directory(self, path, max_depth=None, include=None, exclude=None, types=None, limit=None, page_size=None, idle_timeout=30):
+        """
+        Walk the server directory tree under `path`.  Returns a DirectoryListing, which yields
+        the entries as the pages arrive.
+        """
+        return self._start_listing("DIR_WALK", path, idle_timeout, max_depth=max_depth, include=include, exclude=exclude,
+                                   types=types, limit=limit, page_size=page_size)
+
+    def _start_listing(self, name, path, idle_timeout, **options):
+        listing = DirectoryListing(self, name, path, idle_timeout, **options)
+        self.listings[listing.listing_id] = listing
+        return listing.start()
+
+    def watch_path(self, path, callback, timeout=30):
+        """
+        Watch the server file or directory `path`.  callback(name, payload) is called with each
+        FILE_CREATED, FILE_DELETED or FILE_MODIFIED notice.  Returns a future for the FILE_WATCH
+        response, whose payload holds the watch_id.
+        """
+        event = StewardEvent(EventType.COMMAND, "FILE_WATCH", payload={"path": path})
+        self.watches[event.id] = callback
+        future = self.msgagent.pending.add(event.id, timeout)
+        self.publish(self.client_topic, event)
+        return future
+
+    def unwatch_path(self, watch_id, timeout=30):
+        self.watches.pop(watch_id, None)
+        return self.request("FILE_UNWATCH", {"watch_id": watch_id}, timeout)
+
     def request_clients(self):
-        start_event = StewardEvent(EventType.COMMAND, "LIST_CLIENTS") 
-        self.client.publish(self.client_topic, start_event.toJSON())
+        return self.request("LIST_CLIENTS")
 
     def request_time(self):
-        event = StewardEvent(EventType.COMMAND, "GET_TIME")
-        self.client.publish(self.client_topic, event.toJSON())
+        return self.request("GET_TIME")
 
     def run_test(self):
         
         event = StewardEvent(EventType.COMMAND, "INSPIRATIONAL_QUOTE")
-        self.client.publish(self.client_topic, event.toJSON())
+        self.publish(self.client_topic, event)
         
-    @is_event_handler("FILE_READ_CONTENTS")
+    @is_event_handler("FILE_READ_CONTENTS", EventType.RESPONSE)
     def read_file(self, event, message=None):
         if event.is_response:
-            self.logger.debug(f"File contents: {event.payload}")
+            self.logger.debug("File contents: %s", LazyPayload(event.payload))
+
+    @is_event_handler("FILE_READ_STREAM", [EventType.RESPONSE, EventType.ERROR])
+    def on_file_stream(self, event, message=None):
+        payload = event.payload if isinstance(event.payload, dict) else {}
+        receiver = self.streams.get(payload.get("stream_id") or event.causation_id)
+        if receiver is None:
+            return
+
+        if event.is_error:
+            receiver.on_error(payload.get("error") or event.payload)
+        else:
+            receiver.on_chunk(payload)
+
+    @is_event_handler("DIR_LIST", [EventType.RESPONSE, EventType.ERROR])
+    def on_dir_list(self, event, message=None):
+        self.on_listing_page(event)
+
+    @is_event_handler("DIR_WALK", [EventType.RESPONSE, EventType.ERROR])
+    def on_dir_walk(self, event, message=None):
+        self.on_listing_page(event)
+
+    def on_listing_page(self, event):
+        payload = event.payload if isinstance(event.payload, dict) else {}
+        listing = self.listings.get(payload.get("listing_id") or event.causation_id)
+        if listing is None:
+            return
 
-    @is_event_handler("URL_GET_CONTENTS")
+        if event.is_error:
+            listing.on_error(payload.get("error") or event.payload)
+        else:
+            listing.on_page(payload)
+
+    @is_event_handler("FILE_WATCH", EventType.ERROR)
+    def on_file_watch_error(self, event, message=None):
+        self.watches.pop(event.causation_id, None)
+
+    @is_event_handler("FILE_CREATED", EventType.NOTICE)
+    def on_file_created(self, event, message=None):
+        self.on_file_change(event)
+
+    @is_event_handler("FILE_DELETED", EventType.NOTICE)
+    def on_file_deleted(self, event, message=None):
+        self.on_file_change(event)
+
+    @is_event_handler("FILE_MODIFIED", EventType.NOTICE)
+    def on_file_modified(self, event, message=None):
+        self.on_file_change(event)
+
+    def on_file_change(self, event):
+        payload = event.payload
+        callback = self.watches.get(payload["watch_id"])
+        if payload.get("ended"):
+            self.watches.pop(payload["watch_id"], None)
+        if callback is not None:
+            try:
+                callback(event.name, payload)
+            except Exception as e:
+                self.logger.error(f"Error in the watch callback for {payload['watched']}: {e}")
+
+    @is_event_handler("URL_GET_CONTENTS", EventType.RESPONSE)
     def get_url_contents(self, event, message=None):
         if event.is_response:
-            self.logger.debug(f"URL contents: {event.payload}")
+            self.logger.debug("URL contents: %s", LazyPayload(event.payload))
 
-    @is_event_handler("SERVER_START")
+    @is_event_handler("SERVER_START", EventType.NOTICE)
     def client_register(self, event, message):
         data = {
             "id": self.id,
-            "type": self.client_type
+            "type": self.client_type,
+            "codecs": supported_codecs()
         }
 
+        # registration is broadcast, so it always goes out as JSON
         start_event = StewardEvent(EventType.NOTICE, "CLIENT_REGISTER", payload=data)
         self.client.publish("steward/broadcast", start_event.toJSON())
+
+    @is_event_handler("CLIENT_REGISTER", EventType.RESPONSE)
+    def client_registered(self, event, message=None):
+        if event.payload and event.payload.get("id") == self.id:
+            self.codec = get_codec(event.payload.get("codec"))
+            self.logger.debug(f"Using {self.codec.name} codec")
     
-    @is_event_handler("SERVER_STOP")
+    @is_event_handler("SERVER_STOP", EventType.NOTICE)
     def server_stop_response(self, event, message):
         self.disconnect()
 
-    @is_event_handler("LIST_CLIENTS")
+    @is_event_handler("LIST_CLIENTS", EventType.RESPONSE)
     def show_clients(self, event, message):
         if event.is_response:
             data = {item[0]: item[1] for item in event.payload}
@@ -120,12 +307,12 @@ class StewardClient:
                 self.logger.debug(f"  [{client['type']}] {client['id']}")
     
 
-    @is_event_handler("TIME")
+    @is_event_handler("TIME", EventType.RESPONSE)
     def show_time(self, event, message):
         if event.is_response:
             self.logger.debug(f"Current Time: {event.payload}") 
 
-    @is_event_handler("URL_GET_JSON")
+    @is_event_handler("URL_GET_JSON", EventType.RESPONSE)
     def get_url_json(self, event, message=None):
         if event.is_response:
             for item in event.payload:
@@ -133,7 +320,7 @@ class StewardClient:
                 print(f"  - {item['a']}")
             # self.logger.debug(f"JSON contents: {event.payload}")
 
-    @is_event_handler("INSPIRATIONAL_QUOTE")
+    @is_event_handler("INSPIRATIONAL_QUOTE", EventType.RESPONSE)
     def get_quote(self, event, message=None):
         if event.is_response:
             self.logger.info(f"Quote: {event.payload['q']}")
@@ -0,0 +1,78 @@
+"""
+Client side of DIR_LIST and DIR_WALK: the pages of a listing as one iterator of entries.
+"""
+import queue
+
+from steward.event import StewardEvent, EventType
+
+
+class ListingFailed(Exception):
+    pass
+
+
+class DirectoryListing:
+    """
+    Iterating yields each entry ({"name", "path", "type", "size", "mtime"}) as its page
+    arrives, in the order the server found them.  Raises ListingFailed if the server
+    reported an error and TimeoutError once no page has arrived for `idle_timeout` seconds.
+
+    After the last entry, `count`, `truncated` and `errors` hold the totals of the listing.
+    """
+    def __init__(self, client, name, path, idle_timeout=30, **options):
+        self.client = client
+        self.path = path
+        self.idle_timeout = idle_timeout
+        payload = {"path": path}
+        payload.update({key: value for key, value in options.items() if value is not None})
+        self.request = StewardEvent(EventType.COMMAND, name, payload=payload)
+        self.listing_id = self.request.id
+
+        self.count = None
+        self.truncated = False
+        self.errors = []
+        self._pages = queue.Queue()
+        self._early = {}
+        self._next_seq = 0
+
+    def start(self):
+        self.client.publish(self.client.client_topic, self.request)
+        return self
+
+    def on_page(self, page):
+        self._pages.put(page)
+
+    def on_error(self, error):
+        self._pages.put(ListingFailed(error))
+
+    def __iter__(self):
+        try:
+            while True:
+                page = self._early.pop(self._next_seq, None) or self._next_page()
+                if page["seq"] != self._next_seq:
+                    self._early[page["seq"]] = page
+                    continue
+
+                self._next_seq += 1
+                self.errors.extend(page["errors"])
+                yield from page["entries"]
+                if page["final"]:
+                    self.count = page["count"]
+                    self.truncated = page["truncated"]
+                    return
+        finally:
+            self.client.listings.pop(self.listing_id, None)
+
+    def entries(self):
+        """
+        Wait for the whole listing and return its entries in a list.
+        """
+        return list(self)
+
+    def _next_page(self):
+        try:
+            page = self._pages.get(timeout=self.idle_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Listing of {self.path} stopped after {self._next_seq} pages") from None
+        if isinstance(page, Exception):
+            raise page
+        return page
@@ -0,0 +1,168 @@
+"""
+Client side of FILE_READ_STREAM: write the chunks of a streamed file to a local file.
+
+Chunks are written in sequence order (early ones are held until the gap before them fills)
+and acknowledged every half of the window the server reports, which lets it send the next
+ones.  A transfer that stops, through a timeout, a cancel or a lost connection, leaves a
+partial file behind and can be resumed from its length.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from steward.event import StewardEvent, EventType
+
+
+class StreamFailed(Exception):
+    pass
+
+
+class FileStreamReceiver:
+    """
+    Reassembles one stream of `path` into `destination`.  With `offset` the stream starts
+    there and the first `offset` bytes of the destination are kept.
+
+    result() returns {"path", "destination", "size", "received", "offset"} once the final
+    chunk is written: `received` bytes arrived in this stream and the file is now `offset`
+    bytes long.
+    """
+    def __init__(self, client, path, destination, offset=0, chunk_size=None, window=None, idle_timeout=30):
+        self.client = client
+        self.path = path
+        self.destination = destination
+        self.start_offset = offset
+        self.offset = offset
+        self.idle_timeout = idle_timeout
+        self.future = Future()
+        self.size = None
+
+        payload = {"path": path, "offset": offset}
+        if chunk_size:
+            payload["chunk_size"] = chunk_size
+        if window:
+            payload["window"] = window
+        self.request = StewardEvent(EventType.COMMAND, "FILE_READ_STREAM", payload=payload)
+        self.stream_id = self.request.id
+
+        self.next_seq = 0
+        self._early = {}
+        self._unacked = 0
+        self._file = None
+        self._lock = threading.RLock()
+        self.last_activity = time.monotonic()
+
+    def start(self):
+        if self.start_offset:
+            self._file = open(self.destination, "r+b")
+            self._file.truncate(self.start_offset)
+            self._file.seek(self.start_offset)
+        else:
+            self._file = open(self.destination, "wb")
+
+        self.last_activity = time.monotonic()
+        self.client.publish(self.client.client_topic, self.request)
+        return self
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def on_chunk(self, chunk):
+        with self._lock:
+            self._on_chunk(chunk)
+
+    def _on_chunk(self, chunk):
+        if self.done:
+            return
+        self.last_activity = time.monotonic()
+
+        seq = chunk["seq"]
+        if seq < self.next_seq:
+            return
+        if seq > self.next_seq:
+            self._early[seq] = chunk
+            return
+
+        window = chunk["window"]
+        try:
+            while chunk is not None:
+                if chunk["offset"] != self.offset:
+                    raise StreamFailed(f"Chunk {chunk['seq']} starts at {chunk['offset']}, expected {self.offset}")
+
+                self._file.write(chunk["data"])
+                self.offset += len(chunk["data"])
+                self.size = chunk["size"]
+                self.next_seq += 1
+                self._unacked += 1
+
+                if chunk["final"]:
+                    self._finish()
+                    return
+                chunk = self._early.pop(self.next_seq, None)
+        except Exception as e:
+            self.fail(e)
+            self._send("FILE_READ_STREAM_CANCEL", {"stream_id": self.stream_id})
+            return
+
+        # acknowledging every half window keeps the server sending while we write
+        if self._unacked >= max(1, window // 2):
+            self._unacked = 0
+            self._send("FILE_READ_STREAM_ACK", {"stream_id": self.stream_id, "seq": self.next_seq - 1})
+
+    def on_error(self, error):
+        self.fail(StreamFailed(error))
+
+    def fail(self, exception):
+        with self._lock:
+            if self.done:
+                return
+            self._close()
+            self.future.set_exception(exception)
+            self.client.streams.pop(self.stream_id, None)
+
+    def cancel(self):
+        """
+        Stop the transfer.  The partial file is kept, so it can be resumed later.
+        """
+        with self._lock:
+            if not self.done:
+                self._send("FILE_READ_STREAM_CANCEL", {"stream_id": self.stream_id})
+                self.fail(StreamFailed("Cancelled"))
+
+    def result(self, timeout=None):
+        """
+        Wait for the transfer.  Raises TimeoutError after `timeout` seconds overall, or once
+        no chunk has arrived for `idle_timeout` seconds, and StreamFailed if the server
+        reported an error.  Both leave the partial file in place.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self.idle_timeout if deadline is None else min(self.idle_timeout, deadline - time.monotonic())
+            try:
+                return self.future.result(max(0, min(wait, 1)))
+            except FutureTimeoutError:
+                now = time.monotonic()
+                if now - self.last_activity > self.idle_timeout or (deadline is not None and now >= deadline):
+                    self.cancel()
+                    raise TimeoutError(f"Stream of {self.path} stopped at offset {self.offset}")
+
+    def _finish(self):
+        self._close()
+        self.client.streams.pop(self.stream_id, None)
+        self.future.set_result({
+            "path": self.path,
+            "destination": self.destination,
+            "size": self.size,
+            "received": self.offset - self.start_offset,
+            "offset": self.offset,
+        })
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._early.clear()
+
+    def _send(self, name, payload):
+        self.client.publish(self.client.client_topic, StewardEvent(EventType.COMMAND, name, payload=payload))
@@ -0,0 +1,320 @@
+"""
+Wire codecs for StewardEvent.
+
+Every MQTT payload starts with a byte that identifies its codec.  JSON envelopes always start
+with "{", binary frames start with BINARY_FORMAT.  Receivers can therefore decode anything
+without being told which codec the sender picked, and a sender only has to agree on a codec
+with the peer it is replying to.
+
+Several events bound for the same topic can be sent as one batch (see
+steward.publisher.BatchingPublisher).  A JSON batch is a JSON array with one envelope per line,
+a binary batch starts with BINARY_BATCH.  decode_events() unpacks either.
+
+Negotiation:  a client lists the codecs it understands in the CLIENT_REGISTER payload
+("codecs": ["binary", "json"], in order of preference).  The server replies with a
+CLIENT_REGISTER response naming the codec to use, and from then on answers each request in
+the codec the request arrived in.
+"""
+import json
+import os
+import struct
+
+from steward.event import LazyStewardEvent, EventType
+
+BINARY_FORMAT = 0xB1
+BINARY_BATCH = 0xB2
+_JSON_BATCH = ord("[")
+
+# payload kinds in a binary frame
+_PAYLOAD_NONE = 0
+_PAYLOAD_BYTES = 1
+_PAYLOAD_STR = 2
+_PAYLOAD_JSON = 3
+
+# length marker for a None string, so strings in the header must be shorter
+_NONE = 0xFFFF
+
+# format, event type ordinal, timestamp, id length
+_HEAD = struct.Struct("!BBqH")
+_U16 = struct.Struct("!H")
+_U32 = struct.Struct("!I")
+_KIND = struct.Struct("!BI")
+_BATCH = struct.Struct("!BI")
+
+_EVENT_TYPES = {event_type.value: event_type for event_type in EventType}
+
+
+class JSONCodec:
+    """
+    The original envelope format: a JSON object with the payload JSON-encoded as a string.
+    """
+    name = "json"
+
+    def encode(self, event):
+        return event.toJSON().encode()
+
+    def decode(self, data):
+        return LazyStewardEvent.fromJSON(data)
+
+    def encode_batch(self, frames):
+        # json.dumps never writes a raw newline, so ",\n" only ever appears between envelopes
+        return b"[\n" + b",\n".join(frames) + b"\n]"
+
+    def split_batch(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        body = bytes(data).strip()[1:-1].strip()
+        if not body:
+            return []
+        return body.split(b",\n")
+
+    def decode_batch(self, data):
+        return [self.decode(frame) for frame in self.split_batch(data)]
+
+
+class BinaryCodec:
+    """
+    Compact length-prefixed frame.
+
+        B   BINARY_FORMAT
+        B   event type ordinal
+        q   timestamp (ms)
+        H   id length, id (utf-8)
+        H   name length (0xFFFF for None), name (utf-8)
+        H   correlation id length (0xFFFF for None), correlation id
+        H   causation id length (0xFFFF for None), causation id
+        B   payload kind
+        I   payload length, payload
+
+    The id, name and chain ids must encode to fewer than 0xFFFF bytes, encode() raises
+    ValueError for longer ones.
+
+    Bytes and str payloads are written raw.  Anything else is written as JSON, with every
+    bytes value inside it moved out to a list of raw blobs appended after the JSON:
+
+        H   blob count
+        I   blob length, blob    (repeated)
+    """
+    name = "binary"
+
+    def encode(self, event):
+        parts = []
+        self._encode_into(event, parts)
+        return b"".join(parts)
+
+    def _encode_into(self, event, parts):
+        event_id = _header_string(event.id or "", "id")
+        parts.append(_HEAD.pack(BINARY_FORMAT, event.event_type.value, event.timestamp or 0, len(event_id)))
+        parts.append(event_id)
+
+        for field, value in (("name", event.name), ("correlation_id", event.correlation_id), ("causation_id", event.causation_id)):
+            if value is None:
+                parts.append(_U16.pack(_NONE))
+            else:
+                value = _header_string(value, field)
+                parts.append(_U16.pack(len(value)))
+                parts.append(value)
+
+        payload = event.payload
+        if payload is None:
+            parts.append(_KIND.pack(_PAYLOAD_NONE, 0))
+        elif isinstance(payload, (bytes, bytearray, memoryview)):
+            parts.append(_KIND.pack(_PAYLOAD_BYTES, len(payload)))
+            parts.append(bytes(payload))
+        elif isinstance(payload, str):
+            body = payload.encode()
+            parts.append(_KIND.pack(_PAYLOAD_STR, len(body)))
+            parts.append(body)
+        else:
+            blobs = []
+            body = json.dumps(_extract_blobs(payload, blobs)).encode()
+            parts.append(_KIND.pack(_PAYLOAD_JSON, len(body)))
+            parts.append(body)
+            parts.append(_U16.pack(len(blobs)))
+            for blob in blobs:
+                parts.append(_U32.pack(len(blob)))
+                parts.append(blob)
+
+    def encode_batch(self, frames):
+        parts = [_BATCH.pack(BINARY_BATCH, len(frames))]
+        for frame in frames:
+            parts.append(_U32.pack(len(frame)))
+            parts.append(frame)
+        return b"".join(parts)
+
+    def split_batch(self, data):
+        view = memoryview(data)
+        _, count = _BATCH.unpack_from(view, 0)
+        offset = _BATCH.size
+        frames = []
+        for _ in range(count):
+            (length,) = _U32.unpack_from(view, offset)
+            offset += _U32.size
+            frames.append(view[offset:offset + length])
+            offset += length
+        return frames
+
+    def decode_batch(self, data):
+        return [self.decode(frame) for frame in self.split_batch(data)]
+
+    def decode(self, data):
+        view = memoryview(data)
+        _, type_ordinal, timestamp, id_len = _HEAD.unpack_from(view, 0)
+        offset = _HEAD.size
+        event_id = str(view[offset:offset + id_len], "utf-8")
+        offset += id_len
+
+        strings = []
+        for _ in range(3):
+            (length,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            if length == _NONE:
+                strings.append(None)
+            else:
+                strings.append(str(view[offset:offset + length], "utf-8"))
+                offset += length
+        name, correlation_id, causation_id = strings
+
+        body_offset = offset
+        return LazyStewardEvent(
+            id=event_id,
+            event_type=_EVENT_TYPES.get(type_ordinal, EventType.UNKNOWN),
+            name=name,
+            correlation_id=correlation_id,
+            causation_id=causation_id,
+            loader=lambda: self._load_body(view, body_offset, timestamp)
+        )
+
+    def _load_body(self, view, offset, timestamp):
+        kind, length = _KIND.unpack_from(view, offset)
+        offset += _KIND.size
+        body = view[offset:offset + length]
+        offset += length
+
+        if kind == _PAYLOAD_NONE:
+            payload = None
+        elif kind == _PAYLOAD_BYTES:
+            payload = bytes(body)
+        elif kind == _PAYLOAD_STR:
+            payload = str(body, "utf-8")
+        else:
+            (blob_count,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            blobs = []
+            for _ in range(blob_count):
+                (blob_len,) = _U32.unpack_from(view, offset)
+                offset += _U32.size
+                blobs.append(bytes(view[offset:offset + blob_len]))
+                offset += blob_len
+
+            payload = json.loads(bytes(body))
+            if blobs:
+                payload = _restore_blobs(payload, blobs)
+
+        return timestamp, payload
+
+
+def _header_string(value, field):
+    value = value.encode()
+    if len(value) >= _NONE:
+        raise ValueError(f"Event {field} is too long for the binary codec ({len(value)} bytes, at most {_NONE - 1})")
+    return value
+
+
+def _extract_blobs(value, blobs):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        blobs.append(bytes(value))
+        return {"$blob": len(blobs) - 1}
+    if isinstance(value, dict):
+        return {key: _extract_blobs(item, blobs) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_extract_blobs(item, blobs) for item in value]
+    return value
+
+
+def _restore_blobs(value, blobs):
+    if isinstance(value, dict):
+        if len(value) == 1 and "$blob" in value:
+            return blobs[value["$blob"]]
+        return {key: _restore_blobs(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_blobs(item, blobs) for item in value]
+    return value
+
+
+CODECS = {
+    JSONCodec.name: JSONCodec(),
+    BinaryCodec.name: BinaryCodec(),
+}
+DEFAULT_CODEC = CODECS[JSONCodec.name]
+
+
+def get_codec(name=None):
+    """
+    Look up a codec by name.  Unknown or missing names give the default (JSON) codec.
+    """
+    return CODECS.get(name, DEFAULT_CODEC)
+
+
+def supported_codecs():
+    """
+    Codec names this process will accept, in order of preference (STEWARD_CODECS).
+    """
+    names = os.getenv('STEWARD_CODECS', "binary,json").split(",")
+    return [name.strip() for name in names if name.strip() in CODECS]
+
+
+def choose_codec(offered):
+    """
+    Pick the first codec from a peer's preference list that we also support.
+    """
+    ours = supported_codecs()
+    for name in offered or []:
+        if name in ours:
+            return CODECS[name]
+    return DEFAULT_CODEC
+
+
+def codec_for(data):
+    """
+    Identify the codec a wire payload was written with.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)) and data and data[0] in (BINARY_FORMAT, BINARY_BATCH):
+        return CODECS[BinaryCodec.name]
+    return DEFAULT_CODEC
+
+
+def is_batch(data):
+    if not data:
+        return False
+    first = data[0]
+    return first == BINARY_BATCH or first == _JSON_BATCH or first == "["
+
+
+def decode_event(data):
+    """
+    Decode a wire payload with whichever codec wrote it.  Only the event header is decoded.
+    """
+    return codec_for(data).decode(data)
+
+
+def split_frames(data):
+    """
+    Split a wire payload into the frames of the events it carries (one, unless it is a batch).
+    """
+    if is_batch(data):
+        return codec_for(data).split_batch(data)
+    return [data]
+
+
+def decode_events(data):
+    """
+    Decode a wire payload that may be a single event or a batch.  Returns a list of events.
+    """
+    if is_batch(data):
+        return codec_for(data).decode_batch(data)
+    return [decode_event(data)]
+
+
+def encode_event(event, codec=None):
+    return (codec or DEFAULT_CODEC).encode(event)
@@ -1,11 +1,24 @@
 import os
+from steward.event import EventType
 
 STEWARD_DIR=f"{os.path.expanduser('~')}/.steward"
 
 #Decorator
-def is_event_handler(event):
+def is_event_handler(event, event_types=None):
+    """
+    Mark a method as the handler for the named event.
+
+    `event_types` limits the handler to one EventType (or a list of them).  Events of any other
+    type are dropped by the MessageAgent before the handler is called.  Without it the handler
+    receives every event with that name.
+    """
+    if isinstance(event_types, EventType):
+        event_types = (event_types,)
+    elif event_types is not None:
+        event_types = tuple(event_types)
+
     def decorator(func):
         func.handles_event = event
+        func.handles_event_types = event_types
         return func
     return decorator
-
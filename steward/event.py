@@ -1,5 +1,9 @@
+import os
+import re
 import time
 import json
+import base64
+import itertools
 from nanoid import generate
 from enum import Enum, auto
 
@@ -12,20 +16,58 @@ class EventType(Enum):
     RESPONSE = auto()
     ERROR = auto()
 
+# Event IDs are a random per-process prefix plus a counter.  That is unique across processes
+# without paying for a secure random draw on every event.
+_ID_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_id_prefix = None
+_id_counter = None
+
+
+def _reset_ids():
+    global _id_prefix, _id_counter
+    _id_prefix = f"E:{generate(alphabet=_ID_ALPHABET, size=8)}."
+    _id_counter = itertools.count(1)
+
+
+def next_event_id():
+    return f"{_id_prefix}{next(_id_counter):x}"
+
+
+_reset_ids()
+# a forked child must not hand out the same IDs as its parent
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_ids)
+
+
 class StewardEvent:
-    def __init__(self, event_type, name=None, trigger_event=None, payload=None):
-        self.id = f"E:{generate(size=10)}"
+    """
+    An event on the Steward bus.
+
+    Events that answer or follow from another event carry two IDs instead of a copy of that
+    event: `causation_id` is the ID of the event that directly triggered this one, and
+    `correlation_id` is the ID of the event that started the whole chain.  Both are set from
+    `trigger_event` when one is given.  `triggering_event` itself is only a local reference;
+    it is never sent over the wire (see MessageAgent.get_event to resolve it on receipt).
+    """
+    __slots__ = ("id", "event_type", "name", "timestamp", "correlation_id", "causation_id", "triggering_event", "payload")
+
+    def __init__(self, event_type, name=None, trigger_event=None, payload=None, correlation_id=None, causation_id=None):
+        self.id = next_event_id()
         self.event_type = event_type
         self.name = name
-        self.timestamp = int(time.time() * 1000)
-        # ID of event that triggered this event (is this a response event)
+        self.timestamp = time.time_ns() // 1_000_000
         self.triggering_event = trigger_event
+        if trigger_event is not None:
+            causation_id = causation_id or trigger_event.id
+            correlation_id = correlation_id or trigger_event.correlation_id or trigger_event.id
+        self.correlation_id = correlation_id
+        self.causation_id = causation_id
         self.payload = payload
 
     def toJSON(self):
         if self.payload:
             try:
-                payload_json = json.dumps(self.payload)
+                payload_json = json.dumps(self.payload, default=_json_default)
             except Exception as e:
                 payload_json = str(e)
         else:
@@ -36,8 +78,9 @@ class StewardEvent:
             "id": self.id,
             "event_type": self.event_type.name,
             "name": self.name,
+            "correlation_id": self.correlation_id,
+            "causation_id": self.causation_id,
             "timestamp": self.timestamp,
-            "triggering_event": self.triggering_event.toJSON() if self.triggering_event else None,
             "payload": payload_json
         })
         
@@ -65,19 +108,167 @@ class StewardEvent:
     
     @staticmethod
     def fromJSON(json_str):
-        data = json.loads(json_str)
-        event_type = EventType[data["event_type"]]
-        trigger_event = StewardEvent.fromJSON(data["triggering_event"]) if data["triggering_event"] else None
-        payload = None
-        if data["payload"]:
-            try:
-                payload = json.loads(data["payload"])
-            except Exception as e:
-                payload = data["payload"]
+        return StewardEvent.fromDict(json.loads(json_str))
+
+    @staticmethod
+    def fromDict(data):
+        """
+        Build an event from an already parsed JSON envelope.
+        """
+        event = StewardEvent(
+            event_type=EventType[data["event_type"]],
+            name=data.get("name"),
+            payload=_decode_payload(data.get("payload")),
+            correlation_id=data.get("correlation_id"),
+            causation_id=data.get("causation_id")
+        )
+        # keep the identity the sender gave the event
+        event.id = data.get("id", event.id)
+        event.timestamp = data.get("timestamp", event.timestamp)
+        return event
+
+
+def _decode_payload(payload_json):
+    payload = None
+    if payload_json:
+        try:
+            if '"$bytes"' in payload_json:
+                payload = json.loads(payload_json, object_hook=_json_object_hook)
+            else:
+                payload = json.loads(payload_json)
+        except Exception as e:
+            payload = payload_json
+    return payload
+
+
+def _json_default(value):
+    # JSON has no bytes type, so bytes travel as base64 (the binary codec sends them raw)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$bytes": base64.b64encode(value).decode()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and "$bytes" in obj:
+        return base64.b64decode(obj["$bytes"])
+    return obj
+
+
+# toJSON always writes the id, event_type, name and chain IDs first.  Matching them with a
+# regex lets us route an event without parsing (and unescaping) the rest of the envelope.
+_JSON_STRING = r'"(?:[^"\\]|\\.)*"'
+_NULLABLE = r'(null|' + _JSON_STRING + r')'
+_HEADER_PATTERN = (
+    r'\{"id": (' + _JSON_STRING + r'), "event_type": "(\w+)", "name": ' + _NULLABLE
+    + r', "correlation_id": ' + _NULLABLE + r', "causation_id": ' + _NULLABLE
+)
+_HEADER_RE = re.compile(_HEADER_PATTERN)
+_HEADER_RE_BYTES = re.compile(_HEADER_PATTERN.encode())
 
-        return StewardEvent(
-            event_type=event_type,
+
+def _header_string(value):
+    if isinstance(value, bytes):
+        value = value.decode()
+    if value == "null":
+        return None
+    if "\\" in value:
+        return json.loads(value)
+    return value[1:-1]
+
+
+class LazyStewardEvent(StewardEvent):
+    """
+    A StewardEvent read from the wire that only decodes its header (id, name, event_type and
+    the chain IDs).
+
+    The timestamp and payload are decoded the first time one of them is read, so routing an
+    event nobody handles costs a regex match instead of two json.loads calls.
+
+    `loader` is a callable returning (timestamp, payload).  Each wire codec supplies its own.
+    `decode_time` is how long that took, in seconds (0 until it has run).  `frame` is the wire
+    frame the event was read from, when the MessageAgent has it, so the event can be forwarded
+    as it arrived; setting the timestamp or payload clears it.
+    """
+    __slots__ = ("_loader", "_timestamp", "_payload", "decode_time", "frame")
+
+    def __init__(self, id, event_type, name, loader, correlation_id=None, causation_id=None):
+        self.id = id
+        self.event_type = event_type
+        self.name = name
+        self.correlation_id = correlation_id
+        self.causation_id = causation_id
+        self.triggering_event = None
+        self._loader = loader
+        self._timestamp = None
+        self._payload = None
+        self.decode_time = 0.0
+        self.frame = None
+
+    @staticmethod
+    def fromJSON(json_str):
+        """
+        Read the event header from a JSON envelope (str or bytes) and defer the rest.
+        """
+        is_bytes = isinstance(json_str, (bytes, bytearray))
+        match = (_HEADER_RE_BYTES if is_bytes else _HEADER_RE).match(json_str)
+        if match:
+            event_type = match.group(2).decode() if is_bytes else match.group(2)
+            return LazyStewardEvent(
+                id=_header_string(match.group(1)),
+                event_type=EventType[event_type],
+                name=_header_string(match.group(3)),
+                correlation_id=_header_string(match.group(4)),
+                causation_id=_header_string(match.group(5)),
+                loader=lambda: _load_json_body(json.loads(json_str))
+            )
+
+        # not written by toJSON, fall back to parsing the envelope (the payload is still deferred)
+        data = json.loads(json_str)
+        return LazyStewardEvent(
+            id=data.get("id"),
+            event_type=EventType[data["event_type"]],
             name=data.get("name"),
-            trigger_event=trigger_event,
-            payload=payload
+            correlation_id=data.get("correlation_id"),
+            causation_id=data.get("causation_id"),
+            loader=lambda: _load_json_body(data)
         )
+
+    def _decode(self):
+        loader = self._loader
+        if loader is None:
+            return
+
+        start = time.perf_counter()
+        self._timestamp, self._payload = loader()
+        self._loader = None
+        self.decode_time = time.perf_counter() - start
+
+    @property
+    def is_decoded(self):
+        return self._loader is None
+
+    @property
+    def timestamp(self):
+        self._decode()
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value):
+        self._decode()
+        self._timestamp = value
+        self.frame = None
+
+    @property
+    def payload(self):
+        self._decode()
+        return self._payload
+
+    @payload.setter
+    def payload(self, value):
+        self._decode()
+        self._payload = value
+        self.frame = None
+
+
+def _load_json_body(data):
+    return data.get("timestamp"), _decode_payload(data.get("payload"))
@@ -0,0 +1,276 @@
+"""
+Run a plugin in its own worker processes.
+
+An isolated plugin is registered with the MessageAgent like any manifest plugin, but its
+events are forwarded over a pipe to one or more worker processes, each of which imports the
+plugin and dispatches the events with a MessageAgent of its own.  Anything the plugin
+publishes comes back over the same pipe and is published by the server.
+
+Events cross the pipe as the frames they arrived in (so the server never decodes their
+payload), and handlers answer in that codec exactly as they would in process.  A worker that exits, or whose resident memory
+grows past `max_rss_mb`, is restarted.
+"""
+import multiprocessing
+import os
+import signal
+import struct
+import threading
+import time
+
+from steward.codecs import DEFAULT_CODEC, codec_for, decode_event
+from steward.logger import get_logger
+from steward.steward_plugins import PluginStub, StewardPlugins
+
+_TOPIC = struct.Struct("!H")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _pack(topic, payload):
+    topic = topic.encode("utf-8")
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return _TOPIC.pack(len(topic)) + topic + payload
+
+
+def _unpack(data):
+    (size,) = _TOPIC.unpack_from(data)
+    end = _TOPIC.size + size
+    return data[_TOPIC.size:end].decode("utf-8"), data[end:]
+
+
+def read_rss(pid):
+    """
+    Resident set size of a process in bytes, or None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class _PipeMessage:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class _PipeClient:
+    """
+    Stands in for the MQTT client inside a worker: everything published goes back to the server.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self._lock:
+            self.conn.send_bytes(_pack(topic, payload or b""))
+
+    def publish_event(self, topic, event, codec=None):
+        codec = codec or DEFAULT_CODEC
+        self.publish(topic, codec.encode(event))
+
+
+def _worker_main(conn, plugin_dir, plugin_name, base_file, level):
+    # the server owns Ctrl-C and stops its workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from steward.message_agent import MessageAgent
+
+    logger = get_logger(name=f"steward-{plugin_name}", level=level, console=True, file=f"logs/plugin-{plugin_name}.log")
+    manager = StewardPlugins(logger=logger, client=_PipeClient(conn), base_file=base_file)
+    plugin = manager.load_plugin(plugin_dir, plugin_name)
+    if plugin is None:
+        logger.error(f"Isolated plugin {plugin_name} not found in {plugin_dir}")
+        return
+
+    # handlers run one at a time on this thread, in the order the server forwarded them
+    msgagent = MessageAgent(logger=logger, workers=0)
+    msgagent.find_event_handlers(plugin)
+    logger.debug(f"Isolated plugin {plugin_name} running in process {os.getpid()}")
+
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            break
+
+        topic, frame = _unpack(data)
+        try:
+            msgagent.process_event(decode_event(frame), _PipeMessage(topic, frame))
+        except Exception as e:
+            logger.exception(f"Failed to process event for {topic}: {e}")
+
+
+class _Worker:
+    """
+    One worker process and the thread that publishes what it sends back.
+    """
+    def __init__(self, plugin, index):
+        self.plugin = plugin
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.started_at = 0
+        self.restarts = 0
+        self._lock = threading.RLock()
+
+    @property
+    def name(self):
+        return f"steward-plugin-{self.plugin.name}-{self.index}"
+
+    @property
+    def logger(self):
+        return self.plugin.manager.logger
+
+    def start(self):
+        with self._lock:
+            context = self.plugin.context
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(child_conn, self.plugin.plugin_dir, self.plugin.name, self.plugin.manager.base_file, self.plugin.level),
+                name=self.name,
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+
+            self.process, self.conn = process, conn
+            self.started_at = time.monotonic()
+            threading.Thread(target=self._read_loop, args=(process, conn), name=f"{self.name}-reader", daemon=True).start()
+
+    def stop(self, timeout=2):
+        with self._lock:
+            process, conn = self.process, self.conn
+            self.process = self.conn = None
+
+        if conn:
+            conn.close()
+        if process and process.is_alive():
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def restart(self, reason, process=None):
+        # `process` is the one the caller saw fail, it may already have been replaced
+        with self._lock:
+            if not self.plugin.running or (process is not None and process is not self.process):
+                return
+            if self.logger:
+                self.logger.error(f"Restarting {self.name} ({reason})")
+            # a worker that dies straight after starting is probably failing on import, don't spin on it
+            backoff = time.monotonic() - self.started_at < 1
+
+        # outside the lock, so send() is not held up (events sent meanwhile are lost, as with any dead worker)
+        if backoff:
+            time.sleep(1)
+
+        with self._lock:
+            if not self.plugin.running or (process is not None and process is not self.process):
+                return
+            self.stop()
+            self.restarts += 1
+            self.start()
+
+    def send(self, topic, frame):
+        with self._lock:
+            conn = self.conn
+        try:
+            conn.send_bytes(_pack(topic, frame))
+            return True
+        except (OSError, AttributeError) as e:
+            # the reader notices the dead worker and restarts it, this event is lost
+            if self.logger:
+                self.logger.error(f"Unable to send event for {topic} to {self.name}: {e}")
+            return False
+
+    def rss(self):
+        process = self.process
+        return read_rss(process.pid) if process and process.pid else None
+
+    def _read_loop(self, process, conn):
+        client = self.plugin.manager.client
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+
+            topic, payload = _unpack(data)
+            try:
+                client.publish(topic, payload)
+            except Exception as e:
+                if self.logger:
+                    self.logger.exception(f"Failed to publish for {self.name}: {e}")
+
+        process.join(1)
+        self.restart(f"exited with code {process.exitcode}", process)
+
+
+class IsolatedPlugin(PluginStub):
+    """
+    A plugin that runs in worker processes instead of the server.
+
+    Events are routed to a worker by topic, so each topic's events are still handled in order.
+    Workers are started on the first event and checked every `check_interval` seconds for
+    memory growth.
+    """
+    def __init__(self, manager, plugin_name, plugin_dir, manifest, workers=None, max_rss_mb=None, check_interval=None):
+        super().__init__(manager, plugin_name, plugin_dir, manifest)
+
+        if workers is None:
+            workers = int(manifest.get("workers", os.getenv('STEWARD_ISOLATION_WORKERS', 1)))
+        if max_rss_mb is None:
+            max_rss_mb = float(manifest.get("max_rss_mb", os.getenv('STEWARD_ISOLATION_MAX_RSS_MB', 512)))
+        if check_interval is None:
+            check_interval = float(os.getenv('STEWARD_ISOLATION_CHECK_INTERVAL', 5))
+
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.check_interval = check_interval
+        self.level = manager.logger.level if manager.logger else "INFO"
+        # spawn, not fork: the server has paho and dispatch threads running
+        self.context = multiprocessing.get_context(os.getenv('STEWARD_ISOLATION_START_METHOD', 'spawn'))
+        self.workers = [_Worker(self, index) for index in range(max(1, workers))]
+        self.running = False
+        self._stop = threading.Event()
+
+    def load(self):
+        with self._lock:
+            if not self.running:
+                self.running = True
+                for worker in self.workers:
+                    worker.start()
+                threading.Thread(target=self._supervise, name=f"steward-plugin-{self.name}-supervisor", daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            self.running = False
+            self._stop.set()
+            for worker in self.workers:
+                worker.stop()
+
+    def dispatch(self, event, message=None):
+        self.load()
+
+        topic = message.topic if message else "steward/broadcast"
+        frame = getattr(event, "frame", None)
+        if frame is None:
+            # an event handed over as an object (loopback), or changed since it was read
+            codec = codec_for(message.payload) if message else DEFAULT_CODEC
+            frame = codec.encode(event)
+        worker = self.workers[hash(topic) % len(self.workers)]
+        worker.send(topic, frame)
+
+    def _supervise(self):
+        while not self._stop.wait(self.check_interval):
+            for worker in self.workers:
+                rss = worker.rss()
+                if rss is not None and rss > self.max_rss:
+                    worker.restart(f"using {rss / 1024 / 1024:.0f}MB, limit is {self.max_rss / 1024 / 1024:.0f}MB", worker.process)
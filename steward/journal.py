@@ -0,0 +1,325 @@
+"""
+Append-only binary journal of the events the server receives.
+
+The journal is a directory of segment files.  Each segment starts with MAGIC and holds a run
+of records:
+
+    q   recorded at (ms, the journal's clock)
+    B   event type ordinal
+    H   name length, name (utf-8)
+    H   topic length, topic (utf-8)
+    I   frame length, frame (the event exactly as it arrived, in its original codec)
+
+Appends are buffered and written by a background thread in one write per flush.  When a
+segment passes `segment_bytes` it is closed and its summary is written beside it: first and
+last timestamps, record counts per name and type, and a sparse index of (timestamp, offset)
+every `index_interval` bytes.  A query skips segments whose summary rules them out and seeks
+within a segment through the sparse index, reading the file through mmap.
+"""
+import bisect
+import copy
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from fnmatch import fnmatchcase
+
+from steward.codecs import decode_event
+from steward.event import EventType
+
+MAGIC = b"SJRNL\x01"
+SEGMENT_SUFFIX = ".journal"
+SUMMARY_SUFFIX = ".summary"
+
+_RECORD = struct.Struct("!qBHHI")
+_EVENT_TYPES = {event_type.value: event_type for event_type in EventType}
+
+
+class JournalRecord:
+    __slots__ = ("recorded_at", "event_type", "name", "topic", "frame")
+
+    def __init__(self, recorded_at, event_type, name, topic, frame):
+        self.recorded_at = recorded_at
+        self.event_type = event_type
+        self.name = name
+        self.topic = topic
+        self.frame = frame
+
+    def event(self):
+        return decode_event(self.frame)
+
+
+def _new_summary():
+    return {"first": None, "last": None, "records": 0, "names": {}, "types": {}, "index": []}
+
+
+def _add_to_summary(summary, recorded_at, type_name, name, offset, index_interval):
+    if summary["first"] is None:
+        summary["first"] = recorded_at
+    summary["last"] = recorded_at
+    summary["records"] += 1
+    summary["names"][name] = summary["names"].get(name, 0) + 1
+    summary["types"][type_name] = summary["types"].get(type_name, 0) + 1
+
+    index = summary["index"]
+    if not index or offset - index[-1][1] >= index_interval:
+        index.append([recorded_at, offset])
+
+
+def _iter_records(view, offset):
+    """
+    (offset, recorded_at, type ordinal, name, topic slice, frame slice) for each complete record
+    from `offset`.  A record cut short by a crash ends the iteration.
+    """
+    size = len(view)
+    while offset + _RECORD.size <= size:
+        recorded_at, type_ordinal, name_len, topic_len, frame_len = _RECORD.unpack_from(view, offset)
+        start = offset + _RECORD.size
+        end = start + name_len + topic_len + frame_len
+        if end > size:
+            return
+
+        name = str(view[start:start + name_len], "utf-8")
+        yield offset, recorded_at, type_ordinal, name, (start + name_len, start + name_len + topic_len), (end - frame_len, end)
+        offset = end
+
+
+def scan_segment(path, index_interval=64 * 1024):
+    """
+    Rebuild the summary of a segment that was never closed (the active one, or after a crash).
+    """
+    summary = _new_summary()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        for offset, recorded_at, type_ordinal, name, _, _ in _iter_records(view, len(MAGIC)):
+            _add_to_summary(summary, recorded_at, _EVENT_TYPES[type_ordinal].name, name, offset, index_interval)
+    return summary
+
+
+class JournalReader:
+    """
+    Query the segments of a journal directory.  `active` maps segment paths to summaries the
+    caller already has (the writer's open segment), anything else without a summary file is
+    scanned.
+    """
+    def __init__(self, directory, active=None):
+        self.directory = directory
+        self.active = active or {}
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        result = []
+        for item in sorted(os.listdir(self.directory)):
+            if not item.endswith(SEGMENT_SUFFIX):
+                continue
+            path = os.path.join(self.directory, item)
+            result.append((path, self.summary(path)))
+        return result
+
+    def summary(self, path):
+        if path in self.active:
+            return self.active[path]
+
+        summary_path = path[:-len(SEGMENT_SUFFIX)] + SUMMARY_SUFFIX
+        try:
+            with open(summary_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return scan_segment(path)
+
+    def query(self, start=None, end=None, names=None, event_types=None):
+        """
+        Records recorded between `start` and `end` (ms, inclusive), oldest first.  `names` are
+        event names or glob patterns ("FILE_*"), `event_types` are EventType values.
+        """
+        type_names = {event_type.name for event_type in event_types} if event_types else None
+
+        def wanted_name(name):
+            return names is None or any(fnmatchcase(name, pattern) for pattern in names)
+
+        for path, summary in self.segments():
+            if not summary["records"]:
+                continue
+            if end is not None and summary["first"] > end:
+                break
+            if start is not None and summary["last"] < start:
+                continue
+            if not any(wanted_name(name) for name in summary["names"]):
+                continue
+            if type_names is not None and type_names.isdisjoint(summary["types"]):
+                continue
+
+            yield from self._read_segment(path, summary, start, end, wanted_name, type_names)
+
+    def _read_segment(self, path, summary, start, end, wanted_name, type_names):
+        offset = len(MAGIC)
+        index = summary["index"]
+        if start is not None and index:
+            # the last index entry before `start`; every record after it is at least that new
+            position = bisect.bisect_left([entry[0] for entry in index], start) - 1
+            if position >= 0:
+                offset = index[position][1]
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for _, recorded_at, type_ordinal, name, topic, frame in _iter_records(view, offset):
+                if start is not None and recorded_at < start:
+                    continue
+                if end is not None and recorded_at > end:
+                    return
+
+                event_type = _EVENT_TYPES[type_ordinal]
+                if not wanted_name(name) or (type_names is not None and event_type.name not in type_names):
+                    continue
+
+                yield JournalRecord(recorded_at, event_type, name, str(view[topic[0]:topic[1]], "utf-8"), view[frame[0]:frame[1]])
+
+
+class EventJournal:
+    """
+    Writes events to the journal.  append() only packs the record and queues it; a writer
+    thread flushes the queue every `flush_interval` seconds, or sooner once `flush_bytes` are
+    waiting.
+    """
+    def __init__(self, directory=None, segment_bytes=None, flush_interval=None, flush_bytes=None, index_interval=None, logger=None):
+        if directory is None:
+            directory = os.getenv('STEWARD_JOURNAL_DIR', 'logs/journal')
+        if segment_bytes is None:
+            segment_bytes = int(float(os.getenv('STEWARD_JOURNAL_SEGMENT_MB', 64)) * 1024 * 1024)
+        if flush_interval is None:
+            flush_interval = float(os.getenv('STEWARD_JOURNAL_FLUSH_MS', 200)) / 1000
+        if flush_bytes is None:
+            flush_bytes = 1024 * 1024
+        if index_interval is None:
+            index_interval = int(float(os.getenv('STEWARD_JOURNAL_INDEX_KB', 64)) * 1024)
+
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.index_interval = index_interval
+        self.logger = logger
+
+        self._pending = []
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._running = True
+
+        self._file = None
+        self._path = None
+        self._offset = 0
+        self._summary = None
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, topic, event, frame):
+        """
+        Queue one received event.  `frame` is the event's wire encoding.  Ignored once the
+        journal is closed.
+        """
+        name = (event.name or "").encode("utf-8")
+        topic = topic.encode("utf-8")
+        record = b"".join((
+            _RECORD.pack(int(time.time() * 1000), event.event_type.value, len(name), len(topic), len(frame)),
+            name,
+            topic,
+            frame.encode("utf-8") if isinstance(frame, str) else frame
+        ))
+
+        with self._cond:
+            if not self._running:
+                return
+            self._pending.append(record)
+            self._pending_bytes += len(record)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="steward-journal", daemon=True)
+                self._writer.start()
+            if self._pending_bytes >= self.flush_bytes:
+                self._cond.notify()
+
+    def flush(self):
+        """
+        Write everything queued so far.
+        """
+        with self._write_lock:
+            with self._cond:
+                records, self._pending, self._pending_bytes = self._pending, [], 0
+            if records:
+                self._write(records)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.flush()
+        with self._write_lock:
+            self._close_segment()
+
+    def reader(self):
+        """
+        A JournalReader that sees everything appended so far, including the open segment.
+        """
+        self.flush()
+        with self._write_lock:
+            active = {self._path: copy.deepcopy(self._summary)} if self._path else {}
+            return JournalReader(self.directory, active=active)
+
+    def query(self, start=None, end=None, names=None, event_types=None):
+        return self.reader().query(start, end, names, event_types)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if self._pending_bytes < self.flush_bytes:
+                    self._cond.wait(self.flush_interval)
+
+            try:
+                self.flush()
+            except Exception as e:
+                if self.logger:
+                    self.logger.exception(f"Unable to write event journal: {e}")
+
+    def _write(self, records):
+        # called with self._write_lock held
+        chunk = []
+        for record in records:
+            if self._file is None or (self._offset + len(record) > self.segment_bytes and self._summary["records"]):
+                if chunk:
+                    self._file.write(b"".join(chunk))
+                    chunk = []
+                self._open_segment()
+
+            recorded_at, type_ordinal, name_len = _RECORD.unpack_from(record)[:3]
+            name = str(record[_RECORD.size:_RECORD.size + name_len], "utf-8")
+            _add_to_summary(self._summary, recorded_at, _EVENT_TYPES[type_ordinal].name, name, self._offset, self.index_interval)
+            chunk.append(record)
+            self._offset += len(record)
+
+        if chunk:
+            self._file.write(b"".join(chunk))
+        self._file.flush()
+
+    def _open_segment(self):
+        self._close_segment()
+
+        numbers = [int(item[:-len(SEGMENT_SUFFIX)]) for item in os.listdir(self.directory)
+                   if item.endswith(SEGMENT_SUFFIX) and item[:-len(SEGMENT_SUFFIX)].isdigit()]
+        self._path = os.path.join(self.directory, f"{max(numbers, default=0) + 1:08d}{SEGMENT_SUFFIX}")
+        self._file = open(self._path, "xb")
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._summary = _new_summary()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+
+        self._file.close()
+        with open(self._path[:-len(SEGMENT_SUFFIX)] + SUMMARY_SUFFIX, "w") as f:
+            json.dump(self._summary, f)
+        self._file = self._path = self._summary = None
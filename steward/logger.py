@@ -1,8 +1,9 @@
-import copy
+import atexit
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from nanoid import generate
 
 # Define colors
@@ -32,37 +33,116 @@ COLORS['WARN'] = COLORS['BRIGHT_YELLOW']
 COLORS['ERROR'] = COLORS['BRIGHT_RED']
 COLORS['DEBUG'] = COLORS['ORANGE']
 
+# payloads longer than this are truncated in log messages
+PAYLOAD_LIMIT = int(os.getenv('STEWARD_LOG_PAYLOAD_LIMIT', 200))
+
 
 # Define formatter
 class ColoredFormatter(logging.Formatter):
+    """
+    Colors the level name without touching the record: each level gets its own formatter
+    with the color codes baked into the format string.
+    """
+    def __init__(self, fmt=None, datefmt=None, style='%'):
+        super().__init__(fmt, datefmt, style)
+        self._formatters = {}
+
+    def _formatter(self, levelname):
+        formatter = self._formatters.get(levelname)
+        if formatter is None:
+            color = COLORS.get(levelname, COLORS['DEFAULT'])
+            fmt = self._fmt.replace('%(levelname)s', f"{color}%(levelname)s{COLORS['DEFAULT']}")
+            formatter = self._formatters[levelname] = logging.Formatter(fmt, self.datefmt)
+        return formatter
+
     def format(self, record):
-        clone = copy.deepcopy(record)
-        levelname = clone.levelname
-        color = COLORS.get(levelname, COLORS['DEFAULT'])
-        clone.levelname = f"{color}{levelname}{COLORS['DEFAULT']}"
-        return super().format(clone)
+        return self._formatter(record.levelname).format(record)
 
 class FileFormatter(logging.Formatter):
-    def format(self, record):
-        clone = copy.deepcopy(record)
-        return super().format(clone)
+    pass
 
-def get_logger(name=None, level="INFO", console=False, file=None, mode="a"):
+
+class LazyPayload:
+    """
+    Defers formatting a (possibly large) payload until a log record is actually emitted, and
+    truncates it to `limit` characters.  Use with %-style logging arguments:
+
+        logger.debug("MSG: %s %s", topic, LazyPayload(message.payload))
+    """
+    __slots__ = ("payload", "limit")
+
+    def __init__(self, payload, limit=None):
+        self.payload = payload
+        self.limit = limit if limit is not None else PAYLOAD_LIMIT
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            size = len(payload)
+            text = bytes(payload[:self.limit]).decode('utf-8', errors='replace')
+        else:
+            text = payload if isinstance(payload, str) else repr(payload)
+            size = len(text)
+            text = text[:self.limit]
+
+        if size > self.limit:
+            return f"{text}... ({size} bytes)"
+        return text
+
+    __repr__ = __str__
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    A QueueHandler that only does what must happen on the calling thread: the message is
+    rendered (so mutable arguments are captured) and a traceback is turned into text.
+    Formatting and I/O happen on the listener thread.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+_listeners = []
+
+
+def stop_listeners():
+    """
+    Write out everything still queued and stop the listener threads (runs at exit).
+    """
+    while _listeners:
+        _listeners.pop().stop()
+
+atexit.register(stop_listeners)
+
+def get_logger(name=None, level="INFO", console=False, file=None, mode="a", queued=None):
     """
     Generate a logging object
+
+    With `queued` (the default, see STEWARD_LOG_QUEUE) the console and file handlers run on a
+    background listener thread and the caller only puts the record on a queue.
     """
     if not name:
         # set the name to a unique identifier 
         name = f"L{generate(size=8)}"
 
+    if queued is None:
+        queued = os.getenv('STEWARD_LOG_QUEUE', '1').lower() not in ('0', 'false', 'no')
+
     output = logging.getLogger(name)
     output.setLevel(level)
+    handlers = []
     
     if console:
         ch = logging.StreamHandler(sys.stdout)
         # ch.setLevel(level)
         ch.setFormatter(ColoredFormatter(f'[%(asctime)s][%(levelname)s] %(message)s'))
-        output.addHandler(ch)
+        handlers.append(ch)
     
     if file:
         if not os.path.exists(file):
@@ -73,7 +153,17 @@ def get_logger(name=None, level="INFO", console=False, file=None, mode="a"):
         fh = RotatingFileHandler(file, maxBytes=10 * 1024 * 1024, backupCount=10, mode=mode)
         # fh.setLevel(level)
         fh.setFormatter(FileFormatter('[%(asctime)s][%(levelname)s] %(message)s'))
-        output.addHandler(fh)
+        handlers.append(fh)
+
+    if queued and handlers:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+        output.addHandler(_DeferredQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            output.addHandler(handler)
     
     # Map log levels to the specific log methods
     output.log_methods = {
@@ -1,37 +1,534 @@
+import asyncio
+import heapq
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future
 from functools import wraps
-from steward.event import StewardEvent
-from steward.logger import get_logger
+from types import MappingProxyType
+from steward.event import StewardEvent, EventType
+from steward.codecs import DEFAULT_CODEC, decode_event, split_frames
+from steward.aio import make_engine
+from steward.lanes import CONTROL_EVENTS, DEFAULT_LANE_SHED, DEFAULT_LANE_WEIGHTS, Lanes, parse_lane_names, parse_lane_setting
+from steward.logger import LazyPayload
+from steward.metrics import HandlerMetrics
+from steward.profiler import boot_profiler
 
+# sentinel returned by a closed worker queue to ask the worker to exit
+_STOP = object()
+
+class LaneQueue(Lanes):
+    """
+    A worker queue split into one FIFO lane per EventType (see steward.lanes).
+
+    get() serves the lanes by weighted round robin and blocks while they are empty.  When a
+    lane in `shed` is full, put() drops the item at once (the network thread is never blocked
+    for low priority traffic).  Other lanes block for up to the put() timeout before dropping.
+    A `control` item is never dropped or blocked, it goes in over the limit.
+    """
+    def __init__(self, weights, limits, shed=()):
+        super().__init__(weights, limits, shed)
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item, lane, timeout=None, control=False):
+        """
+        Add an item to a lane.  Returns False if it was dropped.
+        """
+        with self._cond:
+            if self.is_full(lane) and not control:
+                if lane in self.shed or not self._cond.wait_for(lambda: not self.is_full(lane), timeout):
+                    self.dropped[lane] += 1
+                    return False
+
+            self.append(item, lane)
+            self._cond.notify_all()
+            return True
+
+    def get(self):
+        """
+        Take the next item by weighted round robin.  Returns _STOP once closed and drained.
+        """
+        with self._cond:
+            while not self._size:
+                if self._closed:
+                    return _STOP
+                self._cond.wait()
+
+            item = self.take()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class DispatchEngine:
+    """
+    Run event handlers on a pool of worker threads instead of the MQTT network thread.
+
+    Each worker owns a LaneQueue.  Jobs are assigned to a worker by topic, so everything of one
+    EventType published on one topic (i.e. one client) is handled in the order it arrived,
+    while different topics are handled in parallel.  Within a worker, interactive COMMAND
+    and QUERY lanes are served ahead of a flood of NOTICE traffic (see LaneQueue).
+
+    When a lane is full, submit() blocks the caller (the paho network thread) for up to
+    `full_timeout` seconds.  That stops reading from the broker and lets TCP flow control push
+    back on publishers.  If the lane is still full after that the job is dropped and counted,
+    so a stuck handler cannot starve the MQTT keepalives forever.  Shed lanes drop at once.
+    Lifecycle notices (steward.lanes.CONTROL_EVENTS) are never dropped.
+
+    A pool size of 0 runs every job inline on the calling thread.
+    """
+    def __init__(self, workers=4, queue_size=1000, full_timeout=5.0, logger=None, lane_weights=None, lane_limits=None, shed_lanes=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.full_timeout = full_timeout
+        self.logger = logger
+        self.lane_weights = lane_weights or parse_lane_setting(DEFAULT_LANE_WEIGHTS)
+        self.lane_limits = {event_type: queue_size for event_type in EventType}
+        self.lane_limits.update(lane_limits or {})
+        self.shed_lanes = parse_lane_names(DEFAULT_LANE_SHED) if shed_lanes is None else set(shed_lanes)
+        self._queues = []
+        self._threads = []
+        self._retired_drops = {event_type: 0 for event_type in EventType}
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    @property
+    def dropped(self):
+        return sum(self.dropped_by_type().values())
+
+    def dropped_by_type(self):
+        """
+        Number of dropped events per EventType name, across all workers.
+        """
+        totals = dict(self._retired_drops)
+        for q in list(self._queues):
+            for event_type, count in q.dropped.items():
+                totals[event_type] += count
+        return {event_type.name: count for event_type, count in totals.items()}
+
+    def start(self):
+        with self._lock:
+            if self._threads or self.workers < 1:
+                return
+
+            for i in range(self.workers):
+                q = LaneQueue(self.lane_weights, self.lane_limits, self.shed_lanes)
+                t = threading.Thread(target=self._worker, args=(q,), name=f"steward-dispatch-{i}", daemon=True)
+                self._queues.append(q)
+                self._threads.append(t)
+                t.start()
+
+    def stop(self, timeout=5):
+        with self._lock:
+            queues, threads = self._queues, self._threads
+            self._queues, self._threads = [], []
+
+        for q in queues:
+            q.close()
+            for event_type, count in q.dropped.items():
+                self._retired_drops[event_type] += count
+
+        for t in threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+
+    def submit(self, topic, job, *args, lane=EventType.UNKNOWN, control=False):
+        """
+        Queue job(*args) in the `lane` of the worker that owns `topic`.  A `control` job is
+        queued even when the lane is full.
+
+        Returns False if the job was dropped because the lane stayed full.
+        """
+        if self.workers < 1:
+            self._run(job, args)
+            return True
+
+        if not self._threads:
+            self.start()
+
+        queues = self._queues
+        q = queues[hash(topic) % len(queues)]
+        if not q.put((job, args), lane, timeout=self.full_timeout, control=control):
+            if self.logger:
+                self.logger.error(f"Dispatch lane {lane.name} full, dropping event for {topic} ({self.dropped} dropped)")
+            return False
+
+        return True
+
+    def _worker(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                break
+            job, args = item
+            self._run(job, args)
+
+    def _run(self, job, args):
+        try:
+            job(*args)
+        except Exception as e:
+            if self.logger:
+                self.logger.exception(f"Event handler failed: {e}")
+
+
+class EventCache:
+    """
+    Bounded LRU of recent events keyed by event ID.
+
+    Events only carry the ID of the event that caused them, so this is how a handler gets
+    back to the triggering event without the whole chain being sent with every message.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event):
+        with self._lock:
+            self._events[event.id] = event
+            self._events.move_to_end(event.id)
+            if len(self._events) > self.maxsize:
+                self._events.popitem(last=False)
+
+    def get(self, event_id):
+        if event_id is None:
+            return None
+
+        with self._lock:
+            event = self._events.get(event_id)
+            if event is not None:
+                self._events.move_to_end(event_id)
+            return event
+
+
+class PendingRequests:
+    """
+    Requests waiting for a reply, keyed by the request event's ID.
+
+    add() returns a concurrent.futures.Future that resolves to the first RESPONSE or ERROR
+    event whose causation_id matches.  Callers check `event.is_error` on the result.  A
+    request that is not answered within its timeout fails with TimeoutError and is removed,
+    so the table cannot grow without bound.
+
+    Resolved futures have a `latency` attribute with the round trip time in seconds.
+    """
+    def __init__(self):
+        self._pending = {}
+        self._deadlines = []
+        self._cond = threading.Condition()
+        self._reaper = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, event_id):
+        return event_id in self._pending
+
+    def add(self, event_id, timeout=30):
+        future = Future()
+        future.sent_at = time.perf_counter()
+        future.latency = None
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self._pending[event_id] = (future, deadline)
+            heapq.heappush(self._deadlines, (deadline, event_id))
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._expire_loop, name="steward-pending", daemon=True)
+                self._reaper.start()
+            self._cond.notify()
+
+        return future
+
+    def resolve(self, event):
+        """
+        Complete the request `event` answers.  Returns False if nothing was waiting for it.
+        """
+        with self._cond:
+            entry = self._pending.pop(event.causation_id, None)
+        if entry is None:
+            return False
+
+        future, _ = entry
+        if not future.done():
+            future.latency = time.perf_counter() - future.sent_at
+            future.set_result(event)
+        return True
+
+    def _expire_loop(self):
+        while True:
+            expired = []
+            with self._cond:
+                while not self._deadlines:
+                    self._cond.wait()
+
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    deadline, event_id = heapq.heappop(self._deadlines)
+                    entry = self._pending.get(event_id)
+                    if entry and entry[1] == deadline:
+                        del self._pending[event_id]
+                        expired.append((event_id, entry[0]))
+
+                if not expired and self._deadlines:
+                    self._cond.wait(self._deadlines[0][0] - now)
+
+            for event_id, future in expired:
+                if not future.done():
+                    future.set_exception(TimeoutError(f"No response to {event_id}"))
+
+
+# events that can start a chain.  Responses and errors end one, so they are not worth caching
+_CAUSE_TYPES = (EventType.NOTICE, EventType.COMMAND, EventType.QUERY)
+_REPLY_TYPES = (EventType.RESPONSE, EventType.ERROR)
 
 
 class MessageAgent:
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, workers=None, queue_size=None, journal=None, metrics=None):
         self.logger = logger
         self.handlers = {}
-        self.event_log = get_logger(name="event", level="DEBUG", console=False, file="logs/event.log")
+        # immutable (event name, EventType) -> handlers lookup, rebuilt whenever a handler is added
+        self.dispatch_index = MappingProxyType({})
+        self._index_lock = threading.RLock()
+        self._deferred = 0
+        self.recent_events = EventCache(int(os.getenv('STEWARD_EVENT_CACHE_SIZE', 1024)))
+        self.pending = PendingRequests()
+        # an EventJournal that records every event received, or None
+        self.journal = journal
+        # per-handler counters and latencies, None when STEWARD_METRICS is off
+        if metrics is None:
+            metrics = os.getenv('STEWARD_METRICS', '1').lower() in ('1', 'true', 'yes')
+        self.metrics = HandlerMetrics() if metrics else None
+
+        if workers is None:
+            workers = int(os.getenv('STEWARD_DISPATCH_WORKERS', 4))
+        if queue_size is None:
+            queue_size = int(os.getenv('STEWARD_DISPATCH_QUEUE_SIZE', 1000))
+        full_timeout = float(os.getenv('STEWARD_DISPATCH_FULL_TIMEOUT', 5))
+        lane_weights = parse_lane_setting(os.getenv('STEWARD_LANE_WEIGHTS', DEFAULT_LANE_WEIGHTS))
+        lane_limits = parse_lane_setting(os.getenv('STEWARD_LANE_LIMITS', ''))
+        shed_lanes = parse_lane_names(os.getenv('STEWARD_LANE_SHED', DEFAULT_LANE_SHED))
 
-    def add_handler(self, event_name, handler_func):
-        self.logger.warn(f"Adding handler for {event_name} : {handler_func}")
-        if event_name in self.handlers:
-            self.handlers[event_name].append(handler_func)
-        else:
-            self.handlers[event_name] = [handler_func]
+        self.engine = DispatchEngine(
+            workers=workers,
+            queue_size=queue_size,
+            full_timeout=full_timeout,
+            logger=logger,
+            lane_weights=lane_weights,
+            lane_limits=lane_limits,
+            shed_lanes=shed_lanes
+        )
+        self._dispatch_job = self.dispatch
+
+    def use_asyncio(self, loop):
+        """
+        Switch to the asyncio runtime: handlers are dispatched as tasks on `loop`.
+        """
+        self.engine.stop()
+        self.engine = make_engine(loop, logger=self.logger)
+        self._dispatch_job = self.dispatch_async
+
+    def add_handler(self, event_name, handler_func, event_types=None):
+        """
+        Register a handler for an event name.
+
+        `event_types` is an optional collection of EventType values the handler accepts.
+        Handlers without one are registered for every EventType.
+        """
+        if self.logger:
+            self.logger.warn(f"Adding handler for {event_name} : {handler_func}")
+
+        with self._index_lock:
+            if event_name in self.handlers:
+                self.handlers[event_name].append((handler_func, event_types))
+            else:
+                self.handlers[event_name] = [(handler_func, event_types)]
+            if not self._deferred:
+                self._build_index()
+
+    def remove_handlers(self, owner):
+        """
+        Unregister every handler that is a method of `owner` (a plugin instance or stub).
+        Events already queued keep the handlers they were dispatched with.
+        """
+        with self._index_lock:
+            for event_name in list(self.handlers):
+                entries = [entry for entry in self.handlers[event_name] if getattr(entry[0], '__self__', None) is not owner]
+                if entries:
+                    self.handlers[event_name] = entries
+                else:
+                    del self.handlers[event_name]
+            if not self._deferred:
+                self._build_index()
+
+    @contextmanager
+    def handler_update(self):
+        """
+        Group add_handler/remove_handlers calls so dispatch sees them as one change.
+        """
+        with self._index_lock:
+            self._deferred += 1
+            try:
+                yield
+            finally:
+                self._deferred -= 1
+                if not self._deferred:
+                    self._build_index()
+
+    def _build_index(self):
+        index = {}
+        for event_name, entries in self.handlers.items():
+            for handler_func, event_types in entries:
+                for event_type in (event_types or EventType):
+                    index.setdefault((event_name, event_type), []).append(handler_func)
+
+        # readers never lock; they always see either the old or the new complete index
+        self.dispatch_index = MappingProxyType({key: tuple(value) for key, value in index.items()})
 
     def find_event_handlers(self, target):
-        for attr_name in dir(target):
-            attr = getattr(target, attr_name)
-            if callable(attr) and hasattr(attr, 'handles_event'):
-                event = attr.handles_event
-                if event:
-                    self.add_handler(event, attr)
+        with boot_profiler.phase("find_event_handlers", target=type(target).__name__):
+            for attr_name in dir(target):
+                attr = getattr(target, attr_name)
+                if callable(attr) and hasattr(attr, 'handles_event'):
+                    event = attr.handles_event
+                    if event:
+                        self.add_handler(event, attr, getattr(attr, 'handles_event_types', None))
+
+    def remember(self, event):
+        """
+        Keep an event (usually one we are about to publish) so replies to it can be resolved.
+        """
+        self.recent_events.add(event)
+
+    def get_event(self, event_id):
+        """
+        Look up a recently seen event by ID, or None if it has aged out of the cache.
+        """
+        return self.recent_events.get(event_id)
+
+    def start(self):
+        self.engine.start()
+
+    def stop(self):
+        self.engine.stop()
+        if self.journal:
+            self.journal.close()
 
     def message_processor(self, client, userdata, message):
         if self.logger:
-            self.logger.warn(f"MSG: [{message.topic} {str(message.payload)}")
-        
-        event = StewardEvent.fromJSON(message.payload.decode())
-        if event.name in self.handlers:
-            for handler in list(self.handlers[event.name]):
-                handler(event, message)
+            # arguments are only formatted if debug logging is on, and the payload is truncated
+            self.logger.debug("MSG: [%s] %s", message.topic, LazyPayload(message.payload))
+
+        if isinstance(message.payload, StewardEvent):
+            # the loopback transport hands over the event itself
+            if self.journal:
+                self.journal.append(message.topic, message.payload, DEFAULT_CODEC.encode(message.payload))
+            self.process_event(message.payload, message)
+            return
+
+        # only the headers are decoded here, the payload is decoded by the handler that reads it.
+        # A message may carry a batch of events, each is routed on its own.
+        timed = self.metrics is not None
+        for frame in split_frames(message.payload):
+            if timed:
+                start = time.perf_counter()
+                event = decode_event(frame)
+                decode_time = time.perf_counter() - start
+            else:
+                event = decode_event(frame)
+                decode_time = 0.0
+            event.frame = frame
+            if self.journal:
+                self.journal.append(message.topic, event, frame)
+            self.process_event(event, message, decode_time)
+
+    def process_event(self, event, message, decode_time=0.0):
+        """
+        Route one decoded event to its handlers.  `decode_time` is the time spent decoding its
+        header, for the metrics.
+        """
+        if event.causation_id and event.event_type in _REPLY_TYPES and event.causation_id in self.pending:
+            self.pending.resolve(event)
+
+        handlers = self.dispatch_index.get((event.name, event.event_type))
+        if not handlers:
+            return
+
+        if event.event_type in _CAUSE_TYPES:
+            self.recent_events.add(event)
+        queued_at = time.perf_counter() if self.metrics is not None else 0.0
+        self.engine.submit(message.topic, self._dispatch_job, event, message, handlers, decode_time, queued_at,
+                           lane=event.event_type, control=event.name in CONTROL_EVENTS)
+
+    def dispatch(self, event, message, handlers, decode_time=0.0, queued_at=0.0):
+        """
+        Call each handler for the event.  Runs on a dispatch worker thread.
+        """
+        if event.causation_id and event.triggering_event is None:
+            event.triggering_event = self.recent_events.get(event.causation_id)
+
+        metrics = self.metrics
+        queue_wait = time.perf_counter() - queued_at if queued_at else 0.0
+        for handler in handlers:
+            failed = False
+            decoded_before = getattr(event, "decode_time", 0.0)
+            start = time.perf_counter()
+            try:
+                result = handler(event, message)
+                if inspect.iscoroutine(result):
+                    # an async handler outside the asyncio runtime
+                    asyncio.run(result)
+            except Exception as e:
+                failed = True
+                if self.logger:
+                    self.logger.exception(f"Handler {handler} failed for {event.name}: {e}")
+            if metrics is not None:
+                self._record(metrics, event, handler, decode_time, decoded_before, queue_wait, start, failed)
+
+    async def dispatch_async(self, event, message, handlers, decode_time=0.0, queued_at=0.0):
+        """
+        Call each handler for the event under the asyncio runtime.  Async handlers are awaited
+        on the loop, sync handlers run on the engine's executor.
+        """
+        if event.causation_id and event.triggering_event is None:
+            event.triggering_event = self.recent_events.get(event.causation_id)
+
+        metrics = self.metrics
+        queue_wait = time.perf_counter() - queued_at if queued_at else 0.0
+        for handler in handlers:
+            failed = False
+            decoded_before = getattr(event, "decode_time", 0.0)
+            start = time.perf_counter()
+            try:
+                result = await self.engine.run_handler(handler, event, message)
+                if inspect.iscoroutine(result):
+                    # a sync handler that handed back async work (a PluginStub loading an async plugin)
+                    await result
+            except Exception as e:
+                failed = True
+                if self.logger:
+                    self.logger.exception(f"Handler {handler} failed for {event.name}: {e}")
+            if metrics is not None:
+                self._record(metrics, event, handler, decode_time, decoded_before, queue_wait, start, failed)
 
+    @staticmethod
+    def _record(metrics, event, handler, decode_time, decoded_before, queue_wait, start, failed):
+        elapsed = time.perf_counter() - start
+        # a lazy payload decoded while the handler ran counts as decoding, not handler time
+        payload_decode = getattr(event, "decode_time", 0.0) - decoded_before
+        metrics.record(event.name, handler, queue_wait, decode_time + payload_decode, elapsed - payload_decode, failed)
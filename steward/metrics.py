@@ -0,0 +1,257 @@
+"""
+Per-handler counters and latency histograms for the message agent.
+
+For every (event name, handler) pair the agent records how many events were handled, how
+many handlers raised, and three latencies:
+
+    queue_wait  from the event being routed to a dispatch worker picking it up
+    decode      decoding the event header, plus the payload if the handler read it
+    execution   running the handler (payload decoding excluded)
+
+Histograms have fixed power-of-two buckets in microseconds, so recording a value is an
+integer bit_length() and a list increment.  Each thread records into its own set of
+histograms, and snapshot() merges them, so recording never takes a lock.
+"""
+import os
+import threading
+import time
+
+# bucket i counts durations below 2**i microseconds (bucket 0 is under 1us); the last bucket
+# also takes everything longer, about 67 seconds and up
+BUCKETS = 27
+_LAST = BUCKETS - 1
+BUCKET_BOUNDS = [2 ** i / 1e6 for i in range(BUCKETS)]
+
+LATENCIES = ("queue_wait", "decode", "execution")
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0.0
+
+    def observe(self, seconds):
+        bucket = int(seconds * 1e6).bit_length()
+        self.counts[bucket if bucket < _LAST else _LAST] += 1
+        self.total += seconds
+
+    def merge(self, other):
+        counts = self.counts
+        for bucket, count in enumerate(other.counts):
+            counts[bucket] += count
+        self.total += other.total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, fraction):
+        """
+        Upper bound (seconds) of the bucket holding the `fraction` percentile, or None if empty.
+        """
+        count = self.count
+        if not count:
+            return None
+
+        rank = max(1, round(fraction * count))
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKET_BOUNDS[bucket]
+        return BUCKET_BOUNDS[_LAST]
+
+    def summary(self):
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": ms(self.total / count) if count else None,
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+        }
+
+
+class HandlerStats:
+    __slots__ = ("count", "errors", "queue_wait", "decode", "execution")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.queue_wait = Histogram()
+        self.decode = Histogram()
+        self.execution = Histogram()
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        for name in LATENCIES:
+            getattr(self, name).merge(getattr(other, name))
+
+
+def handler_name(handler):
+    """
+    "PluginClass.method" for a bound method, the qualified name for anything else.  An owner
+    with a `metrics_label` (plugin stubs) is named by that instead of its class.
+    """
+    owner = getattr(handler, "__self__", None)
+    name = getattr(handler, "__name__", None) or type(handler).__name__
+    if owner is not None:
+        return f"{getattr(owner, 'metrics_label', None) or type(owner).__name__}.{name}"
+    return getattr(handler, "__qualname__", name)
+
+
+def _name_key(handler):
+    """
+    What handler_name() depends on.  Bound methods are keyed by their class and function, so
+    the cache holds no plugin instance and a reloaded plugin reuses its old entries.
+    """
+    owner = getattr(handler, "__self__", None)
+    if owner is None:
+        return handler
+    return type(owner), getattr(owner, "metrics_label", None), getattr(handler, "__func__", None) or getattr(handler, "__name__", None)
+
+
+class HandlerMetrics:
+    """
+    Collects HandlerStats per (event name, handler name).
+    """
+    def __init__(self):
+        self.started = time.time()
+        self._local = threading.local()
+        self._shards = []
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, event_name, handler, queue_wait, decode, elapsed, failed=False):
+        name_key = _name_key(handler)
+        name = self._names.get(name_key)
+        if name is None:
+            name = self._names[name_key] = handler_name(handler)
+
+        shard = self._shard()
+        key = (event_name, name)
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = HandlerStats()
+
+        stats.count += 1
+        if failed:
+            stats.errors += 1
+        stats.queue_wait.observe(queue_wait)
+        stats.decode.observe(decode)
+        stats.execution.observe(elapsed)
+
+    def merged(self):
+        """
+        {(event name, handler name): HandlerStats} across every thread.
+        """
+        with self._lock:
+            shards = list(self._shards)
+
+        totals = {}
+        for shard in shards:
+            for key, stats in list(shard.items()):
+                total = totals.get(key)
+                if total is None:
+                    total = totals[key] = HandlerStats()
+                total.merge(stats)
+        return totals
+
+    def snapshot(self):
+        """
+        A JSON friendly summary: counts and latency percentiles for each event and handler.
+        """
+        handlers = []
+        for (event_name, name), stats in sorted(self.merged().items()):
+            row = {"event": event_name, "handler": name, "count": stats.count, "errors": stats.errors}
+            for latency in LATENCIES:
+                row[latency] = getattr(stats, latency).summary()
+            handlers.append(row)
+
+        return {
+            "since": int(self.started * 1000),
+            "uptime_s": round(time.time() - self.started, 3),
+            "handlers": handlers,
+        }
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+            self.started = time.time()
+
+    def prometheus(self, extra=None):
+        """
+        The metrics in the Prometheus text exposition format.  `extra` maps further counter
+        names to {label value: count} for the `type` label (e.g. dropped events per EventType).
+        """
+        lines = [
+            "# HELP steward_handler_events_total Events handled, per event and handler.",
+            "# TYPE steward_handler_events_total counter",
+        ]
+        merged = sorted(self.merged().items())
+        for (event_name, name), stats in merged:
+            lines.append(f'steward_handler_events_total{{{_labels(event_name, name)}}} {stats.count}')
+
+        lines += [
+            "# HELP steward_handler_errors_total Handler calls that raised, per event and handler.",
+            "# TYPE steward_handler_errors_total counter",
+        ]
+        for (event_name, name), stats in merged:
+            lines.append(f'steward_handler_errors_total{{{_labels(event_name, name)}}} {stats.errors}')
+
+        for latency in LATENCIES:
+            metric = f"steward_handler_{latency}_seconds"
+            lines += [f"# HELP {metric} {latency.replace('_', ' ').capitalize()} time, per event and handler.",
+                      f"# TYPE {metric} histogram"]
+            for (event_name, name), stats in merged:
+                histogram = getattr(stats, latency)
+                labels = _labels(event_name, name)
+                cumulative = 0
+                for bucket, count in enumerate(histogram.counts[:_LAST]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels},le="{BUCKET_BOUNDS[bucket]:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.total:.6f}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+
+        for metric, values in (extra or {}).items():
+            lines.append(f"# TYPE {metric} counter")
+            for label, value in sorted(values.items()):
+                lines.append(f'{metric}{{type="{_escape(label)}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, extra=None):
+        """
+        Replace `path` with the Prometheus text (for node_exporter's textfile collector).
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.prometheus(extra))
+        os.replace(temp_path, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(event_name, name):
+    return f'event="{_escape(event_name)}",handler="{_escape(name)}"'
@@ -1,5 +1,6 @@
 from steward.decorators import is_event_handler
 from steward.event import StewardEvent, EventType
+from steward.codecs import codec_for
 import os
 
 class BasePlugin:
@@ -13,6 +14,12 @@ class BasePlugin:
     
     def set_mqtt_client(self, client):
         self.mqtt_client = client  
+
+    def unload(self):
+        # called when a reload replaces this plugin; release any files, threads or connections here
+        pass
     
     def send_response_event(self, message, event):
-        self.mqtt_client.publish(message.topic, event.toJSON())
\ No newline at end of file
+        # answer in the codec the request was written with
+        codec = codec_for(message.payload)
+        self.mqtt_client.publish_event(message.topic, event, codec)
\ No newline at end of file
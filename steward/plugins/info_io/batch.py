@@ -0,0 +1,174 @@
+"""
+FILE_BATCH: many file operations in one command.
+
+    {"operations": [
+        {"op": "mkdir", "path": "/data/new"},
+        {"op": "write", "path": "/data/new/a.txt", "contents": "..."},
+        {"op": "move", "path": "/data/old.txt", "new_path": "/data/new/old.txt"},
+        {"op": "read", "path": "/data/other.txt", "binary": true}
+    ]}
+
+Operations run on a thread pool.  Two operations depend on each other when their paths
+overlap (the same path, or one inside the other) and at least one of them changes the file
+system; a dependent operation starts only after the earlier one has finished, so the batch
+behaves as if it ran in order.  If an operation fails, the operations that depend on it are
+skipped.  Operations are attempted directly, without an os.access() check first; a failure
+is reported in that operation's result.
+"""
+import os
+import threading
+
+READS = {"read"}
+OPERATIONS = {"read", "write", "move", "mkdir"}
+
+
+class BatchError(Exception):
+    pass
+
+
+def _paths(operation):
+    paths = [os.path.abspath(operation["path"])]
+    if operation["op"] == "move":
+        paths.append(os.path.abspath(operation["new_path"]))
+    return paths
+
+
+def _overlaps(a, b):
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def dependencies(operations):
+    """
+    For each operation, the indexes of the earlier operations it has to wait for.
+    """
+    seen = []
+    result = []
+    for operation in operations:
+        paths = _paths(operation)
+        reads = operation["op"] in READS
+        depends = set()
+        for index, (other_paths, other_reads) in enumerate(seen):
+            if reads and other_reads:
+                continue
+            if any(_overlaps(a, b) for a in paths for b in other_paths):
+                depends.add(index)
+        seen.append((paths, reads))
+        result.append(depends)
+    return result
+
+
+def validate(operations, max_operations):
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("No operations")
+    if len(operations) > max_operations:
+        raise BatchError(f"Too many operations (at most {max_operations})")
+
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS or not operation.get("path"):
+            raise BatchError(f"Operation {index} is not valid")
+        if operation["op"] == "move" and not operation.get("new_path"):
+            raise BatchError(f"Operation {index} has no new_path")
+        if operation["op"] == "write" and "contents" not in operation:
+            raise BatchError(f"Operation {index} has no contents")
+
+
+def run_operation(operation):
+    op = operation["op"]
+    path = operation["path"]
+    if op == "read":
+        with open(path, "rb" if operation.get("binary") else "r") as f:
+            return f.read()
+    if op == "write":
+        contents = operation["contents"]
+        with open(path, "wb" if isinstance(contents, bytes) else "w") as f:
+            f.write(contents)
+        return "File written"
+    if op == "move":
+        os.rename(path, operation["new_path"])
+        return "File moved"
+    if operation.get("parents"):
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.mkdir(path)
+    return "Directory created"
+
+
+def describe_error(e):
+    if isinstance(e, FileNotFoundError):
+        return "File not found"
+    if isinstance(e, FileExistsError):
+        return "Already exists"
+    if isinstance(e, PermissionError):
+        return "Permission denied"
+    if isinstance(e, IsADirectoryError):
+        return "Is a directory"
+    return "An error occurred"
+
+
+class BatchRun:
+    """
+    One batch on `executor`.  An operation is submitted once everything it depends on has
+    finished, so no pool thread ever waits on another.
+    """
+    def __init__(self, executor, operations, logger=None):
+        self.executor = executor
+        self.operations = operations
+        self.logger = logger
+        self.results = [None] * len(operations)
+        self.depends = dependencies(operations)
+        self.dependents = [[] for _ in operations]
+        for index, depends in enumerate(self.depends):
+            for other in depends:
+                self.dependents[other].append(index)
+        self._waiting = [len(depends) for depends in self.depends]
+        self._failed = [False] * len(operations)
+        self._remaining = len(operations)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def run(self, timeout=None):
+        self._schedule([index for index, waiting in enumerate(self._waiting) if not waiting])
+        if not self._done.wait(timeout):
+            raise TimeoutError("Batch did not finish in time")
+        return self.results
+
+    def _schedule(self, ready):
+        # skipping an operation can make more ready, so work through them in a loop
+        ready = list(ready)
+        while ready:
+            index = ready.pop()
+            failed = [other for other in self.depends[index] if self._failed[other]]
+            if failed:
+                ready.extend(self._finish(index, {"ok": False, "error": f"Skipped, operation {min(failed)} failed"}))
+            else:
+                self.executor.submit(self._run, index)
+
+    def _run(self, index):
+        operation = self.operations[index]
+        try:
+            result = {"ok": True, "result": run_operation(operation)}
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Batch {operation['op']} failed: {operation['path']} - {e}")
+            result = {"ok": False, "error": describe_error(e)}
+        self._schedule(self._finish(index, result))
+
+    def _finish(self, index, result):
+        """
+        Record a result and return the operations it made ready.
+        """
+        operation = self.operations[index]
+        result = dict(index=index, op=operation["op"], path=operation["path"], **result)
+
+        ready = []
+        with self._lock:
+            self.results[index] = result
+            self._failed[index] = not result["ok"]
+            self._remaining -= 1
+            for other in self.dependents[index]:
+                self._waiting[other] -= 1
+                if not self._waiting[other]:
+                    ready.append(other)
+            if not self._remaining:
+                self._done.set()
+        return ready
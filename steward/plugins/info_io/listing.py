@@ -0,0 +1,249 @@
+"""
+DIR_LIST and DIR_WALK: directory entries found with os.scandir, sent in pages as they are found.
+
+The walk is depth first and keeps one open scandir iterator per level, so its memory use
+depends on the depth of the tree and not on the number of entries; the first page goes out
+as soon as it fills (or `interval` seconds after the first entry), not once the walk is done.
+
+Options, all optional:
+
+    max_depth   0 lists the directory itself, 1 its subdirectories too, and so on.  DIR_LIST is
+                always 0, DIR_WALK is unlimited unless given
+    include     glob pattern or list of them; only matching entries are returned.  A pattern
+                with a '/' is matched against the path relative to the root, others against
+                the name.  In path patterns '*' stops at a '/' and '**' spans directories
+    exclude     patterns for entries to leave out; an excluded directory is not descended into
+    types       entry types to return: "file", "dir", "link", "other"
+    limit       stop after this many entries
+    page_size   entries per page
+
+Each entry is {"name", "path" (relative to the root), "type", "size", "mtime"}.  Symbolic
+links are reported as links and not followed.  A subdirectory that cannot be read is
+reported in the page's "errors" and skipped; the walk carries on.
+"""
+import os
+import re
+import stat
+import threading
+import time
+from fnmatch import translate
+
+TYPES = {"file", "dir", "link", "other"}
+
+
+class ListingError(Exception):
+    pass
+
+
+def _path_pattern(pattern):
+    """
+    Regex for a glob matched against a relative path.  Unlike fnmatch, '*' and '?' do not
+    match a '/', '**/' matches any number of directories and a trailing '**' anything.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            elif chars.startswith("^"):
+                chars = "\\" + chars
+            parts.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+
+def _patterns(value, name):
+    """
+    Compile glob patterns into (name regex, path regex); either is None when no pattern needs it.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not value or not all(isinstance(pattern, str) and pattern for pattern in value):
+        raise ListingError(f"Invalid {name} patterns")
+
+    names = [translate(pattern) for pattern in value if "/" not in pattern]
+    paths = [_path_pattern(pattern) for pattern in value if "/" in pattern]
+    try:
+        return (re.compile("|".join(names)) if names else None,
+                re.compile("(?s:" + "|".join(f"(?:{pattern})" for pattern in paths) + r")\Z") if paths else None)
+    except re.error:
+        raise ListingError(f"Invalid {name} patterns") from None
+
+
+def _matches(patterns, name, relative):
+    names, paths = patterns
+    return bool((names and names.match(name)) or (paths and paths.match(relative)))
+
+
+def _entry_type(mode):
+    if stat.S_ISREG(mode):
+        return "file"
+    if stat.S_ISDIR(mode):
+        return "dir"
+    if stat.S_ISLNK(mode):
+        return "link"
+    return "other"
+
+
+def describe_error(e):
+    if isinstance(e, FileNotFoundError):
+        return "File not found"
+    if isinstance(e, NotADirectoryError):
+        return "Not a directory"
+    if isinstance(e, PermissionError):
+        return "Permission denied"
+    return "An error occurred"
+
+
+class DirectoryWalk:
+    """
+    Iterate the entries under `root` (see the module docstring for the options).  Directories
+    that could not be read are added to `errors` as {"path", "error"}.
+
+    The root is opened when the walk is created, so a missing root raises OSError there.
+    """
+    def __init__(self, root, max_depth=None, include=None, exclude=None, types=None, limit=None):
+        if max_depth is not None and (not isinstance(max_depth, int) or max_depth < 0):
+            raise ListingError("Invalid max_depth")
+        if limit is not None and (not isinstance(limit, int) or limit < 1):
+            raise ListingError("Invalid limit")
+        if types is not None:
+            types = set([types] if isinstance(types, str) else types)
+            if not types <= TYPES:
+                raise ListingError(f"Invalid types, expected some of {sorted(TYPES)}")
+
+        self.root = root
+        self.max_depth = max_depth
+        self.include = _patterns(include, "include")
+        self.exclude = _patterns(exclude, "exclude")
+        self.types = types
+        self.limit = limit
+        self.count = 0
+        self.truncated = False
+        self.errors = []
+        self._stack = [(os.scandir(root), "", 0)]
+
+    def __iter__(self):
+        stack = self._stack
+        try:
+            while stack:
+                iterator, prefix, depth = stack[-1]
+                try:
+                    entry = next(iterator)
+                except StopIteration:
+                    iterator.close()
+                    stack.pop()
+                    continue
+                except OSError as e:
+                    self.errors.append({"path": prefix.rstrip("/") or ".", "error": describe_error(e)})
+                    iterator.close()
+                    stack.pop()
+                    continue
+
+                relative = prefix + entry.name
+                if self.exclude and _matches(self.exclude, entry.name, relative):
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    # removed since the directory was read
+                    continue
+
+                entry_type = _entry_type(st.st_mode)
+                if (not self.types or entry_type in self.types) and (not self.include or _matches(self.include, entry.name, relative)):
+                    if self.limit is not None and self.count >= self.limit:
+                        self.truncated = True
+                        return
+                    self.count += 1
+                    yield {"name": entry.name, "path": relative, "type": entry_type, "size": st.st_size, "mtime": st.st_mtime}
+
+                if entry_type == "dir" and (self.max_depth is None or depth < self.max_depth):
+                    try:
+                        stack.append((os.scandir(entry.path), relative + "/", depth + 1))
+                    except OSError as e:
+                        self.errors.append({"path": relative, "error": describe_error(e)})
+        finally:
+            self.close()
+
+    def close(self):
+        while self._stack:
+            self._stack.pop()[0].close()
+
+
+def send_pages(walk, send, page_size, interval=0.25):
+    """
+    Call send(page) for each page of `walk`.  A page is sent when it holds `page_size` entries
+    or `interval` seconds after its first entry, whichever comes first; the last page has
+    final=True, the entry count and whether `limit` cut the walk short.
+
+    The interval is kept by a timer thread, so a partial page still goes out while the walk
+    is scanning entries that do not match.
+    """
+    lock = threading.Lock()
+    done = threading.Event()
+    entries = []
+    seq = 0
+    started = None
+
+    def flush(final):
+        # called with `lock` held
+        nonlocal entries, seq
+        # the walk may add errors meanwhile, only take the ones already there
+        count = len(walk.errors)
+        page = {"seq": seq, "entries": entries, "errors": walk.errors[:count], "final": final}
+        if final:
+            page.update(count=walk.count, truncated=walk.truncated)
+        del walk.errors[:count]
+        entries = []
+        seq += 1
+        send(page)
+
+    def flush_late_pages():
+        timeout = interval
+        while not done.wait(timeout):
+            with lock:
+                timeout = interval
+                if entries:
+                    waited = time.monotonic() - started
+                    if waited >= interval:
+                        flush(False)
+                    else:
+                        timeout = interval - waited
+
+    timer = threading.Thread(target=flush_late_pages, name="steward-dir-pages", daemon=True)
+    timer.start()
+    try:
+        for entry in walk:
+            with lock:
+                if not entries:
+                    started = time.monotonic()
+                entries.append(entry)
+                if len(entries) >= page_size:
+                    flush(False)
+    finally:
+        done.set()
+        timer.join()
+
+    with lock:
+        flush(True)
@@ -1,9 +1,17 @@
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
 from steward.plugins._base_plugin import BasePlugin
 from steward.decorators import STEWARD_DIR, is_event_handler
 from steward.event import StewardEvent, EventType
+from steward.codecs import codec_for
+from steward.plugins.info_io.streams import FileStreams, StreamError
+from steward.plugins.info_io.ranges import LineIndex, HashCache, RangeError, read_range
+from steward.plugins.info_io.batch import BatchRun, BatchError, validate
+from steward.plugins.info_io.listing import DirectoryWalk, ListingError, send_pages
+from steward.plugins.info_io.listing import describe_error as describe_listing_error
+from steward.plugins.info_io.watch import FileWatcher, WatchError
 
 class PluginInfoIO(BasePlugin):
     def __init__(self, logger=None, client=None):
@@ -13,11 +21,55 @@ class PluginInfoIO(BasePlugin):
         self.mqtt_client = client
         self.datadir = f"{STEWARD_DIR}/{self.name.lower()}"
 
+        self.streams = FileStreams(self.send_event, logger=logger)
+        self.watcher = FileWatcher(self.send_event, logger=logger)
+        self.line_index = LineIndex()
+        self.hashes = HashCache()
+        self.range_max_bytes = int(float(os.getenv('STEWARD_RANGE_MAX_KB', 4096)) * 1024)
 
-    @is_event_handler("FILE_READ_CONTENTS")
+        # FILE_BATCH operations run on this pool, started with the first batch
+        self.batch_workers = int(os.getenv('STEWARD_FILE_BATCH_WORKERS', 8))
+        self.batch_max_operations = int(os.getenv('STEWARD_FILE_BATCH_MAX_OPS', 1000))
+        self.batch_timeout = float(os.getenv('STEWARD_FILE_BATCH_TIMEOUT', 300))
+        self._batch_pool = None
+
+        # DIR_LIST / DIR_WALK pages, the walks run on their own pool started with the first one
+        self.dir_page_size = int(os.getenv('STEWARD_DIR_PAGE_SIZE', 500))
+        self.dir_page_interval = float(os.getenv('STEWARD_DIR_PAGE_INTERVAL', 0.25))
+        self.dir_list_workers = int(os.getenv('STEWARD_DIR_LIST_WORKERS', 4))
+        self._listing_pool = None
+
+    def send_event(self, topic, event, codec=None):
+        self.mqtt_client.publish_event(topic, event, codec)
+
+    def unload(self):
+        self.streams.close_all()
+        self.watcher.close_all()
+        self.line_index.clear()
+        self.hashes.clear()
+        if self._batch_pool:
+            self._batch_pool.shutdown(wait=False)
+        if self._listing_pool:
+            self._listing_pool.shutdown(wait=False)
+
+    @property
+    def batch_pool(self):
+        if self._batch_pool is None:
+            self._batch_pool = ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix="steward-file-batch")
+        return self._batch_pool
+
+    @property
+    def listing_pool(self):
+        if self._listing_pool is None:
+            self._listing_pool = ThreadPoolExecutor(max_workers=self.dir_list_workers, thread_name_prefix="steward-dir-list")
+        return self._listing_pool
+
+
+    @is_event_handler("FILE_READ_CONTENTS", EventType.COMMAND)
     def on_file_read_contents(self, event: StewardEvent, message = None):
         """
         Read the contents of a text file specified in the event.payload['path'] field.
+        Set event.payload['binary'] to read the file as bytes instead of text.
 
         Params:
         event   - A StewardEvent object containing the event data.
@@ -34,31 +86,191 @@ class PluginInfoIO(BasePlugin):
             # ensure the user has permission to read the file
             if not os.access(file_path, os.R_OK):
                 self.logger.error(f"Permission denied: Cannot read file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
                 self.send_response_event(message, response)
                 return
                         
+            mode = "rb" if event.payload.get('binary') else "r"
             try:
-                with open(file_path, "r") as f:
+                with open(file_path, mode) as f:
                     contents = f.read()
-                response = StewardEvent(EventType.RESPONSE, event.name, payload=contents)
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=contents)
             except FileNotFoundError:
                 self.logger.error(f"File not found: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="File not found")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
             except PermissionError:
                 self.logger.error(f"Permission denied: Cannot read file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
             except Exception as e:
                 self.logger.error(f"An error occurred while reading the file: {file_path} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
     
-    @is_event_handler("FILE_WRITE_CONTENTS")
+    @is_event_handler("FILE_READ_RANGE", EventType.COMMAND)
+    def on_file_read_range(self, event: StewardEvent, message = None):
+        """
+        Read part of the file specified in the event.payload['path'] field, either a byte range
+        ('offset' and 'length') or a line range ('start_line' to 'end_line', 1 based and inclusive).
+        A negative 'offset' or 'start_line' counts back from the end of the file, so {"start_line": -100}
+        reads the last 100 lines.  Set event.payload['binary'] to get bytes instead of text.
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        An MQTT message is sent containing a StewardEvent response object.  Its payload holds the contents in 'data',
+        with the 'offset', 'length' and file 'size', the line range when lines were asked for, and 'truncated'
+        if the range was longer than STEWARD_RANGE_MAX_KB.
+        The message is delivered to the MQTT topic defined in the original message.
+        If an error occurs, a StewardEvent error object is sent instead.
+        """
+        if event.is_command:
+            file_path = event.payload['path']
+
+            # ensure the user has permission to read the file
+            if not os.access(file_path, os.R_OK):
+                self.logger.error(f"Permission denied: Cannot read file: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
+                self.send_response_event(message, response)
+                return
+
+            try:
+                data, details = read_range(
+                    file_path,
+                    self.line_index,
+                    offset=event.payload.get('offset'),
+                    length=event.payload.get('length'),
+                    start_line=event.payload.get('start_line'),
+                    end_line=event.payload.get('end_line'),
+                    max_bytes=self.range_max_bytes
+                )
+                details['path'] = file_path
+                details['data'] = data if event.payload.get('binary') else data.decode(errors="replace")
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=details)
+            except RangeError as e:
+                self.logger.error(f"{e}: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload=str(e))
+            except FileNotFoundError:
+                self.logger.error(f"File not found: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
+            except PermissionError:
+                self.logger.error(f"Permission denied: Cannot read file: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
+            except Exception as e:
+                self.logger.error(f"An error occurred while reading the file: {file_path} - {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
+
+            self.send_response_event(message, response)
+
+    @is_event_handler("FILE_HASH", EventType.COMMAND)
+    def on_file_hash(self, event: StewardEvent, message = None):
+        """
+        Hash the contents of the file specified in the event.payload['path'] field with
+        event.payload['algorithm'] (any hashlib algorithm, sha256 by default).  Hashes are cached
+        until the file changes.
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        An MQTT message is sent containing a StewardEvent response object with the 'path', 'algorithm', 'hash'
+        and file 'size' in its payload.
+        The message is delivered to the MQTT topic defined in the original message.
+        If an error occurs, a StewardEvent error object is sent instead.
+        """
+        if event.is_command:
+            file_path = event.payload['path']
+            algorithm = event.payload.get('algorithm') or "sha256"
+
+            # ensure the user has permission to read the file
+            if not os.access(file_path, os.R_OK):
+                self.logger.error(f"Permission denied: Cannot read file: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
+                self.send_response_event(message, response)
+                return
+
+            try:
+                digest, size, cached = self.hashes.digest(file_path, algorithm)
+                payload = {"path": file_path, "algorithm": algorithm, "hash": digest, "size": size, "cached": cached}
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=payload)
+            except RangeError as e:
+                self.logger.error(f"{e}: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload=str(e))
+            except FileNotFoundError:
+                self.logger.error(f"File not found: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
+            except PermissionError:
+                self.logger.error(f"Permission denied: Cannot read file: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
+            except Exception as e:
+                self.logger.error(f"An error occurred while hashing the file: {file_path} - {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
+
+            self.send_response_event(message, response)
+
+    @is_event_handler("FILE_READ_STREAM", EventType.COMMAND)
+    def on_file_read_stream(self, event: StewardEvent, message = None):
+        """
+        Send the file in event.payload['path'] as a stream of chunk responses (see streams.py).
+        Optional payload fields: 'offset' to resume from, 'chunk_size' in bytes, and 'window',
+        the number of chunks sent ahead of the client's acknowledgements.
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        StewardEvent response objects carrying the chunks are sent to the MQTT topic defined in the original message,
+        as the client acknowledges them with FILE_READ_STREAM_ACK.
+        If an error occurs, a StewardEvent error object is sent instead, with the stream_id and error in its payload.
+        """
+        if event.is_command:
+            file_path = event.payload['path']
+            codec = codec_for(message.payload)
+
+            # ensure the user has permission to read the file
+            if not os.access(file_path, os.R_OK):
+                self.logger.error(f"Permission denied: Cannot read file: {file_path}")
+                self.streams.send_error(event, message.topic, codec, "Permission denied")
+                return
+
+            try:
+                self.streams.open(event, message.topic, codec)
+            except StreamError as e:
+                self.logger.error(f"Unable to stream file: {file_path} - {e}")
+                self.streams.send_error(event, message.topic, codec, str(e))
+            except FileNotFoundError:
+                self.logger.error(f"File not found: {file_path}")
+                self.streams.send_error(event, message.topic, codec, "File not found")
+            except Exception as e:
+                self.logger.error(f"An error occurred while streaming the file: {file_path} - {e}")
+                self.streams.send_error(event, message.topic, codec, "An error occurred")
+
+    @is_event_handler("FILE_READ_STREAM_ACK", EventType.COMMAND)
+    def on_file_read_stream_ack(self, event: StewardEvent, message = None):
+        """
+        The client has written every chunk up to event.payload['seq'] of stream event.payload['stream_id'].
+        Sends the chunks that frees room for.  No response is sent.
+        """
+        if event.is_command:
+            self.streams.ack(event.payload['stream_id'], event.payload['seq'])
+
+    @is_event_handler("FILE_READ_STREAM_CANCEL", EventType.COMMAND)
+    def on_file_read_stream_cancel(self, event: StewardEvent, message = None):
+        """
+        Stop the stream event.payload['stream_id'] and close its file.  No response is sent.
+        """
+        if event.is_command:
+            self.streams.cancel(event.payload['stream_id'])
+
+    @is_event_handler("FILE_WRITE_CONTENTS", EventType.COMMAND)
     def on_file_write_contents(self, event: StewardEvent, message = None):
         """
         Write text to a filespecified in the event.payload['path'] field.
-        Text content is passed via the event.payload['contents'] field.
+        Text content is passed via the event.payload['contents'] field.  Bytes contents are written in binary mode.
 
         Params:
         event   - A StewardEvent object containing the event data.
@@ -76,27 +288,28 @@ class PluginInfoIO(BasePlugin):
             # ensure the user has permission to write the file
             if not os.access(file_path, os.W_OK):
                 self.logger.error(f"Permission denied: Cannot write file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
                 self.send_response_event(message, response)
                 return
                         
+            mode = "wb" if isinstance(contents, bytes) else "w"
             try:
-                with open(file_path, "w") as f:
+                with open(file_path, mode) as f:
                     f.write(contents)
-                response = StewardEvent(EventType.RESPONSE, event.name, payload="File written")
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload="File written")
             except FileNotFoundError:
                 self.logger.error(f"File not found: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="File not found")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
             except PermissionError:
                 self.logger.error(f"Permission denied: Cannot write file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
             except Exception as e:
                 self.logger.error(f"An error occurred while writing the file: {file_path} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
     
-    @is_event_handler("FILE_MOVE_FILE")
+    @is_event_handler("FILE_MOVE_FILE", EventType.COMMAND)
     def on_file_move_file(self, event: StewardEvent, message = None):
         """
         Move a file from one location to another.
@@ -117,32 +330,66 @@ class PluginInfoIO(BasePlugin):
             # ensure the user can read the source file, and write the destination file
             if not os.access(file_path, os.R_OK):
                 self.logger.error(f"Permission denied: Cannot read file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
                 self.send_response_event(message, response)
                 return
             
             if not os.access(new_path, os.W_OK):
                 self.logger.error(f"Permission denied: Cannot write file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
                 self.send_response_event(message, response)
                 return
             
             try:
                 os.rename(file_path, new_path)
-                response = StewardEvent(EventType.RESPONSE, event.name, payload="File moved")
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload="File moved")
             except FileNotFoundError:
                 self.logger.error(f"File not found: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="File not found")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
             except PermissionError:
                 self.logger.error(f"Permission denied: Cannot write file: {file_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
             except Exception as e:
                 self.logger.error(f"An error occurred while moving the file: {file_path} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
 
-    @is_event_handler("FILE_CREATE_DIRECTORY")
+    @is_event_handler("FILE_BATCH", EventType.COMMAND)
+    def on_file_batch(self, event: StewardEvent, message = None):
+        """
+        Run the list of file operations in event.payload['operations'] (read, write, move and mkdir, see batch.py).
+        Operations on unrelated paths run concurrently, operations on overlapping paths run in the order given.
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        An MQTT message is sent containing a StewardEvent response object once every operation has finished.
+        Its payload holds one result per operation in 'results' ('index', 'op', 'path', 'ok', and 'result' or 'error'),
+        and the 'succeeded' and 'failed' counts.
+        The message is delivered to the MQTT topic defined in the original message.
+        If the batch itself is not valid, a StewardEvent error object is sent instead.
+        """
+        if event.is_command:
+            operations = event.payload.get('operations') if isinstance(event.payload, dict) else None
+            try:
+                validate(operations, self.batch_max_operations)
+                results = BatchRun(self.batch_pool, operations, logger=self.logger).run(self.batch_timeout)
+                succeeded = sum(1 for result in results if result["ok"])
+                payload = {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=payload)
+            except BatchError as e:
+                self.logger.error(f"Invalid file batch: {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload=str(e))
+            except Exception as e:
+                self.logger.error(f"An error occurred while running the file batch: {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
+
+            self.send_response_event(message, response)
+
+    @is_event_handler("FILE_CREATE_DIRECTORY", EventType.COMMAND)
     def on_file_create_directory(self, event: StewardEvent, message = None):
         """
         Create a directory specified in the event.payload['path'] field.
@@ -162,26 +409,166 @@ class PluginInfoIO(BasePlugin):
             # ensure the user can write the directory
             if not os.access(directory_path, os.W_OK):
                 self.logger.error(f"Permission denied: Cannot write directory: {directory_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
                 self.send_response_event(message, response)
                 return
             
             try:
                 os.mkdir(directory_path)
-                response = StewardEvent(EventType.RESPONSE, event.name, payload="Directory created")
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload="Directory created")
             except FileExistsError:
                 self.logger.error(f"Directory already exists: {directory_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Directory already exists")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Directory already exists")
             except PermissionError:
                 self.logger.error(f"Permission denied: Cannot write directory: {directory_path}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="Permission denied")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
             except Exception as e:
                 self.logger.error(f"An error occurred while creating the directory: {directory_path} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
 
-    @is_event_handler("URL_GET_CONTENTS")
+    @is_event_handler("DIR_LIST", EventType.COMMAND)
+    def on_dir_list(self, event: StewardEvent, message = None):
+        """
+        List the directory in event.payload['path'], without descending into subdirectories.
+        Optional payload fields: 'include', 'exclude', 'types', 'limit' and 'page_size' (see listing.py).
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        StewardEvent response objects carrying pages of entries are sent to the MQTT topic defined in the original message,
+        the last one with 'final' set.
+        If the directory cannot be listed, a StewardEvent error object is sent instead, with the listing_id and error in its payload.
+        """
+        if event.is_command:
+            self.send_listing(event, message, max_depth=0)
+
+    @is_event_handler("DIR_WALK", EventType.COMMAND)
+    def on_dir_walk(self, event: StewardEvent, message = None):
+        """
+        List the directory tree under event.payload['path'], depth first.
+        Optional payload fields: 'max_depth', 'include', 'exclude', 'types', 'limit' and 'page_size' (see listing.py).
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        StewardEvent response objects carrying pages of entries are sent to the MQTT topic defined in the original message
+        while the walk is in progress, the last one with 'final' set.
+        If the directory cannot be listed, a StewardEvent error object is sent instead, with the listing_id and error in its payload.
+        """
+        if event.is_command:
+            self.send_listing(event, message, max_depth=event.payload.get('max_depth'))
+
+    def send_listing(self, event, message, max_depth):
+        options = event.payload
+        dir_path = options['path']
+        codec = codec_for(message.payload)
+
+        def send(payload, event_type=EventType.RESPONSE):
+            payload = dict(listing_id=event.id, path=dir_path, **payload)
+            self.send_event(message.topic, StewardEvent(event_type, event.name, trigger_event=event, payload=payload), codec)
+
+        try:
+            walk = DirectoryWalk(dir_path, max_depth=max_depth, include=options.get('include'), exclude=options.get('exclude'),
+                                 types=options.get('types'), limit=options.get('limit'))
+        except ListingError as e:
+            self.logger.error(f"Invalid listing of {dir_path}: {e}")
+            send({"error": str(e)}, EventType.ERROR)
+            return
+        except OSError as e:
+            self.logger.error(f"Unable to list directory: {dir_path} - {e}")
+            send({"error": describe_listing_error(e)}, EventType.ERROR)
+            return
+
+        page_size = max(1, min(int(options.get('page_size') or self.dir_page_size), 10 * self.dir_page_size))
+        # a large tree takes a while, walk it on the listing pool so the client's other events are not held up
+        self.listing_pool.submit(self._walk, walk, send, page_size, dir_path)
+
+    def _walk(self, walk, send, page_size, dir_path):
+        try:
+            send_pages(walk, send, page_size, self.dir_page_interval)
+        except Exception as e:
+            walk.close()
+            self.logger.error(f"An error occurred while listing the directory: {dir_path} - {e}")
+            send({"error": "An error occurred"}, EventType.ERROR)
+
+    @is_event_handler("FILE_WATCH", EventType.COMMAND)
+    def on_file_watch(self, event: StewardEvent, message = None):
+        """
+        Watch the file or directory in event.payload['path'] for changes (see watch.py).
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        An MQTT message is sent containing a StewardEvent response object with the watch_id, which FILE_UNWATCH takes.
+        From then on FILE_CREATED, FILE_DELETED and FILE_MODIFIED StewardEvent notice objects are sent to the MQTT topic
+        defined in the original message as the path changes.
+        If the path cannot be watched, a StewardEvent error object is sent instead.
+        """
+        if event.is_command:
+            file_path = event.payload['path']
+            try:
+                watch = self.watcher.watch(event, message.topic, codec_for(message.payload))
+                payload = {"watch_id": watch.id, "path": watch.path, "backend": self.watcher.backend.name}
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=payload)
+            except WatchError as e:
+                self.logger.error(f"Unable to watch: {file_path} - {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload=str(e))
+            except FileNotFoundError:
+                self.logger.error(f"File not found: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="File not found")
+            except PermissionError:
+                self.logger.error(f"Permission denied: Cannot watch: {file_path}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Permission denied")
+            except Exception as e:
+                self.logger.error(f"An error occurred while watching: {file_path} - {e}")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
+
+            self.send_response_event(message, response)
+
+    @is_event_handler("FILE_UNWATCH", EventType.COMMAND)
+    def on_file_unwatch(self, event: StewardEvent, message = None):
+        """
+        Stop the watch event.payload['watch_id'].
+
+        Params:
+        event   - A StewardEvent object containing the event data.
+        message - The message associated with the event.
+
+        Result:
+        An MQTT message is sent containing a StewardEvent response object, or an error object if there is no such watch.
+        The message is delivered to the MQTT topic defined in the original message.
+        """
+        if event.is_command:
+            if self.watcher.unwatch(event.payload['watch_id']):
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload="Watch removed")
+            else:
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="Watch not found")
+
+            self.send_response_event(message, response)
+
+    @is_event_handler("CLIENT_STOP", EventType.NOTICE)
+    def on_client_stop(self, event: StewardEvent, message = None):
+        """
+        The client on message.topic is shutting down, stop its watches.
+        """
+        self.watcher.unwatch_topic(message.topic)
+
+    @is_event_handler("CLIENT_DISCONNECT", EventType.NOTICE)
+    def on_client_disconnect(self, event: StewardEvent, message = None):
+        """
+        The client on message.topic has gone, stop its watches.
+        """
+        self.watcher.unwatch_topic(message.topic)
+
+    @is_event_handler("URL_GET_CONTENTS", EventType.COMMAND)
     def on_url_get_contents(self, event: StewardEvent, message = None):
         """
         Read the raw text contents of a URL specified in the event.payload['url'] field.
@@ -200,14 +587,14 @@ class PluginInfoIO(BasePlugin):
                 url = event.payload['url']
                 content = requests.get(url).text
                         
-                response = StewardEvent(EventType.RESPONSE, event.name, payload=content)
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=content)
             except Exception as e:
                 self.logger.error(f"An error occurred while reading the URL: {url} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
 
-    @is_event_handler("URL_GET_JSON")
+    @is_event_handler("URL_GET_JSON", EventType.COMMAND)
     def on_url_get_json(self, event: StewardEvent, message = None):
         """
         Read the JSON contents of a URL specified in the event.payload['url'] field.
@@ -226,10 +613,10 @@ class PluginInfoIO(BasePlugin):
                 url = event.payload['url']
                 content = requests.get(url).json()
                         
-                response = StewardEvent(EventType.RESPONSE, event.name, payload=content)
+                response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=content)
             except Exception as e:
                 self.logger.error(f"An error occurred while reading the URL: {url} - {e}")
-                response = StewardEvent(EventType.ERROR, event.name, payload="An error occurred")
+                response = StewardEvent(EventType.ERROR, event.name, trigger_event=event, payload="An error occurred")
 
             self.send_response_event(message, response)
         
\ No newline at end of file
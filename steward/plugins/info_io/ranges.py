@@ -0,0 +1,240 @@
+"""
+Ranged reads and content hashes for the info_io plugin, read through mmap.
+
+Both keep a small LRU cache keyed by the file's identity (path, inode, mtime, size), so a
+repeated request costs one os.stat():
+
+    LineIndex   the offset at which each line starts, so a line range is two lookups and a
+                slice.  A file that has only grown since it was indexed (a log being
+                appended to) has the new part scanned and added to the index.
+    HashCache   content digests per hash algorithm.
+"""
+import hashlib
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+HASH_BLOCK = 1024 * 1024
+# bytes kept from the end of an indexed file to check that a grown file was only appended to
+_TAIL = 64
+
+
+class RangeError(Exception):
+    pass
+
+
+def file_key(path, stat_result=None):
+    st = stat_result or os.stat(path)
+    return (os.path.realpath(path), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _map(f, size):
+    # an empty file cannot be mapped
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+
+class _Lines:
+    """
+    Line start offsets of one file.  `starts` includes the end of the file when the file ends
+    with a newline, so line n (0 based) runs from starts[n] to starts[n + 1].
+    """
+    __slots__ = ("inode", "mtime", "size", "starts", "tail")
+
+    def __init__(self, inode, mtime, size, starts, tail):
+        self.inode = inode
+        self.mtime = mtime
+        self.size = size
+        self.starts = starts
+        self.tail = tail
+
+    @property
+    def count(self):
+        starts = self.starts
+        return len(starts) - 1 if starts[-1] == self.size else len(starts)
+
+    def span(self, line):
+        starts = self.starts
+        return starts[line], starts[line + 1] if line + 1 < len(starts) else self.size
+
+
+def _scan_lines(view, starts, position):
+    find = view.find
+    newline = find(b"\n", position)
+    while newline != -1:
+        starts.append(newline + 1)
+        newline = find(b"\n", newline + 1)
+
+
+class LineIndex:
+    """
+    Cached line offsets for up to `maxsize` files.
+    """
+    def __init__(self, maxsize=None):
+        if maxsize is None:
+            maxsize = int(os.getenv('STEWARD_RANGE_INDEX_CACHE', 32))
+        self._cache = _LRU(maxsize)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def lines(self, path, f, st):
+        """
+        The _Lines for the open file `f` (stat `st`), from the cache when it is current.
+        """
+        realpath = os.path.realpath(path)
+        cached = self._cache.get(realpath)
+        if cached and cached.inode == st.st_ino and cached.mtime == st.st_mtime_ns and cached.size == st.st_size:
+            return cached
+
+        view = _map(f, st.st_size)
+        try:
+            if cached and cached.inode == st.st_ino and st.st_size > cached.size \
+                    and view[cached.size - len(cached.tail):cached.size] == cached.tail:
+                # appended to since it was indexed: scan the new part only
+                starts = array('q', cached.starts)
+                _scan_lines(view, starts, cached.size)
+            else:
+                starts = array('q', [0])
+                _scan_lines(view, starts, 0)
+
+            lines = _Lines(st.st_ino, st.st_mtime_ns, st.st_size, starts, bytes(view[max(0, st.st_size - _TAIL):st.st_size]))
+        finally:
+            if st.st_size:
+                view.close()
+
+        self._cache.put(realpath, lines)
+        return lines
+
+    def clear(self):
+        self._cache.clear()
+
+
+def read_range(path, index, offset=None, length=None, start_line=None, end_line=None, max_bytes=None):
+    """
+    Read part of a file by byte range (`offset`, `length`) or by line range (`start_line` to
+    `end_line`, 1 based and inclusive; a negative start counts back from the last line).
+
+    Returns (data, details) where details holds the byte offset and length read, the file
+    size, the line range when lines were asked for, and whether the read was cut short at
+    `max_bytes`.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        details = {"size": size}
+
+        if start_line is not None or end_line is not None:
+            lines = index.lines(path, f, st)
+            count = lines.count
+            first = start_line if start_line is not None else 1
+            if first < 0:
+                first = max(1, count + first + 1)
+            last = min(end_line if end_line is not None else count, count)
+            if first < 1 or (end_line is not None and end_line < first):
+                raise RangeError("Invalid line range")
+
+            if first > last:
+                offset, length = size, 0
+            else:
+                offset = lines.span(first - 1)[0]
+                length = lines.span(last - 1)[1] - offset
+            details.update(start_line=first, end_line=max(first - 1, last), lines=count)
+        else:
+            offset = offset or 0
+            if offset < 0:
+                offset = max(0, size + offset)
+            if length is None:
+                length = size - offset
+            if length < 0 or offset > size:
+                raise RangeError("Invalid byte range")
+            length = min(length, size - offset)
+
+        truncated = max_bytes is not None and length > max_bytes
+        if truncated:
+            length = max_bytes
+
+        view = _map(f, size)
+        try:
+            data = view[offset:offset + length]
+        finally:
+            if size:
+                view.close()
+
+    details.update(offset=offset, length=len(data), truncated=truncated)
+    return data, details
+
+
+class HashCache:
+    """
+    Content digests for up to `maxsize` (file, algorithm) pairs.
+    """
+    def __init__(self, maxsize=None):
+        if maxsize is None:
+            maxsize = int(os.getenv('STEWARD_HASH_CACHE', 1024))
+        self._cache = _LRU(maxsize)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def digest(self, path, algorithm="sha256"):
+        """
+        (hex digest, size, cached) for the file at `path`.
+        """
+        if algorithm not in hashlib.algorithms_available:
+            raise RangeError(f"Unsupported algorithm: {algorithm}")
+
+        key = file_key(path) + (algorithm,)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached, key[3], True
+
+        digest = hashlib.new(algorithm)
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            view = _map(f, st.st_size)
+            try:
+                with memoryview(view) as block:
+                    for position in range(0, st.st_size, HASH_BLOCK):
+                        digest.update(block[position:position + HASH_BLOCK])
+            finally:
+                if st.st_size:
+                    view.close()
+
+        # variable length digests (shake) are given a fixed length
+        value = digest.hexdigest(32) if digest.digest_size == 0 else digest.hexdigest()
+        # cache under the identity of what was read, in case the file changed since the stat
+        self._cache.put(file_key(path, st) + (algorithm,), value)
+        return value, st.st_size, False
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,213 @@
+"""
+Server side of FILE_READ_STREAM: files sent as a sequence of chunk events with credit based
+flow control.
+
+A stream opens with up to `window` chunks in flight.  The client acknowledges the chunks it
+has written (FILE_READ_STREAM_ACK with the last sequence number in order) and every
+acknowledgement frees credit for more.  Nothing waits: each handler call sends what the
+credit allows and returns, so a slow client holds an open file descriptor and no memory.
+Chunks are read with os.pread, so at most one chunk per stream is in memory at a time.
+
+Chunk payload:
+
+    stream_id   the ID of the FILE_READ_STREAM command
+    seq         0, 1, 2... within the stream
+    offset      where `data` starts in the file
+    size        the file size when the stream opened
+    final       True on the last chunk
+    window      chunks the server sends ahead of acknowledgements
+    data        bytes
+"""
+import os
+import threading
+import time
+
+from steward.event import StewardEvent, EventType
+
+MAX_CHUNK_SIZE = 1024 * 1024
+MAX_WINDOW = 64
+
+
+class StreamError(Exception):
+    pass
+
+
+class FileStream:
+    def __init__(self, request, fd, size, offset, chunk_size, window, topic, codec):
+        self.request = request
+        self.id = request.id
+        self.fd = fd
+        self.size = size
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.window = window
+        self.topic = topic
+        self.codec = codec
+        # next sequence number to send, and the last one the client has written
+        self.next_seq = 0
+        self.acked = -1
+        self.finished = False
+        self.last_activity = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def credit(self):
+        return self.window - (self.next_seq - self.acked - 1)
+
+
+class FileStreams:
+    """
+    The open streams of one plugin instance.  `send(topic, event, codec)` publishes an event.
+    """
+    def __init__(self, send, logger=None, chunk_size=None, window=None, max_open=None, idle_timeout=None):
+        if chunk_size is None:
+            chunk_size = int(float(os.getenv('STEWARD_STREAM_CHUNK_KB', 64)) * 1024)
+        if window is None:
+            window = int(os.getenv('STEWARD_STREAM_WINDOW', 8))
+        if max_open is None:
+            max_open = int(os.getenv('STEWARD_STREAM_MAX_OPEN', 64))
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv('STEWARD_STREAM_IDLE_TIMEOUT', 60))
+
+        self.send = send
+        self.logger = logger
+        self.chunk_size = chunk_size
+        self.window = window
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.streams = {}
+        self._lock = threading.Lock()
+        # stop Event of the thread closing idle streams, which runs while any are open
+        self._reaper = None
+
+    def __len__(self):
+        return len(self.streams)
+
+    def open(self, request, topic, codec):
+        """
+        Start streaming the file named in the FILE_READ_STREAM `request` and send the first
+        window of chunks.  Raises StreamError, or OSError if the file cannot be opened.
+        """
+        self.expire()
+
+        options = request.payload
+        path = options['path']
+        offset = int(options.get('offset') or 0)
+        chunk_size = min(int(options.get('chunk_size') or self.chunk_size), MAX_CHUNK_SIZE)
+        window = min(int(options.get('window') or self.window), MAX_WINDOW)
+        if offset < 0 or chunk_size < 1 or window < 1:
+            raise StreamError("Invalid stream options")
+
+        with self._lock:
+            if len(self.streams) >= self.max_open:
+                raise StreamError("Too many open streams")
+
+            fd = os.open(path, os.O_RDONLY)
+            size = os.fstat(fd).st_size
+            if offset > size:
+                os.close(fd)
+                raise StreamError("Offset is past the end of the file")
+
+            stream = FileStream(request, fd, size, offset, chunk_size, window, topic, codec)
+            self.streams[stream.id] = stream
+            if self._reaper is None:
+                self._reaper = threading.Event()
+                threading.Thread(target=self._expire_loop, args=(self._reaper,), name="steward-stream-expiry", daemon=True).start()
+
+        self.pump(stream)
+        return stream
+
+    def ack(self, stream_id, seq):
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return
+        with stream.lock:
+            stream.acked = max(stream.acked, int(seq))
+            stream.last_activity = time.monotonic()
+        self.pump(stream)
+
+    def cancel(self, stream_id):
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            with stream.lock:
+                self._close(stream)
+
+    def pump(self, stream):
+        """
+        Send as many chunks as the stream's credit allows.
+        """
+        with stream.lock:
+            while not stream.finished and stream.credit > 0:
+                try:
+                    data = os.pread(stream.fd, stream.chunk_size, stream.offset)
+                except OSError as e:
+                    if self.logger:
+                        self.logger.error(f"Unable to read stream {stream.id}: {e}")
+                    self._close(stream)
+                    self.send_error(stream.request, stream.topic, stream.codec, "An error occurred")
+                    return
+
+                # a file that shrank while streaming ends early, one that grew ends at its opening size
+                final = not data or stream.offset + len(data) >= stream.size
+                if len(data) > stream.size - stream.offset:
+                    data = data[:max(0, stream.size - stream.offset)]
+
+                chunk = {
+                    "stream_id": stream.id,
+                    "seq": stream.next_seq,
+                    "offset": stream.offset,
+                    "size": stream.size,
+                    "final": final,
+                    "window": stream.window,
+                    "data": data,
+                }
+                stream.next_seq += 1
+                stream.offset += len(data)
+                if final:
+                    self._close(stream)
+
+                self.send(stream.topic, StewardEvent(EventType.RESPONSE, stream.request.name, trigger_event=stream.request, payload=chunk), stream.codec)
+
+    def expire(self):
+        """
+        Close streams whose client has not acknowledged anything for `idle_timeout` seconds.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        for stream in list(self.streams.values()):
+            if stream.last_activity < cutoff:
+                if self.logger:
+                    self.logger.warning(f"Closing idle stream {stream.id} at offset {stream.offset}")
+                with stream.lock:
+                    self._close(stream)
+
+    def _expire_loop(self, stopped):
+        # checks a few times per timeout, and ends when the last stream has closed
+        interval = max(0.01, self.idle_timeout / 4)
+        while not stopped.wait(interval):
+            self.expire()
+            with self._lock:
+                if not self.streams and self._reaper is stopped:
+                    self._reaper = None
+                    return
+
+    def close_all(self):
+        with self._lock:
+            if self._reaper is not None:
+                self._reaper.set()
+                self._reaper = None
+        for stream in list(self.streams.values()):
+            with stream.lock:
+                self._close(stream)
+
+    def _close(self, stream):
+        # called with stream.lock held
+        if stream.finished:
+            return
+        stream.finished = True
+        os.close(stream.fd)
+        with self._lock:
+            self.streams.pop(stream.id, None)
+
+    def send_error(self, request, topic, codec, error):
+        response = StewardEvent(EventType.ERROR, request.name, trigger_event=request, payload={"stream_id": request.id, "error": error})
+        self.send(topic, response, codec)
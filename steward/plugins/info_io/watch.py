@@ -0,0 +1,487 @@
+"""
+FILE_WATCH: file and directory change notices.
+
+One watcher thread serves every subscriber.  On Linux it reads inotify events (through
+ctypes, no extra packages); elsewhere, or with STEWARD_WATCH_BACKEND=poll, it compares
+os.stat() snapshots of the watched paths every `poll_interval` seconds.
+
+Watching a file reports changes to that file; watching a directory reports entries created
+in, deleted from or modified in it (not in its subdirectories).  Changes to one path are
+debounced: they are held until the path has been quiet for `debounce` seconds (or for at
+most `max_delay` seconds while it keeps changing) and coalesced into one notice, so a save
+that writes a file in twenty blocks is one FILE_MODIFIED, and a temporary file created and
+deleted within the window is no notice at all.
+
+Notices are NOTICE events named FILE_CREATED, FILE_DELETED or FILE_MODIFIED, sent to the
+subscriber's topic with the payload:
+
+    watch_id    the ID of the FILE_WATCH command
+    path        the path that changed
+    watched     the path being watched
+    changes     the number of changes coalesced into this notice
+    ended       True when the watched path itself was deleted or moved away; the watch
+                ends with this notice
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from steward.event import StewardEvent, EventType
+
+CREATED = "created"
+DELETED = "deleted"
+MODIFIED = "modified"
+
+NOTICES = {CREATED: "FILE_CREATED", DELETED: "FILE_DELETED", MODIFIED: "FILE_MODIFIED"}
+
+# (earlier change, later change) -> what the two amount to; None cancels both
+_COALESCE = {
+    (CREATED, MODIFIED): CREATED,
+    (CREATED, DELETED): None,
+    (DELETED, CREATED): MODIFIED,
+    (DELETED, MODIFIED): MODIFIED,
+    (MODIFIED, CREATED): MODIFIED,
+    (MODIFIED, DELETED): DELETED,
+}
+
+
+def coalesce(earlier, later):
+    if earlier == later:
+        return earlier
+    return _COALESCE[(earlier, later)]
+
+
+class WatchError(Exception):
+    pass
+
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """
+    Changes read from one inotify descriptor.  A key is a watch descriptor.
+    """
+    name = "inotify"
+
+    @staticmethod
+    def load_libc():
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+        except (OSError, AttributeError):
+            return None
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+
+    def __init__(self, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.overflowed = False
+
+    def fileno(self):
+        return self.fd
+
+    def add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def remove(self, key):
+        self.libc.inotify_rm_watch(self.fd, key)
+
+    def read(self):
+        """
+        The changes waiting on the descriptor as (key, name, change, gone) tuples: `name` is
+        the entry in a watched directory ('' for the watched path itself) and `gone` is True
+        once the kernel has dropped the watch.
+        """
+        changes = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changes
+
+            position = 0
+            while position + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, position)
+                position += _EVENT_HEADER.size
+                name = os.fsdecode(data[position:position + length].rstrip(b"\0"))
+                position += length
+
+                if mask & IN_Q_OVERFLOW:
+                    self.overflowed = True
+                elif mask & IN_IGNORED:
+                    changes.append((wd, "", None, True))
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changes.append((wd, "", DELETED, False))
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    changes.append((wd, name, CREATED, False))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changes.append((wd, name, DELETED, False))
+                else:
+                    changes.append((wd, name, MODIFIED, False))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _signature(st, is_dir):
+    # a directory's own mtime changes with its contents, which are reported separately
+    return (st.st_ino,) if is_dir else (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class PollingBackend:
+    """
+    Changes found by comparing os.stat() snapshots.  A key is the watched path.
+    """
+    name = "poll"
+
+    def __init__(self):
+        self.snapshots = {}
+        self._lock = threading.Lock()
+
+    def fileno(self):
+        return None
+
+    def snapshot(self, path):
+        st = os.stat(path)
+        if not os.path.isdir(path):
+            return {"": _signature(st, False)}
+        entries = {}
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    entries[entry.name] = _signature(entry.stat(follow_symlinks=False), is_dir)
+                except OSError:
+                    continue
+        entries[""] = _signature(st, True)
+        return entries
+
+    def add(self, path):
+        snapshot = self.snapshot(path)
+        with self._lock:
+            self.snapshots.setdefault(path, snapshot)
+        return path
+
+    def remove(self, key):
+        with self._lock:
+            self.snapshots.pop(key, None)
+
+    def read(self):
+        with self._lock:
+            watched = list(self.snapshots.items())
+
+        changes = []
+        for path, before in watched:
+            try:
+                after = self.snapshot(path)
+            except OSError:
+                changes.append((path, "", DELETED, False))
+                changes.append((path, "", None, True))
+                self.remove(path)
+                continue
+
+            if after[""] != before[""]:
+                # the watched file changed, or the watched directory was replaced by another
+                changes.append((path, "", MODIFIED, False))
+            for name in after.keys() - before.keys():
+                changes.append((path, name, CREATED, False))
+            for name in before.keys() - after.keys():
+                changes.append((path, name, DELETED, False))
+            for name in after.keys() & before.keys():
+                if name and after[name] != before[name]:
+                    changes.append((path, name, MODIFIED, False))
+
+            with self._lock:
+                if path in self.snapshots:
+                    self.snapshots[path] = after
+        return changes
+
+    def close(self):
+        with self._lock:
+            self.snapshots.clear()
+
+
+class Watch:
+    def __init__(self, request, path, key, topic, codec):
+        self.request = request
+        self.id = request.id
+        self.path = path
+        self.key = key
+        self.topic = topic
+        self.codec = codec
+
+
+class FileWatcher:
+    """
+    The watches of one plugin instance.  `send(topic, event, codec)` publishes an event.
+    The watcher thread starts with the first watch.
+    """
+    def __init__(self, send, logger=None, backend=None, debounce=None, max_delay=None, poll_interval=None, max_watches=None):
+        if backend is None:
+            backend = os.getenv('STEWARD_WATCH_BACKEND', 'auto')
+        if debounce is None:
+            debounce = float(os.getenv('STEWARD_WATCH_DEBOUNCE', 0.2))
+        if max_delay is None:
+            max_delay = float(os.getenv('STEWARD_WATCH_MAX_DELAY', 2.0))
+        if poll_interval is None:
+            poll_interval = float(os.getenv('STEWARD_WATCH_POLL_INTERVAL', 1.0))
+        if max_watches is None:
+            max_watches = int(os.getenv('STEWARD_WATCH_MAX', 256))
+
+        self.send = send
+        self.logger = logger
+        self.backend_name = backend
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.poll_interval = poll_interval
+        self.max_watches = max_watches
+
+        self.backend = None
+        self.watches = {}
+        # backend key -> IDs of the watches sharing it
+        self._keys = {}
+        self._key_paths = {}
+        # (watch ID, path) -> [change, first seen, last seen, count]
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._thread = None
+        self._running = False
+        # wakes the thread when watches change: a pipe next to the inotify descriptor, or an Event when polling
+        self._wake_read, self._wake_write = None, None
+        self._wakeup = threading.Event()
+
+    def __len__(self):
+        return len(self.watches)
+
+    def _create_backend(self):
+        if self.backend_name in ("auto", "inotify"):
+            libc = InotifyBackend.load_libc()
+            if libc is not None:
+                return InotifyBackend(libc)
+            if self.backend_name == "inotify":
+                raise WatchError("inotify is not available")
+            if self.logger:
+                self.logger.info("inotify is not available, watching files by polling")
+        return PollingBackend()
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self.backend = self._create_backend()
+            if self.backend.fileno() is not None:
+                self._wake_read, self._wake_write = os.pipe()
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="steward-file-watch", daemon=True)
+            self._thread.start()
+
+    def watch(self, request, topic, codec):
+        """
+        Start the watch asked for by the FILE_WATCH `request`.  Raises WatchError, or OSError
+        if the path cannot be watched.
+        """
+        path = os.path.abspath(request.payload['path'])
+        with self._lock:
+            if len(self.watches) >= self.max_watches:
+                raise WatchError("Too many watches")
+            self.start()
+
+            key = self.backend.add(path)
+            watch = Watch(request, path, key, topic, codec)
+            self.watches[watch.id] = watch
+            self._keys.setdefault(key, set()).add(watch.id)
+            self._key_paths[key] = path
+        return watch
+
+    def unwatch(self, watch_id):
+        """
+        End a watch.  Returns False if there is no such watch.
+        """
+        with self._lock:
+            watch = self.watches.pop(watch_id, None)
+            if watch is None:
+                return False
+            self._drop(watch)
+        return True
+
+    def unwatch_topic(self, topic):
+        """
+        End every watch sending to `topic` (the client has gone).
+        """
+        with self._lock:
+            for watch in [watch for watch in self.watches.values() if watch.topic == topic]:
+                self.unwatch(watch.id)
+
+    def _drop(self, watch, remove_key=True):
+        ids = self._keys.get(watch.key)
+        if ids is not None:
+            ids.discard(watch.id)
+            if not ids:
+                del self._keys[watch.key]
+                self._key_paths.pop(watch.key, None)
+                if remove_key:
+                    self.backend.remove(watch.key)
+        for pending in [pending for pending in self._pending if pending[0] == watch.id]:
+            del self._pending[pending]
+
+    def close_all(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self.watches.clear()
+            self._keys.clear()
+            self._key_paths.clear()
+            self._pending.clear()
+            self._wake()
+        self._thread.join(5)
+        self.backend.close()
+        if self._wake_read is not None:
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._wake_read, self._wake_write = None, None
+
+    def _wake(self):
+        self._wakeup.set()
+        if self._wake_write is not None:
+            try:
+                os.write(self._wake_write, b"x")
+            except OSError:
+                pass
+
+    def _wait(self, timeout):
+        """
+        Wait up to `timeout` seconds.  Returns True if the backend has changes to read.
+        """
+        fd = self.backend.fileno()
+        if fd is None:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            return False
+
+        readable, _, _ = select.select([self._wake_read, fd], [], [], timeout)
+        if self._wake_read in readable:
+            os.read(self._wake_read, 1024)
+        return fd in readable
+
+    def _run(self):
+        polling = self.backend.fileno() is None
+        next_poll = time.monotonic() + self.poll_interval
+        while self._running:
+            now = time.monotonic()
+            timeout = self.poll_interval if polling else 1.0
+            with self._lock:
+                for _, first, last, _ in self._pending.values():
+                    timeout = min(timeout, last + self.debounce - now, first + self.max_delay - now)
+            if polling:
+                timeout = min(timeout, next_poll - now)
+
+            try:
+                readable = self._wait(max(0, timeout))
+                if not self._running:
+                    return
+
+                changes = []
+                if polling and time.monotonic() >= next_poll:
+                    changes = self.backend.read()
+                    next_poll = time.monotonic() + self.poll_interval
+                elif readable:
+                    changes = self.backend.read()
+                    if self.backend.overflowed:
+                        self.backend.overflowed = False
+                        if self.logger:
+                            self.logger.warning("inotify queue overflowed, some file changes were not reported")
+
+                self._record(changes)
+                self._flush()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Error in the file watcher: {e}")
+
+    def _record(self, changes):
+        now = time.monotonic()
+        with self._lock:
+            for key, name, change, gone in changes:
+                if gone:
+                    self._end(key)
+                    continue
+                watched = self._key_paths.get(key)
+                if watched is None:
+                    continue
+                path = os.path.join(watched, name) if name else watched
+                for watch_id in self._keys.get(key, ()):
+                    pending = self._pending.get((watch_id, path))
+                    if pending is None:
+                        self._pending[(watch_id, path)] = [change, now, now, 1]
+                        continue
+                    pending[0] = coalesce(pending[0], change) if pending[0] else change
+                    pending[2] = now
+                    pending[3] += 1
+
+    def _end(self, key):
+        """
+        The watched path is gone: send what is pending for its watches, then end them.
+        """
+        for watch_id in list(self._keys.get(key, ())):
+            watch = self.watches.pop(watch_id)
+            self._flush(watch_id=watch_id, ended=watch)
+            self._drop(watch, remove_key=False)
+
+    def _flush(self, watch_id=None, ended=None):
+        now = time.monotonic()
+        notices = []
+        with self._lock:
+            for pending_key, (change, first, last, count) in list(self._pending.items()):
+                if watch_id is not None:
+                    if pending_key[0] != watch_id:
+                        continue
+                elif now - last < self.debounce and now - first < self.max_delay:
+                    continue
+                del self._pending[pending_key]
+                watch = ended if ended is not None else self.watches.get(pending_key[0])
+                if change is None or watch is None:
+                    continue
+                path = pending_key[1]
+                notices.append((watch, change, path, count, ended is not None and path == watch.path))
+
+            if ended is not None and not any(notice[4] for notice in notices):
+                notices.append((ended, DELETED, ended.path, 1, True))
+
+        for watch, change, path, count, is_end in notices:
+            payload = {"watch_id": watch.id, "path": path, "watched": watch.path, "changes": count}
+            if is_end:
+                payload["ended"] = True
+            self.send(watch.topic, StewardEvent(EventType.NOTICE, NOTICES[change], trigger_event=watch.request, payload=payload), watch.codec)
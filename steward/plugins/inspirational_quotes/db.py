@@ -4,6 +4,8 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
+from steward.profiler import boot_profiler
+
 Base = declarative_base()
 
 class Quote(Base):
@@ -25,9 +27,9 @@ class DB:
             raise ValueError("No database path provided")
         
         print(f"dbpath: {self.dbpath}")
-        self.engine = create_engine(f"sqlite:///{self.dbpath}")
-
-        Base.metadata.create_all(self.engine, checkfirst=True)
+        with boot_profiler.phase("DB.setup_db", dbpath=self.dbpath):
+            self.engine = create_engine(f"sqlite:///{self.dbpath}")
+            Base.metadata.create_all(self.engine, checkfirst=True)
 
     def get_session(self):
         if self.engine:
@@ -37,18 +39,19 @@ class DB:
         return None
     
     def get_todays_quotes(self):
-        session = self.get_session()
         sod = datetime.combine(datetime.today(), datetime.min.time())
         start_of_day = int(sod.timestamp() * 1000)
-        data = session.query(Quote).filter(Quote.created_at >= start_of_day).all()
+        # close the session so its connection goes back to the pool
+        with self.get_session() as session:
+            data = session.query(Quote).filter(Quote.created_at >= start_of_day).all()
         return data
 
     def add_quote(self, quote, author):
-        session = self.get_session()
         current_timestamp = int(datetime.today().timestamp() * 1000)
         q = Quote(quote=quote, author=author, created_at=current_timestamp)
-        session.add(q)
-        session.commit()
+        with self.get_session() as session:
+            session.add(q)
+            session.commit()
 
 
 # from . import DB_URL
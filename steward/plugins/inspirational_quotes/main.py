@@ -48,7 +48,7 @@ class PluginQuotes(BasePlugin):
 
         return chosen
 
-    @is_event_handler(event="INSPIRATIONAL_QUOTE")
+    @is_event_handler(event="INSPIRATIONAL_QUOTE", event_types=EventType.COMMAND)
     def on_get_quote(self, event, message=None):
         """
         Get a random quote from the database
@@ -62,7 +62,7 @@ class PluginQuotes(BasePlugin):
         """
         if event and event.is_command:
             quote = self.get_quote()
-            response = StewardEvent(EventType.RESPONSE, event.name, payload=quote)
-            self.mqtt_client.publish(message.topic, response.toJSON())
+            response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=quote)
+            self.send_response_event(message, response)
 
     
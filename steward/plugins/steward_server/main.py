@@ -2,6 +2,7 @@
 from steward.plugins._base_plugin import BasePlugin
 from steward.decorators import STEWARD_DIR, is_event_handler
 from steward.event import StewardEvent, EventType
+from steward.codecs import choose_codec
 
 class PluginInfoIO(BasePlugin):
     def __init__(self, logger=None, client=None):
@@ -13,12 +14,13 @@ class PluginInfoIO(BasePlugin):
 
         self._active_connections = {}
 
-    @is_event_handler(event="CLIENT_REGISTER")
+    @is_event_handler(event="CLIENT_REGISTER", event_types=EventType.NOTICE)
     def register_client(self, event, message=None):
         """
         Register a client.  
         Adds the client details to the internal _active_connections dictionary.
         Client details normally include a client_id, and a client_type value, but may include other information.
+        If the client lists the wire codecs it supports, the chosen codec is sent back in a CLIENT_REGISTER response.
         
         Params:
             event (StewardEvent): The event that triggered this function.
@@ -32,7 +34,13 @@ class PluginInfoIO(BasePlugin):
         if not client_id in self._active_connections:
             self._active_connections[client_id] = data
 
-    @is_event_handler("CLIENT_STOP")
+        # tell the client which wire codec to use for the rest of the connection
+        codec = choose_codec(data.get('codecs'))
+        data['codec'] = codec.name
+        response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload={"id": client_id, "codec": codec.name})
+        self.mqtt_client.publish(f"steward/{client_id}", response.toJSON())
+
+    @is_event_handler("CLIENT_STOP", EventType.NOTICE)
     def unregister_client(self, event, message=None):
         """
         Un-registers a client.
@@ -50,7 +58,7 @@ class PluginInfoIO(BasePlugin):
             self.logger.debug(f"Unregistering client: {client_id}")
             del self._active_connections[client_id]
 
-    @is_event_handler("LIST_CLIENTS")
+    @is_event_handler("LIST_CLIENTS", EventType.COMMAND)
     def command_list_clients(self, event, message=None):
         """
         Retrieves the current list of active clients.
@@ -64,5 +72,5 @@ class PluginInfoIO(BasePlugin):
         """
         if event.is_command:
             data = list(self._active_connections.items())
-            response = StewardEvent(EventType.RESPONSE, event.name, payload=data)
+            response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=data)
             self.send_response_event(message, response)
\ No newline at end of file
@@ -12,19 +12,19 @@ class PluginTime(BasePlugin):
         self.datadir = f"{STEWARD_DIR}/{self.name.lower()}"
 
 
-    @is_event_handler(event="GET_TIME")
+    @is_event_handler(event="GET_TIME", event_types=EventType.COMMAND)
     def getTime(self, event, message=None):
         if event and event.is_command and message:
             now = datetime.now()
             locale_aware_time = now.strftime('%c')
 
-            resp = StewardEvent(event_type=EventType.RESPONSE, name=event.name, payload=locale_aware_time)
+            resp = StewardEvent(event_type=EventType.RESPONSE, name=event.name, trigger_event=event, payload=locale_aware_time)
             self.send_response_event(message, resp)
             
-    @is_event_handler(event="GET_TIMESTAMP")
+    @is_event_handler(event="GET_TIMESTAMP", event_types=EventType.COMMAND)
     def getTimestamp(self, event, message=None):
         if event and event.is_command and message:
             timestamp = int(datetime.today().timestamp() * 1000)
 
-            resp = StewardEvent(event_type=EventType.RESPONSE, name=event.name, payload=timestamp)
+            resp = StewardEvent(event_type=EventType.RESPONSE, name=event.name, trigger_event=event, payload=timestamp)
             self.send_response_event(message, resp)
\ No newline at end of file
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BootProfiler:
+    """
+    Records wall time and the number of newly imported modules for each phase of server boot.
+
+    Phases nest: a plugin load inside StewardServer.__init__ is recorded with depth 1.  Timing
+    is always collected (it is two clock reads per phase), the report is only published and
+    written to disk when STEWARD_BOOT_PROFILE is set.  finish() marks the end of boot; later
+    phases (client registrations, lazy plugin loads, reloads) are not recorded, so the list
+    does not grow for the life of the process.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.start_modules = len(sys.modules)
+        self.phases = []
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return os.getenv('STEWARD_BOOT_PROFILE', '').lower() not in ('', '0', 'false', 'no')
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name, **details):
+        if self.finished is not None:
+            yield
+            return
+
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        modules = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.depth = depth
+            record = {
+                "phase": name,
+                "depth": depth,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "wall_ms": round(elapsed * 1000, 3),
+                "new_modules": len(sys.modules) - modules,
+            }
+            record.update(details)
+            self.phases.append(record)
+
+    def report(self):
+        return {
+            "pid": os.getpid(),
+            "elapsed_ms": round(((self.finished or time.perf_counter()) - self.started) * 1000, 3),
+            "modules": len(sys.modules),
+            "new_modules": len(sys.modules) - self.start_modules,
+            # in start order, so nested phases follow their parent
+            "phases": sorted(self.phases, key=lambda record: record["start_ms"]),
+        }
+
+    def write(self, path=None):
+        path = path or os.getenv('STEWARD_BOOT_PROFILE_FILE', 'logs/boot_profile.json')
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+# one profiler per process, shared by the server, plugin loader and plugins
+boot_profiler = BootProfiler()
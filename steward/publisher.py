@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+
+from steward.codecs import DEFAULT_CODEC
+
+
+class _Batch:
+    __slots__ = ("frames", "size", "deadline")
+
+    def __init__(self, deadline):
+        self.frames = []
+        self.size = 0
+        self.deadline = deadline
+
+
+class BatchingPublisher:
+    """
+    Sits in front of the paho client and coalesces outbound events.
+
+    Events published with publish_event() for the same topic (and codec) within `window_ms`
+    are sent as one batch message.  A batch is sent early once it holds `max_events` events
+    or `max_bytes` bytes.  The receiving MessageAgent unpacks batches transparently.
+
+    Event names listed in `exclude` always go out immediately, so latency sensitive events
+    are never held back.  A window of 0 disables batching: every event is published at once.
+
+    Batches are sent one at a time, whether by the publishing thread (a full batch) or by the
+    flusher thread (the window ran out), so those for one topic go out in order.
+
+    Anything else (publish(), subscribe(), ...) is passed straight through to the client.
+    """
+    def __init__(self, client, window_ms=None, max_events=None, max_bytes=None, exclude=None, logger=None):
+        self.client = client
+        self.logger = logger
+
+        if window_ms is None:
+            window_ms = float(os.getenv('STEWARD_BATCH_WINDOW_MS', 0))
+        if max_events is None:
+            max_events = int(os.getenv('STEWARD_BATCH_MAX_EVENTS', 100))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('STEWARD_BATCH_MAX_BYTES', 256 * 1024))
+        if exclude is None:
+            exclude = [name.strip() for name in os.getenv('STEWARD_BATCH_EXCLUDE', '').split(',') if name.strip()]
+
+        self.window = window_ms / 1000
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.exclude = frozenset(exclude)
+        self.passes_objects = getattr(client, "passes_objects", False) is True
+        self.batches_sent = 0
+        self.events_batched = 0
+
+        self._batches = {}
+        self._cond = threading.Condition()
+        # held from taking batches until they are sent, so batches for one topic stay in order
+        self._send_lock = threading.Lock()
+        self._flusher = None
+        self._running = True
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def should_batch(self, event):
+        return self.enabled and event.name not in self.exclude
+
+    def publish_event(self, topic, event, codec=None):
+        """
+        Encode and publish an event, batching it if its name allows.
+        """
+        if self.passes_objects:
+            # the loopback transport hands the event itself to subscribers, nothing to encode or batch
+            return self.client.publish(topic, event)
+
+        codec = codec or DEFAULT_CODEC
+        frame = codec.encode(event)
+        if not self.should_batch(event):
+            return self.client.publish(topic, frame)
+
+        full = False
+        with self._cond:
+            running = self._running
+            key = (topic, codec)
+            if running:
+                batch = self._batches.get(key)
+                if batch is None:
+                    batch = self._batches[key] = _Batch(time.monotonic() + self.window)
+                    self._start_flusher()
+                    self._cond.notify()
+
+                batch.frames.append(frame)
+                batch.size += len(frame)
+                full = len(batch.frames) >= self.max_events or batch.size >= self.max_bytes
+
+        if not running:
+            # stopped, there is no flusher left to send a batch; wait for what stop() is sending
+            with self._send_lock:
+                return self.client.publish(topic, frame)
+        if full:
+            with self._send_lock:
+                for key, batch in self._take([key]):
+                    self._send(key, batch)
+
+    def flush(self):
+        """
+        Send everything that is waiting, regardless of the window.
+        """
+        with self._send_lock:
+            for key, batch in self._take():
+                self._send(key, batch)
+
+    def stop(self):
+        """
+        Stop the flusher and send what is still waiting.  Events published afterwards go out
+        at once.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.flush()
+
+    def _take(self, keys=None):
+        """
+        Remove the batches for `keys` (all of them by default) and return them as (key, batch).
+        Call with self._send_lock held, so a batch is sent before any batch taken after it.
+        """
+        with self._cond:
+            if keys is None:
+                batches, self._batches = self._batches, {}
+                return list(batches.items())
+            return [(key, self._batches.pop(key)) for key in keys if key in self._batches]
+
+    def _send(self, key, batch):
+        topic, codec = key
+        if len(batch.frames) == 1:
+            payload = batch.frames[0]
+        else:
+            payload = codec.encode_batch(batch.frames)
+            self.batches_sent += 1
+            self.events_batched += len(batch.frames)
+        self.client.publish(topic, payload)
+
+    def _start_flusher(self):
+        # called with self._cond held
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="steward-batcher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if not self._batches:
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                due = [key for key, batch in self._batches.items() if batch.deadline <= now]
+                if not due:
+                    next_deadline = min(batch.deadline for batch in self._batches.values())
+                    self._cond.wait(next_deadline - now)
+                    continue
+
+            with self._send_lock:
+                for key, batch in self._take(due):
+                    try:
+                        self._send(key, batch)
+                    except Exception as e:
+                        if self.logger:
+                            self.logger.exception(f"Failed to publish batch to {key[0]}: {e}")
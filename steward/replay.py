@@ -0,0 +1,250 @@
+"""
+Replay traffic recorded by the event journal against a running server.
+
+Recorded requests are republished at their original pace, `speed` times faster, or as fast
+as possible, through a pool of StewardClient identities.  Each recorded topic (one original
+client) is replayed by the same identity, so per-client ordering is kept.  Responses are
+matched with request futures and summarised per event name.  Commands that write files
+(WRITE_EVENTS) are skipped unless --include-writes is given.
+
+    python -m steward replay --journal logs/journal --speed 10 --clients 16
+"""
+import json
+import os
+import threading
+import time
+from functools import partial
+
+from steward.clients.client import StewardClient
+from steward.event import EventType
+from steward.journal import JournalReader
+
+DEFAULT_TYPES = "COMMAND,QUERY"
+DEFAULT_EXCLUDE = "CLIENT_REGISTER"
+# commands that change the filesystem of the server replayed against, only sent with --include-writes
+WRITE_EVENTS = "FILE_WRITE_CONTENTS,FILE_MOVE_FILE,FILE_CREATE_DIRECTORY,FILE_BATCH"
+
+
+class ReplayClient(StewardClient):
+    """
+    A StewardClient that listens on its own topic and the broadcast topic only, and skips
+    the demo request.
+    """
+    def __init__(self, level="WARNING", transport=None):
+        super().__init__(level=level, transport=transport)
+        self.ready = threading.Event()
+
+    def on_connect(self, client, userdata, flags, rc):
+        client.subscribe([(self.client_topic, 0), ("steward/broadcast", 0)])
+        self.client_register(None, self.client_topic)
+        self.ready.set()
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(fraction * len(values))) - 1))
+    return values[rank]
+
+
+class ReplayReport:
+    def __init__(self):
+        self.sent = 0
+        self.elapsed = 0
+        self.names = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.names.get(name)
+        if stats is None:
+            stats = self.names[name] = {"sent": 0, "ok": 0, "errors": 0, "timeouts": 0, "latencies": []}
+        return stats
+
+    def record_sent(self, name):
+        with self._lock:
+            self.sent += 1
+            self._stats(name)["sent"] += 1
+
+    def record_result(self, name, future):
+        with self._lock:
+            stats = self._stats(name)
+            try:
+                event = future.result()
+            except TimeoutError:
+                stats["timeouts"] += 1
+                return
+            except Exception:
+                stats["errors"] += 1
+                return
+
+            stats["errors" if event.is_error else "ok"] += 1
+            stats["latencies"].append(future.latency)
+
+    @property
+    def completed(self):
+        return sum(stats["ok"] + stats["errors"] for stats in self.names.values())
+
+    def summary(self):
+        rows = {}
+        for name, stats in sorted(self.names.items()):
+            latencies = sorted(stats["latencies"])
+            row = {key: stats[key] for key in ("sent", "ok", "errors", "timeouts")}
+            for label, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+                value = percentile(latencies, fraction)
+                row[label] = round(value * 1000, 3) if value is not None else None
+            rows[name] = row
+
+        return {
+            "sent": self.sent,
+            "completed": self.completed,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput": round(self.completed / self.elapsed, 1) if self.elapsed else None,
+            "events": rows,
+        }
+
+    def format(self):
+        summary = self.summary()
+        lines = [
+            f"sent {summary['sent']}, answered {summary['completed']} in {summary['elapsed_s']:.1f}s "
+            f"({summary['throughput'] or 0:,.1f} responses/s)",
+            "",
+            f"{'event':<28}{'sent':>8}{'ok':>8}{'errors':>8}{'timeouts':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+        ]
+
+        def ms(value):
+            return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+        for name, row in summary["events"].items():
+            lines.append(f"{name:<28}{row['sent']:>8}{row['ok']:>8}{row['errors']:>8}{row['timeouts']:>10}"
+                         f"{ms(row['p50_ms'])}{ms(row['p95_ms'])}{ms(row['p99_ms'])}")
+        return "\n".join(lines)
+
+
+class Replayer:
+    """
+    Republish journal records through `clients` (anything with StewardClient.request()).
+
+    `speed` scales the recorded gaps between events: 1 is the original pace, 10 is ten times
+    faster, None sends as fast as `max_in_flight` allows.
+    """
+    def __init__(self, clients, speed=1.0, timeout=30, max_in_flight=1000, logger=None):
+        self.clients = clients
+        self.speed = speed
+        self.timeout = timeout
+        self.logger = logger
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._outstanding = set()
+        self._lock = threading.Lock()
+
+    def run(self, records):
+        report = ReplayReport()
+        assigned = {}
+        started = time.perf_counter()
+        first = None
+
+        for record in records:
+            if first is None:
+                first = record.recorded_at
+            if self.speed:
+                delay = started + (record.recorded_at - first) / 1000 / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            client = assigned.get(record.topic)
+            if client is None:
+                client = assigned[record.topic] = self.clients[len(assigned) % len(self.clients)]
+
+            self._in_flight.acquire()
+            try:
+                future = client.request(record.name, record.event().payload, self.timeout, record.event_type)
+            except Exception as e:
+                self._in_flight.release()
+                if self.logger:
+                    self.logger.error(f"Unable to replay {record.name}: {e}")
+                continue
+
+            report.record_sent(record.name)
+            with self._lock:
+                self._outstanding.add(future)
+            future.add_done_callback(partial(self._done, report, record.name))
+
+        # wait for the stragglers; every future either resolves or times out
+        while True:
+            with self._lock:
+                if not self._outstanding:
+                    break
+            time.sleep(0.01)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _done(self, report, name, future):
+        report.record_result(name, future)
+        with self._lock:
+            self._outstanding.discard(future)
+        self._in_flight.release()
+
+
+def parse_speed(value):
+    return None if value in ("max", "0") else float(value)
+
+
+def add_arguments(parser):
+    parser.add_argument("--journal", default=None, help="journal directory (default STEWARD_JOURNAL_DIR or logs/journal)")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1 = recorded pace, N = N times faster, max = no delays")
+    parser.add_argument("--clients", type=int, default=8, help="number of client identities to replay through")
+    parser.add_argument("--names", default=None, help="comma separated event names or patterns to replay (FILE_*)")
+    parser.add_argument("--exclude", default=DEFAULT_EXCLUDE, help="comma separated event names to skip")
+    parser.add_argument("--include-writes", action="store_true", help=f"also replay commands that change files ({WRITE_EVENTS})")
+    parser.add_argument("--types", default=DEFAULT_TYPES, help="comma separated event types to replay")
+    parser.add_argument("--start", type=int, default=None, help="first recorded time to replay (ms since the epoch)")
+    parser.add_argument("--end", type=int, default=None, help="last recorded time to replay (ms since the epoch)")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each response")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="requests waiting for a response at once")
+    parser.add_argument("--output", default=None, help="also write the report to this JSON file")
+    parser.set_defaults(func=main)
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+
+def skipped_names(args):
+    exclude = set(_split(args.exclude) or ())
+    if not args.include_writes:
+        exclude.update(_split(WRITE_EVENTS))
+    return exclude
+
+
+def main(args):
+    directory = args.journal or os.getenv('STEWARD_JOURNAL_DIR', 'logs/journal')
+    exclude = skipped_names(args)
+    event_types = [EventType[name] for name in _split(args.types)]
+    records = (
+        record for record in JournalReader(directory).query(args.start, args.end, _split(args.names), event_types)
+        if record.name not in exclude
+    )
+
+    clients = [ReplayClient() for _ in range(max(1, args.clients))]
+    for client in clients:
+        client.connect(blocking=False)
+    for client in clients:
+        if not client.ready.wait(10):
+            print(f"Client {client.id} could not connect to {client.mqtt_host}:{client.mqtt_port}")
+            return 1
+
+    try:
+        report = Replayer(clients, speed=args.speed, timeout=args.timeout, max_in_flight=args.max_in_flight,
+                          logger=clients[0].logger).run(records)
+    finally:
+        for client in clients:
+            client.disconnect()
+
+    print(report.format())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.summary(), f, indent=2)
+    return 0
@@ -1,6 +1,7 @@
-import paho.mqtt.client as mqtt
+import asyncio
 import os
 import signal
+import threading
 from typing import List
 from nanoid import generate
 from dotenv import load_dotenv
@@ -8,21 +9,39 @@ import importlib.util
 import inspect
 
 from steward.event import StewardEvent, EventType
+from steward.codecs import codec_for
 from steward.logger import get_logger
 from steward.message_agent import MessageAgent
 from steward.decorators import is_event_handler
 from steward.steward_plugins import StewardPlugins
+from steward.aio import AsyncioHelper
+from steward.publisher import BatchingPublisher
+from steward.profiler import boot_profiler
+from steward.journal import EventJournal
+from steward.transport import create_client
 
 load_dotenv()
 
 class StewardServer:
-    def __init__(self, level="INFO"):
+    def __init__(self, level="INFO", transport=None):
+        """
+        `transport` is "mqtt", "loopback" or a LoopbackBroker (see steward.transport); the
+        default comes from STEWARD_TRANSPORT.
+        """
+        with boot_profiler.phase("StewardServer.__init__"):
+            self._init(level, transport)
+
+    def _init(self, level, transport):
         self.id = f'STEWARD-{generate(alphabet="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",size=12)}'
         self.logger = get_logger(name="steward", level=level, console=True, file="logs/steward.log")
-        self.msgagent = MessageAgent(logger=self.logger)
+        # record every event received when STEWARD_JOURNAL is set
+        journal = EventJournal(logger=self.logger) if os.getenv('STEWARD_JOURNAL', '').lower() in ('1', 'true', 'yes') else None
+        self.msgagent = MessageAgent(logger=self.logger, journal=journal)
         # self._active_connections = {}
         
-        self.client = mqtt.Client(client_id=self.id)
+        self.client = create_client(self.id, transport)
+        # set while running under connect_async()
+        self._stopped = None
         self.mqtt_host = os.getenv('STEWARD_MQTT_HOST', 'localhost') 
         self.mqtt_port = int(os.getenv('STEWARD_MQTT_PORT', 1883))
         self.mqtt_ws_port = int(os.getenv('STEWARD_MQTT_WS_PORT', 51234))
@@ -31,26 +50,40 @@ class StewardServer:
         signal.signal(signal.SIGINT, self._handle_disconnect)
         signal.signal(signal.SIGTERM, self._handle_disconnect)
 
-        self.plugin_manager = StewardPlugins(logger=self.logger, client=self.client)
-        self.plugin_manager.scan()
+        # plugins publish through the batcher, which passes straight through unless batching is enabled
+        self.publisher = BatchingPublisher(self.client, logger=self.logger)
+        self.plugin_manager = StewardPlugins(logger=self.logger, client=self.publisher)
+        with boot_profiler.phase("StewardPlugins.scan"):
+            self.plugin_manager.scan()
 
-        # register any event handler methods
-        for pname, p in list(self.plugin_manager.plugins.items()):
-            
-            print(f"Registering event handlers for {p}")
-            self.msgagent.find_event_handlers(p)
+        # register any event handler methods (plugins with a manifest are imported on first use)
+        with boot_profiler.phase("StewardPlugins.register_handlers"):
+            self.plugin_manager.register_handlers(self.msgagent)
 
-    def connect(self):
-        self.logger.debug(f"Connecting to MQTT broker: {self.mqtt_host}:{self.mqtt_port}")
-        
+        # reload plugins in place when their files change
+        if os.getenv('STEWARD_PLUGIN_RELOAD', '').lower() in ('1', 'true', 'yes'):
+            self.plugin_manager.watch(self.msgagent)
+
+        # dump the handler metrics in Prometheus text format every interval, if a file is set
+        self.metrics_file = os.getenv('STEWARD_METRICS_FILE', '')
+        self.metrics_interval = float(os.getenv('STEWARD_METRICS_INTERVAL', 15))
+        self._metrics_stop = threading.Event()
+
+    def _set_callbacks(self):
         self.client.on_connect = self.on_connect
         self.client.on_message = self.msgagent.message_processor
         self.client.on_disconnect = self.on_disconnect
         self.client.on_error = self.on_error
         self.client.on_close = self.on_close
 
+    def connect(self):
+        self.logger.debug(f"Connecting to MQTT broker: {self.mqtt_host}:{self.mqtt_port}")
+        
+        self._set_callbacks()
         self.client.enable_logger()
         self.client.connect(self.mqtt_host, self.mqtt_port, 60)
+        self.msgagent.start()
+        self.start_metrics_dump()
         
         try:
             self.client.loop_forever()
@@ -58,13 +91,40 @@ class StewardServer:
         except KeyboardInterrupt:
             self.disconnect()
 
+    async def connect_async(self):
+        """
+        Run the server on the current asyncio event loop until it disconnects.
+
+        The MQTT socket is driven by the loop, `async def` handlers run as tasks and
+        synchronous handlers run on a thread pool.
+        """
+        self.logger.debug(f"Connecting to MQTT broker (asyncio): {self.mqtt_host}:{self.mqtt_port}")
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        self.msgagent.use_asyncio(loop)
+        self._set_callbacks()
+        AsyncioHelper(loop, self.client)
+        self.client.enable_logger()
+        self.client.connect(self.mqtt_host, self.mqtt_port, 60)
+        self.msgagent.start()
+        self.start_metrics_dump()
+
+        await self._stopped.wait()
+
     def disconnect(self):
         self.logger.warn("Shutting down")
         self.logger.debug("Notifying clients of server shutdown")
         stop_event = StewardEvent(EventType.NOTICE, "SERVER_STOP")
         self.client.publish("steward/broadcast", stop_event.toJSON())
+        self.publisher.stop()
         self.client.disconnect()
         self.client.loop_stop()
+        self.msgagent.stop()
+        self.plugin_manager.stop()
+        if not self._metrics_stop.is_set():
+            self._metrics_stop.set()
+            self.write_metrics()
 
     def _handle_disconnect(self, SIGNAL, FRAME):    
         self.disconnect()
@@ -76,8 +136,81 @@ class StewardServer:
         start_event = StewardEvent(EventType.NOTICE, "SERVER_START")
         client.publish("steward/broadcast", start_event.toJSON())
 
+        boot_profiler.finish()
+        if boot_profiler.enabled:
+            self.publish_boot_profile(client)
+
+    def publish_boot_profile(self, client):
+        """
+        Write the boot profile to STEWARD_BOOT_PROFILE_FILE and broadcast it as a SERVER_BOOT_PROFILE notice.
+        """
+        try:
+            report = boot_profiler.write()
+        except OSError as e:
+            self.logger.error(f"Unable to write boot profile: {e}")
+            report = boot_profiler.report()
+
+        slowest = sorted(report["phases"], key=lambda record: record["wall_ms"], reverse=True)[:5]
+        self.logger.info(f"Boot took {report['elapsed_ms']:.0f}ms, {report['new_modules']} modules imported; slowest phases: "
+                         + ", ".join(f"{record['phase']}({record.get('plugin') or record.get('target') or ''}) {record['wall_ms']:.0f}ms" for record in slowest))
+
+        profile_event = StewardEvent(EventType.NOTICE, "SERVER_BOOT_PROFILE", payload=report)
+        client.publish("steward/broadcast", profile_event.toJSON())
+
+    def metrics_report(self, events=None):
+        """
+        Handler metrics from the message agent, with dispatch drop counts.  `events` limits the
+        handlers to those event names.
+        """
+        metrics = self.msgagent.metrics
+        report = metrics.snapshot() if metrics else {"handlers": []}
+        if events:
+            report["handlers"] = [row for row in report["handlers"] if row["event"] in events]
+        report["enabled"] = metrics is not None
+        report["dropped"] = self.msgagent.engine.dropped_by_type()
+        report["pending_requests"] = len(self.msgagent.pending)
+        return report
+
+    @is_event_handler("STEWARD_METRICS", EventType.QUERY)
+    def query_metrics(self, event, message=None):
+        """
+        Answer with the handler metrics.  The payload may list `events` to report on, and set
+        `reset` to start counting again after this report.
+        """
+        options = event.payload if isinstance(event.payload, dict) else {}
+        report = self.metrics_report(options.get("events"))
+        if options.get("reset") and self.msgagent.metrics:
+            self.msgagent.metrics.reset()
+
+        response = StewardEvent(EventType.RESPONSE, event.name, trigger_event=event, payload=report)
+        self.publisher.publish_event(message.topic, response, codec_for(message.payload))
+
+    def start_metrics_dump(self):
+        if not self.metrics_file or not self.msgagent.metrics or self.metrics_interval <= 0:
+            return
+        threading.Thread(target=self._metrics_loop, name="steward-metrics", daemon=True).start()
+
+    def _metrics_loop(self):
+        while not self._metrics_stop.wait(self.metrics_interval):
+            self.write_metrics()
+
+    def write_metrics(self):
+        """
+        Write the handler metrics to STEWARD_METRICS_FILE in Prometheus text format.
+        """
+        if not self.metrics_file or not self.msgagent.metrics:
+            return
+        try:
+            self.msgagent.metrics.write_prometheus(self.metrics_file, extra={
+                "steward_dispatch_dropped_total": self.msgagent.engine.dropped_by_type()
+            })
+        except OSError as e:
+            self.logger.error(f"Unable to write metrics to {self.metrics_file}: {e}")
+
     def on_disconnect(self, client, userdata, rc):
         self.logger.debug("Disconnected with result code "+str(rc))
+        if self._stopped is not None:
+            self._stopped.set()
 
 
     def on_error(self, client, userdata, exc):
@@ -1,18 +1,120 @@
 import os
 import sys
+import json
+import threading
+import importlib
 import importlib.util
 import inspect
 
+from steward.event import EventType
+from steward.profiler import boot_profiler
+
 PLUGINS_DIR = os.path.join(os.path.dirname(__file__), "plugins")
+MANIFEST_FILE = "manifest.json"
+
+
+class PluginStub:
+    """
+    Stands in for a plugin that has a manifest but has not been imported yet.
+
+    The stub is registered with the MessageAgent for every event listed in the manifest.  The
+    first event to reach it imports and instantiates the real plugin, swaps the stub's
+    handlers for the plugin's own, and hands the event on.
+    """
+    def __init__(self, manager, plugin_name, plugin_dir, manifest):
+        self.manager = manager
+        self.name = plugin_name
+        self.plugin_dir = plugin_dir
+        self.manifest = manifest
+        self.instance = None
+        self.msgagent = None
+        # set when a reload has replaced this stub, so a load already under way does not register
+        self.retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def metrics_label(self):
+        # names this stub's handlers in the handler metrics
+        return f"{type(self).__name__}[{self.name}]"
+
+    @property
+    def events(self):
+        """
+        (event name, event types or None) pairs declared by the manifest.
+        """
+        for event_name, event_types in self.manifest.get("events", {}).items():
+            if event_types:
+                yield event_name, tuple(EventType[event_type] for event_type in event_types)
+            else:
+                yield event_name, None
+
+    def register(self, msgagent):
+        self.msgagent = msgagent
+        for event_name, event_types in self.events:
+            msgagent.add_handler(event_name, self.dispatch, event_types)
+
+    def load(self):
+        with self._lock:
+            if self.instance is None:
+                self.instance = self.manager.load_plugin(self.plugin_dir, self.name)
+                if self.msgagent and not self.retired:
+                    self.msgagent.remove_handlers(self)
+                    if self.instance:
+                        self.msgagent.find_event_handlers(self.instance)
+        return self.instance
+
+    def dispatch(self, event, message=None):
+        """
+        Load the plugin and call its handlers for the event.  If any of them are async, returns
+        a coroutine awaiting them, for the MessageAgent to run like any async handler.
+        """
+        instance = self.load()
+        if instance is None:
+            return
+
+        pending = []
+        for attr_name in dir(instance):
+            attr = getattr(instance, attr_name)
+            if getattr(attr, 'handles_event', None) != event.name:
+                continue
+            event_types = getattr(attr, 'handles_event_types', None)
+            if event_types is None or event.event_type in event_types:
+                result = attr(event, message)
+                if inspect.iscoroutine(result):
+                    pending.append(result)
+
+        if pending:
+            return _await_all(pending)
+
+
+async def _await_all(coroutines):
+    for coroutine in coroutines:
+        await coroutine
+
 
 class StewardPlugins:
     def __init__(self, logger=None, client=None, base_file='main.py'):
         self.plugins = {}
+        self.stubs = {}
+        self.isolated = {}
+        self.isolate = {name.strip() for name in os.getenv('STEWARD_ISOLATED_PLUGINS', '').split(',') if name.strip()}
         self.base_file = base_file
         self.logger = logger
         self.client = client
+        self.msgagent = None
+        self._fingerprints = {}
+        self._watching = threading.Event()
 
     def scan(self):
+        """
+        Find the plugins.  Plugins with a manifest get a PluginStub and are imported on first
+        use.  Plugins without one are imported right away.  Manifest plugins marked
+        "isolated" (or listed in STEWARD_ISOLATED_PLUGINS) run in worker processes instead.
+        """
+        for item, current_path in self.plugin_dirs():
+            self.add_plugin(item, current_path)
+
+    def plugin_dirs(self):
         for item in os.listdir(PLUGINS_DIR):
             # skip items that begin with an underscore
             if item.startswith("_"):
@@ -20,34 +122,214 @@ class StewardPlugins:
 
             current_path = os.path.join(PLUGINS_DIR, item)
             if os.path.isdir(current_path):
-                print(f"Loading plugin: {item} : {current_path}")
-                self.load_plugin(current_path, item)
-                
+                yield item, current_path
+
+    def add_plugin(self, item, current_path):
+        manifest = self.read_manifest(current_path)
+        if manifest is not None and self.is_isolated(item, manifest):
+            # imported here so multiprocessing is only loaded when a plugin needs it
+            from steward.isolation import IsolatedPlugin
+
+            print(f"Found plugin: {item} : {current_path} (isolated, started on first use)")
+            self.isolated[item] = IsolatedPlugin(self, item, current_path, manifest)
+        elif manifest is not None:
+            print(f"Found plugin: {item} : {current_path} (loaded on first use)")
+            self.stubs[item] = PluginStub(self, item, current_path, manifest)
+        else:
+            if item in self.isolate and self.logger:
+                self.logger.error(f"Plugin {item} has no manifest and cannot be isolated, loading it in process")
+            print(f"Loading plugin: {item} : {current_path}")
+            self.load_plugin(current_path, item)
+
+    def is_isolated(self, plugin_name, manifest):
+        return bool(manifest.get("isolated")) or plugin_name in self.isolate
+
+    def read_manifest(self, plugin_dir):
+        manifest_file = os.path.join(plugin_dir, MANIFEST_FILE)
+        if not os.path.isfile(manifest_file):
+            return None
+
+        try:
+            with open(manifest_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Invalid plugin manifest {manifest_file}: {e}")
+            return None
+
+    def register_handlers(self, msgagent):
+        """
+        Register every plugin with the message agent: loaded plugins directly, the rest through
+        their stubs.
+        """
+        self.msgagent = msgagent
+        for pname, p in list(self.plugins.items()):
+            print(f"Registering event handlers for {p}")
+            msgagent.find_event_handlers(p)
+
+        for pname, stub in list(self.stubs.items()):
+            if pname not in self.plugins:
+                stub.register(msgagent)
+
+        for pname, isolated in list(self.isolated.items()):
+            isolated.register(msgagent)
+
+    def stop(self):
+        """
+        Stop watching for changes and stop the worker processes of isolated plugins.
+        """
+        self._watching.set()
+        for isolated in self.isolated.values():
+            isolated.stop()
+
+    def watch(self, msgagent=None, interval=None):
+        """
+        Poll the plugin directories every `interval` seconds and reload plugins whose files change.
+        """
+        if msgagent:
+            self.msgagent = msgagent
+        if interval is None:
+            interval = float(os.getenv('STEWARD_PLUGIN_RELOAD_INTERVAL', 1))
+
+        self._fingerprints = self.fingerprints()
+        self._watching.clear()
+        threading.Thread(target=self._watch_loop, args=(interval,), name="steward-plugin-watcher", daemon=True).start()
+
+    def _watch_loop(self, interval):
+        while not self._watching.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                if self.logger:
+                    self.logger.exception(f"Plugin reload failed: {e}")
+
+    def fingerprints(self):
+        """
+        (path, mtime, size) of every source file, per plugin directory.
+        """
+        result = {}
+        for item, current_path in self.plugin_dirs():
+            stamp = []
+            for root, dirs, files in os.walk(current_path):
+                dirs[:] = [name for name in dirs if name != "__pycache__"]
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    stamp.append((path, stat.st_mtime_ns, stat.st_size))
+            result[item] = tuple(sorted(stamp))
+        return result
+
+    def check_for_changes(self):
+        """
+        Reload every plugin that was added, changed or removed since the last check.
+        Returns the names of the plugins that were reloaded.
+        """
+        current = self.fingerprints()
+        previous, self._fingerprints = self._fingerprints, current
+
+        changed = sorted(name for name in set(current) | set(previous) if current.get(name) != previous.get(name))
+        return [name for name in changed if self.reload_plugin(name)]
+
+    def reload_plugin(self, plugin_name):
+        """
+        Swap a plugin for a freshly imported copy, or drop it if its directory has gone.
+
+        The new handlers replace the old ones in a single update of the dispatch index, so
+        events for other plugins keep flowing and this plugin's events are never dispatched to
+        both copies.  If the new code fails to import, the old copy stays registered.
+        """
+        current_path = os.path.join(PLUGINS_DIR, plugin_name)
+        old_plugin = self.plugins.pop(plugin_name, None)
+        old_stub = self.stubs.pop(plugin_name, None)
+        old_isolated = self.isolated.pop(plugin_name, None)
+        if old_stub:
+            with old_stub._lock:
+                old_stub.retired = True
+
+        self.purge_modules(current_path)
+        importlib.invalidate_caches()
+
+        try:
+            if os.path.isdir(current_path):
+                self.add_plugin(plugin_name, current_path)
+        except Exception as e:
+            if self.logger:
+                self.logger.exception(f"Unable to reload plugin {plugin_name}, keeping the running version: {e}")
+            for registry, old in ((self.plugins, old_plugin), (self.stubs, old_stub), (self.isolated, old_isolated)):
+                registry.pop(plugin_name, None)
+                if old:
+                    registry[plugin_name] = old
+            if old_stub:
+                old_stub.retired = False
+            return False
+
+        if self.msgagent:
+            with self.msgagent.handler_update():
+                for old in (old_plugin, old_stub, old_isolated):
+                    if old:
+                        self.msgagent.remove_handlers(old)
+
+                if plugin_name in self.plugins:
+                    self.msgagent.find_event_handlers(self.plugins[plugin_name])
+                elif plugin_name in self.stubs:
+                    self.stubs[plugin_name].register(self.msgagent)
+                elif plugin_name in self.isolated:
+                    self.isolated[plugin_name].register(self.msgagent)
+
+        if old_isolated:
+            old_isolated.stop()
+        if old_plugin and hasattr(old_plugin, "unload"):
+            old_plugin.unload()
+
+        if self.logger:
+            self.logger.info(f"Reloaded plugin {plugin_name}")
+        return True
+
+    def purge_modules(self, plugin_dir):
+        """
+        Forget the modules a plugin imported from its own directory (its helpers such as db.py),
+        so the next import reads them from disk again.
+        """
+        prefix = os.path.abspath(plugin_dir) + os.sep
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None)
+            if path and os.path.abspath(path).startswith(prefix):
+                del sys.modules[name]
+
     def load_plugin(self, candidate_dir, plugin_name):
         # Add the plugin directory to sys.path
         sys.path.insert(0, candidate_dir)
 
-        # load classes from candidate directory
-        entry_file = os.path.join(candidate_dir, self.base_file)
-        if os.path.isfile(entry_file):
-
-            print(f"Loading plugin: {plugin_name} : {entry_file}")
-            spec = importlib.util.spec_from_file_location(plugin_name, entry_file)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
-            # Find the class defined in the module
-            for name, obj in inspect.getmembers(module, inspect.isclass):
-                # Ensure the class is defined in the current module
-                if obj.__module__ == plugin_name:
-                    # Instantiate the class and append to the plugins list
-                    inst = obj(logger=self.logger, client=self.client)
-                    self.plugins[plugin_name] = inst
-                    
-                    if self.logger:
-                        self.logger.debug(f"PLUGIN: {inst.name}")
-
-                    break  #Assuming there's only one class per file, we can break the loop
-        
-        # Remove the plugin directory from sys.path to avoid conflicts
-        sys.path.pop(0)
\ No newline at end of file
+        inst = None
+        try:
+            # load classes from candidate directory
+            entry_file = os.path.join(candidate_dir, self.base_file)
+            if os.path.isfile(entry_file):
+
+                print(f"Loading plugin: {plugin_name} : {entry_file}")
+                with boot_profiler.phase("load_plugin", plugin=plugin_name):
+                    spec = importlib.util.spec_from_file_location(plugin_name, entry_file)
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+
+                    # Find the class defined in the module
+                    for name, obj in inspect.getmembers(module, inspect.isclass):
+                        # Ensure the class is defined in the current module
+                        if obj.__module__ == plugin_name:
+                            # Instantiate the class and append to the plugins list
+                            inst = obj(logger=self.logger, client=self.client)
+                            self.plugins[plugin_name] = inst
+
+                            if self.logger:
+                                self.logger.debug(f"PLUGIN: {inst.name}")
+
+                            break  #Assuming there's only one class per file, we can break the loop
+        finally:
+            # Remove the plugin directory from sys.path to avoid conflicts
+            if candidate_dir in sys.path:
+                sys.path.remove(candidate_dir)
+
+        return inst
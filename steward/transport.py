@@ -0,0 +1,220 @@
+"""
+Transports for StewardServer and StewardClient.
+
+A transport is a client object with the part of the paho-mqtt Client interface Steward uses:
+connect(), subscribe(), publish(), loop_forever(), loop_start(), loop_stop(), disconnect()
+and the on_connect / on_message / on_disconnect callbacks.  create_client() picks one:
+
+    mqtt        a paho Client talking to the broker (the default)
+    loopback    a LoopbackClient on the in-process LoopbackBroker
+
+The loopback transport needs no broker.  Topic filters follow MQTT ("+" matches one level,
+"#" the rest), and events published with BatchingPublisher.publish_event() are handed to
+subscribers as the event objects themselves, with no encoding or decoding.  Subscribers in
+the same process share those objects, so handlers must treat events as read-only.
+"""
+import os
+import queue
+import threading
+
+# returned by a client's delivery queue to stop its loop
+_STOP = object()
+
+
+def topic_matches(topic_filter, topic):
+    """
+    True if `topic` matches the MQTT `topic_filter`.
+    """
+    if topic_filter == topic:
+        return True
+
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for position, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if position >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[position]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+class LoopbackMessage:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic, payload, qos=0, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class LoopbackBroker:
+    """
+    Routes messages between LoopbackClients in one process.
+
+    The subscribers for each topic are worked out once and cached until the next subscribe
+    or unsubscribe, so routing a message is a dictionary lookup.
+
+    With `encode` set, clients publish encoded frames as they would over MQTT, so codec costs
+    are still paid (benchmarks use this to measure the whole path).
+    """
+    def __init__(self, encode=False):
+        self.encode = encode
+        self._subscriptions = {}
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, client, topic_filter):
+        with self._lock:
+            self._subscriptions.setdefault(topic_filter, set()).add(client)
+            self._routes = {}
+
+    def unsubscribe(self, client, topic_filter=None):
+        with self._lock:
+            filters = [topic_filter] if topic_filter else list(self._subscriptions)
+            for name in filters:
+                clients = self._subscriptions.get(name)
+                if clients:
+                    clients.discard(client)
+                    if not clients:
+                        del self._subscriptions[name]
+            self._routes = {}
+
+    def subscribers(self, topic):
+        routes = self._routes
+        clients = routes.get(topic)
+        if clients is None:
+            with self._lock:
+                matched = set()
+                for topic_filter, subscribed in self._subscriptions.items():
+                    if topic_matches(topic_filter, topic):
+                        matched.update(subscribed)
+                clients = self._routes[topic] = tuple(matched)
+        return clients
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        message = LoopbackMessage(topic, payload, qos, retain)
+        for client in self.subscribers(topic):
+            client.deliver(message)
+
+
+# the broker shared by every loopback client in this process
+LOOPBACK_BROKER = LoopbackBroker()
+
+
+class LoopbackClient:
+    """
+    A stand-in for paho's Client on a LoopbackBroker.
+
+    Each client delivers its messages on its own loop (loop_forever() or the loop_start()
+    thread), in the order they were published, as paho does from its network thread.  Under
+    the asyncio runtime messages are delivered on the event loop instead.
+    """
+    is_loopback = True
+
+    def __init__(self, client_id="", broker=None, userdata=None):
+        self.client_id = client_id
+        self.broker = broker or LOOPBACK_BROKER
+        self.userdata = userdata
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+        self.connected = False
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._loop = None
+
+    @property
+    def passes_objects(self):
+        # BatchingPublisher hands events over as objects instead of encoding them
+        return not self.broker.encode
+
+    def enable_logger(self, logger=None):
+        pass
+
+    def use_loop(self, loop):
+        """
+        Deliver messages on an asyncio event loop rather than a loop thread.
+        """
+        self._loop = loop
+
+    def connect(self, host=None, port=None, keepalive=60):
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, self.userdata, {}, 0)
+        return 0
+
+    def disconnect(self):
+        if not self.connected:
+            return 0
+
+        self.connected = False
+        self.broker.unsubscribe(self)
+        self._queue.put(_STOP)
+        if self.on_disconnect:
+            self.on_disconnect(self, self.userdata, 0)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        for topic_filter, _ in topics:
+            self.broker.subscribe(self, topic_filter)
+        return 0, None
+
+    def unsubscribe(self, topic):
+        for topic_filter in (topic if isinstance(topic, list) else [topic]):
+            self.broker.unsubscribe(self, topic_filter)
+        return 0, None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload, qos, retain)
+
+    def deliver(self, message):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._handle, message)
+        else:
+            self._queue.put(message)
+
+    def _handle(self, message):
+        if self.on_message:
+            self.on_message(self, self.userdata, message)
+
+    def loop_forever(self):
+        while True:
+            message = self._queue.get()
+            if message is _STOP:
+                return
+            self._handle(message)
+
+    def loop_start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop_forever, name=f"loopback-{self.client_id}", daemon=True)
+            self._thread.start()
+
+    def loop_stop(self):
+        thread, self._thread = self._thread, None
+        if thread and thread is not threading.current_thread():
+            self._queue.put(_STOP)
+            thread.join()
+
+
+def create_client(client_id, transport=None):
+    """
+    Build the transport client for a server or client.  `transport` is "mqtt", "loopback",
+    or a LoopbackBroker to connect to; the default comes from STEWARD_TRANSPORT.
+    """
+    if transport is None:
+        transport = os.getenv('STEWARD_TRANSPORT', 'mqtt')
+
+    if isinstance(transport, LoopbackBroker):
+        return LoopbackClient(client_id=client_id, broker=transport)
+    if transport == "loopback":
+        return LoopbackClient(client_id=client_id)
+    if transport == "mqtt":
+        import paho.mqtt.client as mqtt
+        return mqtt.Client(client_id=client_id)
+
+    raise ValueError(f"Unknown transport: {transport}")
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from steward.clients.dir_listing import ListingFailed
+from steward.event import StewardEvent, EventType
+from steward.plugins.info_io import main as info_io
+from steward.plugins.info_io.listing import DirectoryWalk, ListingError, send_pages
+from steward.replay import ReplayClient
+from steward.server import StewardServer
+from steward.transport import LoopbackBroker
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "build").mkdir()
+    (root / "README.md").write_text("readme")
+    (root / "src" / "main.py").write_text("main")
+    (root / "src" / "pkg" / "util.py").write_text("util")
+    (root / "src" / "pkg" / "data.json").write_text("{}")
+    (root / "build" / "out.o").write_bytes(b"\x00" * 10)
+    os.symlink(root / "src", root / "link")
+    return root
+
+
+def paths(walk):
+    return sorted(entry["path"] for entry in walk)
+
+
+def test_walk(tree):
+    assert paths(DirectoryWalk(str(tree))) == [
+        "README.md", "build", "build/out.o", "link", "src", "src/main.py", "src/pkg", "src/pkg/data.json", "src/pkg/util.py",
+    ]
+
+    entries = {entry["path"]: entry for entry in DirectoryWalk(str(tree))}
+    assert entries["README.md"]["type"] == "file" and entries["README.md"]["size"] == 6
+    assert entries["link"]["type"] == "link" and entries["src"]["type"] == "dir"
+
+
+def test_walk_depth_and_filters(tree):
+    assert paths(DirectoryWalk(str(tree), max_depth=0)) == ["README.md", "build", "link", "src"]
+    assert paths(DirectoryWalk(str(tree), max_depth=1, types="dir")) == ["build", "src", "src/pkg"]
+    assert paths(DirectoryWalk(str(tree), include="*.py")) == ["src/main.py", "src/pkg/util.py"]
+    assert paths(DirectoryWalk(str(tree), include="src/*")) == ["src/main.py", "src/pkg"]
+    assert paths(DirectoryWalk(str(tree), exclude=["build", "pkg"], types=["file"])) == ["README.md", "src/main.py"]
+
+    walk = DirectoryWalk(str(tree), limit=3)
+    assert len(list(walk)) == 3 and walk.truncated
+
+    with pytest.raises(ListingError):
+        DirectoryWalk(str(tree), types="socket")
+    with pytest.raises(FileNotFoundError):
+        DirectoryWalk(str(tree / "missing"))
+
+
+def test_pages(tree):
+    pages = []
+    send_pages(DirectoryWalk(str(tree)), pages.append, page_size=4)
+
+    assert [page["seq"] for page in pages] == [0, 1, 2]
+    assert [len(page["entries"]) for page in pages] == [4, 4, 1]
+    assert pages[-1]["final"] and pages[-1]["count"] == 9 and not pages[-1]["truncated"]
+
+
+def test_pages_start_before_the_walk_ends(tmp_path):
+    for n in range(50):
+        (tmp_path / f"{n}.txt").write_text("")
+
+    walk = DirectoryWalk(str(tmp_path))
+    seen = []
+    send_pages(walk, lambda page: seen.append((page["seq"], walk.count)), page_size=10)
+
+    # each page went out when it filled, not after the directory had been read
+    assert seen[:2] == [(0, 10), (1, 20)]
+
+
+class SlowWalk:
+    """
+    One match, then a long scan of entries that do not match, then another match.
+    """
+    def __init__(self):
+        self.errors = []
+        self.count = 0
+        self.truncated = False
+
+    def __iter__(self):
+        yield {"path": "first"}
+        time.sleep(0.5)
+        yield {"path": "second"}
+        self.count = 2
+
+
+def test_partial_page_is_sent_on_time():
+    sent = []
+    send_pages(SlowWalk(), lambda page: sent.append((time.monotonic(), page)), page_size=10, interval=0.05)
+
+    assert [[entry["path"] for entry in page["entries"]] for _, page in sent] == [["first"], ["second"]]
+    assert sent[1][0] - sent[0][0] > 0.3 and sent[1][1]["final"]
+
+
+def test_walk_runs_off_the_dispatch_thread(monkeypatch, tree):
+    release = threading.Event()
+    monkeypatch.setattr(info_io, "send_pages", lambda walk, send, *args: release.wait(5) and send({"final": True}))
+    plugin = info_io.PluginInfoIO(logger=MagicMock(), client=MagicMock())
+    message = MagicMock()
+    message.topic = "steward/test"
+    message.payload = b"{}"
+
+    # the handler returns while the walk is still going
+    plugin.on_dir_walk(StewardEvent(EventType.COMMAND, "DIR_WALK", payload={"path": str(tree)}), message)
+    assert not plugin.mqtt_client.publish_event.called
+
+    release.set()
+    plugin.unload()
+    plugin._listing_pool.shutdown(wait=True)
+    assert plugin.mqtt_client.publish_event.call_args[0][1].payload["final"]
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    broker = LoopbackBroker(encode=True)
+    server = StewardServer(transport=broker)
+    server_thread = threading.Thread(target=server.connect, daemon=True)
+    server_thread.start()
+
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    yield client
+
+    client.disconnect()
+    server.disconnect()
+    server_thread.join(5)
+
+
+def test_list_and_walk(client, tree):
+    listing = client.list_directory(str(tree), page_size=2)
+    assert paths(listing) == ["README.md", "build", "link", "src"]
+    assert listing.count == 4 and not client.listings
+
+    listing = client.walk_directory(str(tree), include="*.py", page_size=1)
+    assert paths(listing) == ["src/main.py", "src/pkg/util.py"]
+
+
+def test_list_missing_directory(client, tree):
+    with pytest.raises(ListingFailed, match="File not found"):
+        client.list_directory(str(tree / "missing"), idle_timeout=10).entries()
+
+    with pytest.raises(ListingFailed, match="Not a directory"):
+        client.walk_directory(str(tree / "README.md"), idle_timeout=10).entries()
@@ -0,0 +1,99 @@
+import json
+import pytest
+from steward.event import StewardEvent, LazyStewardEvent, EventType
+from steward.codecs import BinaryCodec, JSONCodec, BINARY_FORMAT, choose_codec, codec_for, decode_event
+
+
+def test_json_round_trip():
+    trigger = StewardEvent(EventType.COMMAND, "FILE_READ_CONTENTS", payload={"path": "/tmp/x"})
+    event = StewardEvent(EventType.RESPONSE, "FILE_READ_CONTENTS", trigger_event=trigger, payload="line 1\nline 2")
+
+    copy = StewardEvent.fromJSON(event.toJSON())
+
+    assert copy.id == event.id
+    assert copy.timestamp == event.timestamp
+    assert copy.event_type == EventType.RESPONSE
+    assert copy.payload == "line 1\nline 2"
+    assert copy.causation_id == trigger.id
+    assert copy.correlation_id == trigger.id
+
+
+def test_chain_ids_keep_wire_size_flat():
+    root = StewardEvent(EventType.COMMAND, "PLAN_TASK", payload={"task": "x"})
+    event = root
+    sizes = []
+    for _ in range(50):
+        event = StewardEvent(EventType.COMMAND, "PLAN_TASK", trigger_event=event, payload={"task": "x"})
+        sizes.append(len(event.toJSON()))
+
+    assert event.correlation_id == root.id
+    assert max(sizes) - min(sizes) < 10
+
+
+def test_lazy_event_decodes_header_only():
+    event = StewardEvent(EventType.RESPONSE, 'ODD "NAME"', payload={"data": "x" * 1000})
+
+    lazy = LazyStewardEvent.fromJSON(event.toJSON().encode())
+
+    assert lazy.id == event.id
+    assert lazy.name == 'ODD "NAME"'
+    assert lazy.is_response
+    assert not lazy.is_decoded
+
+    assert lazy.payload == {"data": "x" * 1000}
+    assert lazy.timestamp == event.timestamp
+    assert lazy.is_decoded
+
+
+def test_lazy_event_accepts_other_key_orders():
+    envelope = json.dumps({"name": "GET_TIME", "payload": None, "event_type": "COMMAND", "triggering_event": None})
+
+    lazy = LazyStewardEvent.fromJSON(envelope)
+
+    assert lazy.name == "GET_TIME"
+    assert lazy.is_command
+    assert lazy.payload is None
+
+
+def test_binary_codec_round_trip():
+    trigger = StewardEvent(EventType.COMMAND, "FILE_READ_CONTENTS", payload={"path": "/tmp/x", "binary": True})
+    event = StewardEvent(EventType.RESPONSE, "FILE_READ_CONTENTS", trigger_event=trigger, payload=b"\x00\xff" * 100)
+
+    frame = BinaryCodec().encode(event)
+    copy = decode_event(frame)
+
+    assert frame[0] == BINARY_FORMAT
+    assert codec_for(frame).name == "binary"
+    assert (copy.id, copy.name, copy.event_type) == (event.id, event.name, EventType.RESPONSE)
+    assert not copy.is_decoded
+    assert copy.payload == b"\x00\xff" * 100
+    assert copy.timestamp == event.timestamp
+    assert copy.causation_id == trigger.id
+
+
+def test_binary_codec_rejects_names_it_cannot_frame():
+    longest = "N" * 0xFFFE
+    assert decode_event(BinaryCodec().encode(StewardEvent(EventType.NOTICE, longest))).name == longest
+
+    # 0xFFFF is the marker for None
+    with pytest.raises(ValueError, match="name is too long"):
+        BinaryCodec().encode(StewardEvent(EventType.NOTICE, "N" * 0xFFFF))
+    with pytest.raises(ValueError, match="causation_id is too long"):
+        BinaryCodec().encode(StewardEvent(EventType.NOTICE, "PING", causation_id="x" * 70000))
+
+
+def test_nested_bytes_survive_both_codecs():
+    payload = {"path": "/tmp/x", "chunks": [b"abc", b"\x00"], "text": "café"}
+    event = StewardEvent(EventType.RESPONSE, "FILE_READ_CONTENTS", payload=payload)
+
+    for codec in (JSONCodec(), BinaryCodec()):
+        assert decode_event(codec.encode(event)).payload == payload
+
+
+def test_choose_codec(monkeypatch):
+    monkeypatch.setenv("STEWARD_CODECS", "json")
+    assert choose_codec(["binary", "json"]).name == "json"
+
+    monkeypatch.setenv("STEWARD_CODECS", "binary,json")
+    assert choose_codec(["binary", "json"]).name == "binary"
+    assert choose_codec(None).name == "json"
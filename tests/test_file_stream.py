@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+import pytest
+
+from steward.clients.file_stream import StreamFailed
+from steward.event import StewardEvent, EventType
+from steward.plugins.info_io.streams import FileStreams
+from steward.replay import ReplayClient
+from steward.server import StewardServer
+from steward.transport import LoopbackBroker
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def client():
+    # encoded, so the chunks go through the codecs as they would over MQTT
+    broker = LoopbackBroker(encode=True)
+    server = StewardServer(transport=broker)
+    server_thread = threading.Thread(target=server.connect, daemon=True)
+    server_thread.start()
+
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    yield client
+
+    client.disconnect()
+    server.disconnect()
+    server_thread.join(5)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(os.urandom(300 * 1024 + 123))
+    return path
+
+
+def test_stream_file(client, source, tmp_path):
+    destination = tmp_path / "copy.bin"
+    result = client.read_file_stream(str(source), str(destination), chunk_size=16 * 1024, window=4).result(10)
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert result["received"] == result["size"] == source.stat().st_size
+    assert not client.streams
+
+
+def test_resume_stream(client, source, tmp_path):
+    destination = tmp_path / "copy.bin"
+    destination.write_bytes(source.read_bytes()[:100000])
+
+    result = client.read_file_stream(str(source), str(destination), resume=True, chunk_size=16 * 1024).result(10)
+
+    assert result["received"] == source.stat().st_size - 100000
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_stream_missing_file(client, tmp_path):
+    receiver = client.read_file_stream(str(tmp_path / "missing.bin"), str(tmp_path / "copy.bin"))
+    with pytest.raises(StreamFailed, match="Permission denied|File not found"):
+        receiver.result(10)
+
+
+def test_server_waits_for_acknowledgements(source):
+    sent = []
+    streams = FileStreams(lambda topic, event, codec: sent.append(event), chunk_size=1024, window=3)
+    request = StewardEvent(EventType.COMMAND, "FILE_READ_STREAM", payload={"path": str(source)})
+
+    stream = streams.open(request, "steward/a", None)
+    assert [event.payload["seq"] for event in sent] == [0, 1, 2]
+
+    # nothing more until the client has written some of them
+    streams.pump(stream)
+    assert len(sent) == 3
+
+    streams.ack(request.id, 1)
+    assert [event.payload["seq"] for event in sent] == [0, 1, 2, 3, 4]
+    assert all(event.causation_id == request.id for event in sent)
+
+    streams.cancel(request.id)
+    assert len(streams) == 0 and stream.finished
+
+
+def test_server_streams_to_the_end(source):
+    sent = []
+    streams = FileStreams(lambda topic, event, codec: sent.append(event), chunk_size=64 * 1024, window=2)
+    request = StewardEvent(EventType.COMMAND, "FILE_READ_STREAM", payload={"path": str(source), "offset": 1000})
+    streams.open(request, "steward/a", None)
+
+    while not sent[-1].payload["final"]:
+        streams.ack(request.id, sent[-1].payload["seq"])
+
+    data = b"".join(event.payload["data"] for event in sent)
+    assert data == source.read_bytes()[1000:]
+    assert len(streams) == 0
+
+
+def test_abandoned_stream_expires(source):
+    sent = []
+    streams = FileStreams(lambda topic, event, codec: sent.append(event), chunk_size=1024, window=2, idle_timeout=0.1)
+    request = StewardEvent(EventType.COMMAND, "FILE_READ_STREAM", payload={"path": str(source)})
+    stream = streams.open(request, "steward/a", None)
+
+    # never acknowledged, and no other stream is opened
+    for _ in range(100):
+        if streams._reaper is None:
+            break
+        time.sleep(0.02)
+    assert stream.finished and len(streams) == 0
+    assert streams._reaper is None
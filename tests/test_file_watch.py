@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+import pytest
+
+from steward.plugins.info_io.watch import FileWatcher, InotifyBackend, coalesce, CREATED, DELETED, MODIFIED
+from steward.event import StewardEvent, EventType
+from steward.replay import ReplayClient
+from steward.server import StewardServer
+from steward.transport import LoopbackBroker
+
+BACKENDS = ["poll"] + (["inotify"] if InotifyBackend.load_libc() else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def watcher(request):
+    notices = queue.Queue()
+    watcher = FileWatcher(lambda topic, event, codec: notices.put(event), backend=request.param,
+                          debounce=0.1, max_delay=1.0, poll_interval=0.05)
+    watcher.notices = notices
+    yield watcher
+    watcher.close_all()
+
+
+def watch(watcher, path):
+    request = StewardEvent(EventType.COMMAND, "FILE_WATCH", payload={"path": str(path)})
+    return watcher.watch(request, "steward/a", None)
+
+
+def received(watcher, count, timeout=5):
+    notices = [watcher.notices.get(timeout=timeout) for _ in range(count)]
+    # nothing else follows once the changes have settled
+    time.sleep(0.3)
+    assert watcher.notices.empty()
+    return sorted((notice.name, notice.payload["path"]) for notice in notices)
+
+
+def test_coalesce():
+    assert coalesce(CREATED, MODIFIED) == CREATED
+    assert coalesce(CREATED, DELETED) is None
+    assert coalesce(DELETED, CREATED) == MODIFIED
+    assert coalesce(MODIFIED, MODIFIED) == MODIFIED
+
+
+def test_watch_directory(watcher, tmp_path):
+    existing = tmp_path / "existing.txt"
+    existing.write_text("old")
+    watched = watch(watcher, tmp_path)
+
+    new = tmp_path / "new.txt"
+    with open(new, "w") as f:
+        for _ in range(20):
+            f.write("x" * 100)
+            f.flush()
+    existing.unlink()
+
+    assert received(watcher, 2) == [("FILE_CREATED", str(new)), ("FILE_DELETED", str(existing))]
+    assert watcher.unwatch(watched.id) and not watcher.unwatch(watched.id)
+
+
+def test_burst_is_one_notice(watcher, tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text("")
+    watch(watcher, path)
+    time.sleep(0.1)
+
+    for n in range(10):
+        with open(path, "a") as f:
+            f.write(f"line {n}\n")
+        time.sleep(0.01)
+
+    notice = watcher.notices.get(timeout=5)
+    assert notice.name == "FILE_MODIFIED" and notice.payload["path"] == str(path)
+    time.sleep(0.3)
+    assert watcher.notices.empty()
+
+
+def test_temporary_file_is_not_reported(watcher, tmp_path):
+    watch(watcher, tmp_path)
+    # both polling and inotify see nothing, or a create and delete that cancel out
+    (tmp_path / "tmp").write_text("x")
+    (tmp_path / "tmp").unlink()
+    (tmp_path / "kept").write_text("x")
+
+    assert received(watcher, 1) == [("FILE_CREATED", str(tmp_path / "kept"))]
+
+
+def test_watched_file_deleted_ends_watch(watcher, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("x")
+    watched = watch(watcher, path)
+
+    path.unlink()
+    notice = watcher.notices.get(timeout=5)
+    assert notice.name == "FILE_DELETED" and notice.payload["ended"]
+    assert notice.causation_id == watched.id
+    assert len(watcher) == 0
+
+
+def test_watch_missing_path(watcher, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        watch(watcher, tmp_path / "missing")
+
+
+@pytest.fixture
+def broker():
+    return LoopbackBroker(encode=True)
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path, broker):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STEWARD_WATCH_DEBOUNCE", "0.05")
+    monkeypatch.setenv("STEWARD_WATCH_POLL_INTERVAL", "0.05")
+    server = StewardServer(transport=broker)
+    server_thread = threading.Thread(target=server.connect, daemon=True)
+    server_thread.start()
+    yield server
+
+    server.disconnect()
+    server_thread.join(5)
+
+
+@pytest.fixture
+def client(server, broker):
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    yield client
+    client.disconnect()
+
+
+def test_watch_through_server(client, tmp_path):
+    watched = tmp_path / "watched"
+    watched.mkdir()
+    notices = queue.Queue()
+
+    response = client.watch_path(str(watched), lambda name, payload: notices.put((name, payload))).result(10)
+    assert response.is_response
+    watch_id = response.payload["watch_id"]
+
+    (watched / "a.txt").write_text("a")
+    name, payload = notices.get(timeout=10)
+    assert name == "FILE_CREATED" and payload["path"] == str(watched / "a.txt") and payload["watch_id"] == watch_id
+
+    assert client.unwatch_path(watch_id).result(10).is_response
+    assert client.unwatch_path(watch_id).result(10).is_error
+    assert client.watch_path(str(tmp_path / "missing"), print).result(10).payload == "File not found"
+
+
+def test_client_stop_ends_its_watches(server, broker, tmp_path):
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    assert client.watch_path(str(tmp_path), print).result(10).is_response
+
+    watcher = server.plugin_manager.plugins["info_io"].watcher
+    assert [watch.topic for watch in watcher.watches.values()] == [client.client_topic]
+
+    client.disconnect()
+    deadline = time.monotonic() + 5
+    while watcher.watches and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not [watch for watch in watcher.watches.values() if watch.topic == client.client_topic]
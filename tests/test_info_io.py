@@ -0,0 +1,169 @@
+import hashlib
+import os
+import pytest
+from unittest.mock import MagicMock
+
+from steward.event import StewardEvent, EventType
+from steward.plugins.info_io.batch import dependencies
+from steward.plugins.info_io.main import PluginInfoIO
+from steward.plugins.info_io.ranges import LineIndex, HashCache, RangeError, read_range
+
+
+@pytest.fixture
+def plugin():
+    return PluginInfoIO(logger=MagicMock(), client=MagicMock())
+
+
+def call(plugin, handler, name, payload):
+    """
+    Run a handler for a COMMAND and return the event it answered with.
+    """
+    message = MagicMock()
+    message.topic = "steward/test"
+    message.payload = b"{}"
+    handler(StewardEvent(EventType.COMMAND, name, payload=payload), message)
+
+    topic, response, _ = plugin.mqtt_client.publish_event.call_args[0]
+    assert topic == "steward/test"
+    return response
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"line {n}\n" for n in range(1, 101)))
+    return path
+
+
+def test_read_byte_range(log_file):
+    data, details = read_range(str(log_file), LineIndex(), offset=7, length=6)
+    assert data == b"line 2"
+    assert details["offset"] == 7 and details["length"] == 6 and not details["truncated"]
+
+    data, _ = read_range(str(log_file), LineIndex(), offset=-9)
+    assert data == b"line 100\n"
+
+
+def test_read_line_range(log_file):
+    index = LineIndex()
+    data, details = read_range(str(log_file), index, start_line=10, end_line=12)
+    assert data == b"line 10\nline 11\nline 12\n"
+    assert details["lines"] == 100
+
+    data, details = read_range(str(log_file), index, start_line=-2)
+    assert data == b"line 99\nline 100\n" and details["start_line"] == 99
+
+    with pytest.raises(RangeError):
+        read_range(str(log_file), index, start_line=5, end_line=4)
+
+
+def test_line_index_follows_appends(log_file):
+    index = LineIndex()
+    read_range(str(log_file), index, start_line=1, end_line=1)
+    first = index._cache.get(os.path.realpath(log_file))
+
+    with open(log_file, "a") as f:
+        f.write("line 101\nline 1")
+    data, details = read_range(str(log_file), index, start_line=-2)
+
+    assert data == b"line 101\nline 1" and details["lines"] == 102
+    assert list(index._cache.get(os.path.realpath(log_file)).starts[:101]) == list(first.starts)
+
+    # rewritten from scratch: indexed again
+    log_file.write_text("a\nb\n")
+    data, details = read_range(str(log_file), index, start_line=2)
+    assert data == b"b\n" and details["lines"] == 2
+
+
+def test_read_range_truncates(log_file):
+    data, details = read_range(str(log_file), LineIndex(), max_bytes=10)
+    assert len(data) == 10 and details["truncated"]
+
+
+def test_hash_cache(log_file, tmp_path):
+    hashes = HashCache()
+    expected = hashlib.sha256(log_file.read_bytes()).hexdigest()
+
+    assert hashes.digest(str(log_file)) == (expected, log_file.stat().st_size, False)
+    assert hashes.digest(str(log_file)) == (expected, log_file.stat().st_size, True)
+
+    with open(log_file, "a") as f:
+        f.write("more\n")
+    digest, _, cached = hashes.digest(str(log_file))
+    assert digest == hashlib.sha256(log_file.read_bytes()).hexdigest() and not cached
+
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    assert hashes.digest(str(empty), "md5")[0] == hashlib.md5(b"").hexdigest()
+
+    with pytest.raises(RangeError):
+        hashes.digest(str(log_file), "nope")
+
+
+def test_range_and_hash_handlers(plugin, log_file):
+    response = call(plugin, plugin.on_file_read_range, "FILE_READ_RANGE", {"path": str(log_file), "start_line": 3, "end_line": 3})
+    assert response.is_response and response.payload["data"] == "line 3\n"
+
+    response = call(plugin, plugin.on_file_hash, "FILE_HASH", {"path": str(log_file), "algorithm": "sha1"})
+    assert response.payload["hash"] == hashlib.sha1(log_file.read_bytes()).hexdigest()
+
+    response = call(plugin, plugin.on_file_hash, "FILE_HASH", {"path": str(log_file) + ".missing"})
+    assert response.is_error
+
+
+def test_batch_dependencies(tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    operations = [
+        {"op": "mkdir", "path": a},
+        {"op": "write", "path": a + "/x", "contents": "x"},
+        {"op": "read", "path": a + "/x"},
+        {"op": "read", "path": a + "/x"},
+        {"op": "write", "path": b, "contents": "b"},
+        {"op": "move", "path": b, "new_path": a + "/b"},
+    ]
+    assert dependencies(operations) == [set(), {0}, {0, 1}, {0, 1}, set(), {0, 4}]
+
+
+def test_file_batch(plugin, tmp_path):
+    new_dir = str(tmp_path / "new")
+    operations = [
+        {"op": "mkdir", "path": new_dir},
+        {"op": "write", "path": new_dir + "/a.txt", "contents": "hello"},
+        {"op": "read", "path": new_dir + "/a.txt"},
+        {"op": "write", "path": str(tmp_path / "b.bin"), "contents": b"\x00\x01"},
+        {"op": "move", "path": str(tmp_path / "b.bin"), "new_path": new_dir + "/b.bin"},
+        {"op": "read", "path": new_dir + "/b.bin", "binary": True},
+    ]
+    response = call(plugin, plugin.on_file_batch, "FILE_BATCH", {"operations": operations})
+
+    assert response.is_response
+    assert response.payload["succeeded"] == 6 and response.payload["failed"] == 0
+    results = response.payload["results"]
+    assert [result["index"] for result in results] == list(range(6))
+    assert results[2]["result"] == "hello" and results[5]["result"] == b"\x00\x01"
+
+
+def test_file_batch_skips_dependents_of_failures(plugin, tmp_path):
+    missing = str(tmp_path / "missing")
+    operations = [
+        {"op": "write", "path": missing + "/a.txt", "contents": "a"},
+        {"op": "read", "path": missing + "/a.txt"},
+        {"op": "write", "path": str(tmp_path / "c.txt"), "contents": "c"},
+    ]
+    response = call(plugin, plugin.on_file_batch, "FILE_BATCH", {"operations": operations})
+
+    results = response.payload["results"]
+    assert results[0] == {"index": 0, "op": "write", "path": missing + "/a.txt", "ok": False, "error": "File not found"}
+    assert results[1]["error"] == "Skipped, operation 0 failed"
+    assert results[2]["ok"] and response.payload["failed"] == 2
+
+
+def test_file_batch_validation(plugin, tmp_path):
+    assert call(plugin, plugin.on_file_batch, "FILE_BATCH", {"operations": []}).payload == "No operations"
+
+    response = call(plugin, plugin.on_file_batch, "FILE_BATCH", {"operations": [{"op": "delete", "path": "x"}]})
+    assert response.is_error and response.payload == "Operation 0 is not valid"
+
+    plugin.batch_max_operations = 1
+    operations = [{"op": "read", "path": "x"}] * 2
+    assert "Too many" in call(plugin, plugin.on_file_batch, "FILE_BATCH", {"operations": operations}).payload
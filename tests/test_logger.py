@@ -0,0 +1,42 @@
+import logging
+
+from steward.logger import COLORS, ColoredFormatter, LazyPayload, get_logger, stop_listeners
+
+
+def test_colored_formatter_leaves_record_alone():
+    record = logging.LogRecord("steward", logging.ERROR, __file__, 1, "boom %s", ("now",), None)
+    formatter = ColoredFormatter('[%(levelname)s] %(message)s')
+
+    assert formatter.format(record) == f"[{COLORS['ERROR']}ERROR{COLORS['DEFAULT']}] boom now"
+    assert record.levelname == "ERROR"
+
+
+def test_lazy_payload_truncates():
+    assert str(LazyPayload(b"short", limit=10)) == "short"
+    assert str(LazyPayload(b"x" * 50, limit=10)) == "xxxxxxxxxx... (50 bytes)"
+    assert str(LazyPayload({"a": 1}, limit=100)) == "{'a': 1}"
+
+
+def test_lazy_payload_is_not_formatted_when_level_is_off(tmp_path):
+    class Explodes:
+        def __repr__(self):
+            raise AssertionError("formatted")
+
+    logger = get_logger(name="test-quiet", level="INFO", file=str(tmp_path / "quiet.log"))
+    logger.debug("MSG: %s", LazyPayload(Explodes()))
+
+
+def test_queued_logger_writes_on_listener(tmp_path):
+    logfile = tmp_path / "logs" / "queued.log"
+    logger = get_logger(name="test-queued", level="DEBUG", file=str(logfile), queued=True)
+    logger.debug("MSG: [%s] %s", "steward/a", LazyPayload(b"y" * 1000, limit=5))
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        logger.exception("failed")
+
+    stop_listeners()
+
+    text = logfile.read_text()
+    assert "MSG: [steward/a] yyyyy... (1000 bytes)" in text
+    assert "ValueError: bad" in text
@@ -0,0 +1,306 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from steward.event import StewardEvent, LazyStewardEvent, EventType
+from steward.decorators import is_event_handler
+from steward.aio import AsyncDispatchEngine
+from steward.message_agent import MessageAgent, DispatchEngine, EventCache, LaneQueue, PendingRequests, _STOP
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    # MessageAgent writes logs relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def make_message(topic, event):
+    message = MagicMock()
+    message.topic = topic
+    message.payload = event.toJSON().encode()
+    return message
+
+
+def test_inline_dispatch():
+    """
+    A pool size of 0 runs handlers on the calling thread
+    """
+    agent = MessageAgent(workers=0)
+    seen = []
+    agent.add_handler("GET_TIME", lambda event, message: seen.append(threading.current_thread()))
+
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "GET_TIME")))
+
+    assert seen == [threading.current_thread()]
+
+
+def test_per_topic_ordering():
+    """
+    Events on one topic are handled in arrival order while the network thread is not blocked
+    """
+    agent = MessageAgent(workers=4)
+    results = {}
+    done = threading.Event()
+
+    def handler(event, message):
+        time.sleep(0.001)
+        results.setdefault(message.topic, []).append(event.payload["n"])
+        if sum(len(v) for v in results.values()) == 200:
+            done.set()
+
+    agent.add_handler("COUNT", handler)
+    for n in range(50):
+        for topic in ("steward/a", "steward/b", "steward/c", "steward/d"):
+            event = StewardEvent(EventType.COMMAND, "COUNT", payload={"n": n})
+            agent.message_processor(None, None, make_message(topic, event))
+
+    assert done.wait(5)
+    agent.stop()
+    for topic, values in results.items():
+        assert values == list(range(50))
+
+
+def test_full_queue_drops_after_timeout():
+    """
+    A full worker queue blocks for the timeout and then drops the job
+    """
+    logger = MagicMock()
+    engine = DispatchEngine(workers=1, queue_size=1, full_timeout=0.05, logger=logger)
+    release = threading.Event()
+
+    assert engine.submit("steward/a", release.wait)
+    # wait for the worker to pick up the blocking job, then fill the queue
+    time.sleep(0.05)
+    assert engine.submit("steward/a", lambda: None)
+    assert not engine.submit("steward/a", lambda: None)
+    assert engine.dropped == 1
+    logger.error.assert_called_once()
+
+    release.set()
+    engine.stop()
+
+
+def test_handler_errors_are_logged():
+    logger = MagicMock()
+    agent = MessageAgent(logger=logger, workers=0)
+    agent.add_handler("BOOM", MagicMock(side_effect=ValueError("bad")))
+    ok = MagicMock()
+    agent.add_handler("BOOM", ok)
+
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "BOOM")))
+
+    ok.assert_called_once()
+    logger.exception.assert_called_once()
+
+
+def test_event_type_filter():
+    """
+    Handlers only see the event types they registered for, and unmatched events are not decoded
+    """
+    agent = MessageAgent(workers=0)
+    commands = MagicMock()
+    everything = MagicMock()
+    agent.add_handler("GET_TIME", commands, (EventType.COMMAND,))
+    agent.add_handler("GET_TIME", everything)
+
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "GET_TIME")))
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.RESPONSE, "GET_TIME")))
+
+    assert commands.call_count == 1
+    assert everything.call_count == 2
+
+
+def test_find_event_handlers_uses_decorator_filter(monkeypatch):
+    class Target:
+        @is_event_handler("GET_TIME", EventType.COMMAND)
+        def on_time(self, event, message=None):
+            pass
+
+    agent = MessageAgent(workers=0)
+    agent.find_event_handlers(Target())
+
+    assert ("GET_TIME", EventType.COMMAND) in agent.dispatch_index
+    assert ("GET_TIME", EventType.RESPONSE) not in agent.dispatch_index
+
+    decode = MagicMock()
+    monkeypatch.setattr(LazyStewardEvent, "_decode", decode)
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.RESPONSE, "GET_TIME")))
+    decode.assert_not_called()
+
+
+def test_triggering_event_resolved_from_cache():
+    agent = MessageAgent(workers=0)
+    seen = []
+    agent.add_handler("GET_TIME", lambda event, message: seen.append(event.triggering_event), (EventType.RESPONSE,))
+
+    command = StewardEvent(EventType.COMMAND, "GET_TIME")
+    agent.remember(command)
+    response = StewardEvent(EventType.RESPONSE, "GET_TIME", trigger_event=command, payload="now")
+    agent.message_processor(None, None, make_message("steward/a", response))
+
+    assert seen[0] is command
+
+
+def test_event_cache_is_bounded():
+    cache = EventCache(maxsize=2)
+    events = [StewardEvent(EventType.COMMAND, "X") for _ in range(3)]
+    for event in events:
+        cache.add(event)
+
+    assert len(cache) == 2
+    assert cache.get(events[0].id) is None
+    assert cache.get(events[2].id) is events[2]
+
+
+def test_pending_request_resolves_on_reply():
+    agent = MessageAgent(workers=0)
+    command = StewardEvent(EventType.COMMAND, "GET_TIME")
+    future = agent.pending.add(command.id, timeout=5)
+
+    # replies to other requests are ignored
+    other = StewardEvent(EventType.RESPONSE, "GET_TIME", trigger_event=StewardEvent(EventType.COMMAND, "GET_TIME"))
+    agent.message_processor(None, None, make_message("steward/a", other))
+    assert not future.done()
+
+    reply = StewardEvent(EventType.RESPONSE, "GET_TIME", trigger_event=command, payload="now")
+    agent.message_processor(None, None, make_message("steward/a", reply))
+
+    assert future.result(timeout=1).payload == "now"
+    assert future.latency is not None
+    assert command.id not in agent.pending
+
+
+def test_pending_request_expires():
+    pending = PendingRequests()
+    future = pending.add("E:missing", timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        future.result(timeout=2)
+    assert len(pending) == 0
+
+
+def test_asyncio_runtime_runs_async_and_sync_handlers():
+    """
+    Async handlers run on the loop, sync handlers on the executor
+    """
+    async def scenario():
+        agent = MessageAgent(workers=0)
+        agent.use_asyncio(asyncio.get_running_loop())
+        seen = {}
+        done = asyncio.Event()
+
+        async def async_handler(event, message):
+            await asyncio.sleep(0)
+            seen["async"] = threading.current_thread()
+
+        def sync_handler(event, message):
+            seen["sync"] = threading.current_thread()
+            agent.engine.loop.call_soon_threadsafe(done.set)
+
+        agent.add_handler("GET_TIME", async_handler)
+        agent.add_handler("GET_TIME", sync_handler)
+        agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "GET_TIME")))
+
+        await asyncio.wait_for(done.wait(), 2)
+        agent.stop()
+        return seen
+
+    seen = asyncio.run(scenario())
+
+    assert seen["async"] is threading.main_thread()
+    assert seen["sync"] is not threading.main_thread()
+
+
+def test_lane_queue_weighted_round_robin():
+    lanes = LaneQueue({EventType.COMMAND: 3, EventType.NOTICE: 1}, {})
+    for n in range(6):
+        lanes.put(("notice", n), EventType.NOTICE)
+    for n in range(6):
+        lanes.put(("command", n), EventType.COMMAND)
+
+    served = [lanes.get()[0] for _ in range(8)]
+
+    assert served == ["command"] * 3 + ["notice"] + ["command"] * 3 + ["notice"]
+
+
+def test_lane_queue_sheds_low_priority():
+    lanes = LaneQueue({EventType.COMMAND: 2}, {EventType.NOTICE: 2, EventType.COMMAND: 1}, shed={EventType.NOTICE})
+
+    assert lanes.put("a", EventType.NOTICE)
+    assert lanes.put("b", EventType.NOTICE)
+    assert not lanes.put("c", EventType.NOTICE)
+    assert lanes.put("d", EventType.COMMAND)
+    assert not lanes.put("e", EventType.COMMAND, timeout=0.01)
+
+    assert lanes.dropped[EventType.NOTICE] == 1
+    assert lanes.dropped[EventType.COMMAND] == 1
+
+    lanes.close()
+    assert [lanes.get() for _ in range(3)] == ["d", "a", "b"]
+    assert lanes.get() is _STOP
+
+
+def test_control_notices_are_not_shed(monkeypatch):
+    monkeypatch.setenv("STEWARD_LANE_LIMITS", "NOTICE=2")
+    agent = MessageAgent(workers=1)
+    busy, release, registered = threading.Event(), threading.Event(), threading.Event()
+    agent.add_handler("PING", lambda *args: busy.set() or release.wait(5))
+    agent.add_handler("CLIENT_REGISTER", lambda *args: registered.set())
+
+    def send(name):
+        agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.NOTICE, name)))
+
+    # the worker is stuck on the first PING and the NOTICE lane fills up behind it
+    send("PING")
+    assert busy.wait(5)
+    for _ in range(3):
+        send("PING")
+    send("CLIENT_REGISTER")
+    assert agent.engine.dropped_by_type()["NOTICE"] == 1
+
+    release.set()
+    assert registered.wait(5)
+    agent.engine.stop()
+
+
+def test_asyncio_engine_uses_lanes():
+    """
+    Under asyncio, waiting jobs are also served by lane weight, and a full lane drops
+    """
+    async def scenario():
+        engine = AsyncDispatchEngine(asyncio.get_running_loop(), concurrency=1, lane_weights={EventType.COMMAND: 3, EventType.NOTICE: 1},
+                                     lane_limits={EventType.NOTICE: 6})
+        served = []
+
+        async def job(name):
+            served.append(name)
+
+        # queued before the single consumer gets to run
+        for n in range(7):
+            engine.submit("steward/a", job, "notice", lane=EventType.NOTICE)
+        for n in range(6):
+            engine.submit("steward/a", job, "command", lane=EventType.COMMAND)
+
+        while len(served) < 12:
+            await asyncio.sleep(0.01)
+        engine.stop()
+        return served, engine.dropped_by_type()
+
+    served, dropped = asyncio.run(scenario())
+
+    assert served[:8] == ["command"] * 3 + ["notice"] + ["command"] * 3 + ["notice"]
+    assert dropped["NOTICE"] == 1 and dropped["COMMAND"] == 0
+
+
+def test_lane_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("STEWARD_LANE_WEIGHTS", "COMMAND=5,notice=2")
+    monkeypatch.setenv("STEWARD_LANE_LIMITS", "NOTICE=10")
+    monkeypatch.setenv("STEWARD_LANE_SHED", "NOTICE,RESPONSE")
+
+    engine = MessageAgent(workers=1).engine
+
+    assert engine.lane_weights == {EventType.COMMAND: 5, EventType.NOTICE: 2}
+    assert engine.lane_limits[EventType.NOTICE] == 10
+    assert engine.shed_lanes == {EventType.NOTICE, EventType.RESPONSE}
@@ -0,0 +1,159 @@
+import gc
+import threading
+import weakref
+import pytest
+from unittest.mock import MagicMock
+
+from steward.event import StewardEvent, EventType
+from steward.message_agent import MessageAgent
+from steward.metrics import Histogram, HandlerMetrics, BUCKET_BOUNDS
+from steward.replay import ReplayClient
+from steward.server import StewardServer
+from steward.transport import LoopbackBroker
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+def make_message(topic, event):
+    message = MagicMock()
+    message.topic = topic
+    message.payload = event.toJSON().encode()
+    return message
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.observe(0.000003)     # 3us, the 4us bucket
+    for _ in range(10):
+        histogram.observe(0.5)          # 500ms, the 2**19us bucket
+    histogram.observe(3600)             # past the last bound, counted in the last bucket
+
+    assert histogram.count == 101
+    assert histogram.percentile(0.5) == BUCKET_BOUNDS[2]
+    assert histogram.percentile(0.95) == BUCKET_BOUNDS[19]
+    assert histogram.percentile(1.0) == BUCKET_BOUNDS[-1]
+    assert Histogram().percentile(0.5) is None
+
+
+def test_agent_records_each_handler():
+    agent = MessageAgent(workers=0, metrics=True)
+
+    class Plugin:
+        def read(self, event, message):
+            return event.payload["n"]
+
+        def header_only(self, event, message):
+            pass
+
+        def broken(self, event, message):
+            raise ValueError("broken")
+
+    plugin = Plugin()
+    agent.add_handler("COUNT", plugin.read)
+    agent.add_handler("COUNT", plugin.header_only)
+    agent.add_handler("COUNT", plugin.broken)
+    for n in range(5):
+        agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "COUNT", payload={"n": n})))
+
+    rows = {row["handler"]: row for row in agent.metrics.snapshot()["handlers"]}
+    assert set(rows) == {"Plugin.read", "Plugin.header_only", "Plugin.broken"}
+    assert all(row["count"] == 5 and row["event"] == "COUNT" for row in rows.values())
+    assert rows["Plugin.broken"]["errors"] == 5 and rows["Plugin.read"]["errors"] == 0
+    assert rows["Plugin.read"]["execution"]["count"] == 5
+
+    # only the handler that read the payload paid for decoding it
+    stats = {name: stats for (_, name), stats in agent.metrics.merged().items()}
+    assert stats["Plugin.read"].decode.total > stats["Plugin.header_only"].decode.total
+
+
+def test_metrics_per_thread_are_merged():
+    metrics = HandlerMetrics()
+
+    def handler(event, message):
+        pass
+
+    threads = [threading.Thread(target=lambda: [metrics.record("E", handler, 0.001, 0.0, 0.002) for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (row,) = metrics.snapshot()["handlers"]
+    assert row["count"] == 4000 and row["queue_wait"]["count"] == 4000
+
+    metrics.reset()
+    assert metrics.snapshot()["handlers"] == []
+
+
+def test_replaced_plugin_is_not_kept_alive():
+    class Plugin:
+        def on_count(self, event, message):
+            pass
+
+    metrics = HandlerMetrics()
+    old = Plugin()
+    metrics.record("COUNT", old.on_count, 0.001, 0.0, 0.002)
+    gone = weakref.ref(old)
+
+    # a reload replaces the instance
+    del old
+    metrics.record("COUNT", Plugin().on_count, 0.001, 0.0, 0.002)
+    gc.collect()
+
+    assert gone() is None
+    (row,) = metrics.snapshot()["handlers"]
+    assert row["handler"] == "Plugin.on_count" and row["count"] == 2
+
+
+def test_metrics_disabled(monkeypatch):
+    monkeypatch.setenv("STEWARD_METRICS", "0")
+    agent = MessageAgent(workers=0)
+    seen = []
+    agent.add_handler("GET_TIME", lambda event, message: seen.append(event))
+    agent.message_processor(None, None, make_message("steward/a", StewardEvent(EventType.COMMAND, "GET_TIME")))
+
+    assert agent.metrics is None and len(seen) == 1
+
+
+def test_prometheus_text(tmp_path):
+    metrics = HandlerMetrics()
+
+    def handler(event, message):
+        pass
+
+    metrics.record("GET_TIME", handler, 0.0001, 0.00001, 0.0003)
+    path = tmp_path / "metrics" / "steward.prom"
+    metrics.write_prometheus(str(path), extra={"steward_dispatch_dropped_total": {"NOTICE": 2}})
+
+    text = path.read_text()
+    labels = 'event="GET_TIME",handler="test_prometheus_text.<locals>.handler"'
+    assert f"steward_handler_events_total{{{labels}}} 1" in text
+    assert f'steward_handler_execution_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"steward_handler_queue_wait_seconds_count{{{labels}}} 1" in text
+    assert 'steward_dispatch_dropped_total{type="NOTICE"} 2' in text
+
+
+def test_server_answers_metrics_query():
+    broker = LoopbackBroker()
+    server = StewardServer(transport=broker)
+    server_thread = threading.Thread(target=server.connect, daemon=True)
+    server_thread.start()
+
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    try:
+        client.request("GET_TIME", timeout=5).result(5)
+        reply = client.request("STEWARD_METRICS", {"events": ["GET_TIME"]}, 5, EventType.QUERY).result(5)
+
+        assert reply.is_response and reply.payload["enabled"]
+        handlers = [row["handler"] for row in reply.payload["handlers"]]
+        assert handlers and all(row["event"] == "GET_TIME" for row in reply.payload["handlers"])
+        assert "NOTICE" in reply.payload["dropped"]
+    finally:
+        client.disconnect()
+        server.disconnect()
+        server_thread.join(5)
@@ -0,0 +1,296 @@
+import asyncio
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from steward import steward_plugins
+from steward.codecs import DEFAULT_CODEC, decode_event
+from steward.event import StewardEvent, LazyStewardEvent, EventType
+from steward.isolation import IsolatedPlugin
+from steward.message_agent import MessageAgent
+from steward.steward_plugins import StewardPlugins, PLUGINS_DIR
+
+PLUGIN_SOURCE = '''
+from steward.plugins._base_plugin import BasePlugin
+from steward.decorators import is_event_handler
+from steward.codecs import decode_event
+from steward.event import StewardEvent, EventType
+
+class PluginEcho(BasePlugin):
+    def __init__(self, logger=None, client=None):
+        super().__init__()
+        self.name = "Echo"
+        self.mqtt_client = client
+        self.seen = []
+
+    @is_event_handler("ECHO", EventType.COMMAND)
+    def on_echo(self, event, message=None):
+        self.seen.append(event.payload)
+'''
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def plugins_dir(monkeypatch, tmp_path):
+    plugin_dir = tmp_path / "plugins" / "echo_plugin"
+    plugin_dir.mkdir(parents=True)
+    (plugin_dir / "main.py").write_text(PLUGIN_SOURCE)
+    (plugin_dir / "manifest.json").write_text(json.dumps({"name": "Echo", "events": {"ECHO": ["COMMAND"]}}))
+    monkeypatch.setattr(steward_plugins, "PLUGINS_DIR", str(tmp_path / "plugins"))
+    yield plugin_dir
+    sys.modules.pop("echo_plugin", None)
+
+
+def make_message(event):
+    message = MagicMock()
+    message.topic = "steward/a"
+    message.payload = event.toJSON().encode()
+    return message
+
+
+def test_manifest_plugins_load_on_first_event(plugins_dir):
+    manager = StewardPlugins()
+    manager.scan()
+    agent = MessageAgent(workers=0)
+    manager.register_handlers(agent)
+
+    assert "echo_plugin" not in manager.plugins
+    assert ("ECHO", EventType.COMMAND) in agent.dispatch_index
+    assert ("ECHO", EventType.RESPONSE) not in agent.dispatch_index
+
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO", payload="one")))
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO", payload="two")))
+
+    plugin = manager.plugins["echo_plugin"]
+    assert plugin.seen == ["one", "two"]
+    # the stub has been replaced by the plugin's own handler
+    handlers = agent.dispatch_index[("ECHO", EventType.COMMAND)]
+    assert [handler.__self__ for handler in handlers] == [plugin]
+    assert plugins_dir.as_posix() not in sys.path
+
+
+def test_plugins_without_manifest_load_at_scan(plugins_dir):
+    (plugins_dir / "manifest.json").unlink()
+
+    manager = StewardPlugins()
+    manager.scan()
+
+    assert "echo_plugin" in manager.plugins
+    assert not manager.stubs
+
+
+ASYNC_SOURCE = PLUGIN_SOURCE.replace("def on_echo", "async def on_echo").replace(
+    "self.seen.append(event.payload)", "await asyncio.sleep(0)\n        self.seen.append(event.payload)").replace(
+    "from steward.plugins", "import asyncio\nfrom steward.plugins", 1)
+
+
+@pytest.mark.parametrize("runtime", ["threads", "asyncio"])
+def test_manifest_plugin_with_async_handler(plugins_dir, runtime):
+    """
+    The event that loads a plugin is handled even when its handler is async
+    """
+    (plugins_dir / "main.py").write_text(ASYNC_SOURCE)
+    manager = StewardPlugins()
+    manager.scan()
+    messages = [make_message(StewardEvent(EventType.COMMAND, "ECHO", payload=payload)) for payload in ("one", "two")]
+
+    if runtime == "threads":
+        agent = MessageAgent(workers=0)
+        manager.register_handlers(agent)
+        for message in messages:
+            agent.message_processor(None, None, message)
+    else:
+        async def scenario():
+            agent = MessageAgent(workers=0)
+            agent.use_asyncio(asyncio.get_running_loop())
+            manager.register_handlers(agent)
+            for count, message in enumerate(messages, 1):
+                agent.message_processor(None, None, message)
+                # one at a time, so the second event finds the plugin loaded
+                for _ in range(200):
+                    plugin = manager.plugins.get("echo_plugin")
+                    if plugin and len(plugin.seen) == count:
+                        break
+                    await asyncio.sleep(0.01)
+            agent.stop()
+        asyncio.run(scenario())
+
+    assert manager.plugins["echo_plugin"].seen == ["one", "two"]
+
+
+@pytest.mark.parametrize("plugin_name", sorted(
+    item for item in os.listdir(PLUGINS_DIR)
+    if not item.startswith("_") and os.path.isfile(os.path.join(PLUGINS_DIR, item, "manifest.json"))
+))
+def test_manifest_matches_handlers(plugin_name):
+    """
+    Every bundled manifest lists exactly the events its plugin handles
+    """
+    plugin_dir = os.path.join(PLUGINS_DIR, plugin_name)
+    with open(os.path.join(plugin_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    spec = importlib.util.spec_from_file_location(f"manifest_check_{plugin_name}", os.path.join(plugin_dir, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    declared = {}
+    for _, cls in inspect.getmembers(module, inspect.isclass):
+        if cls.__module__ != module.__name__:
+            continue
+        for _, attr in inspect.getmembers(cls, callable):
+            if getattr(attr, "handles_event", None):
+                types = getattr(attr, "handles_event_types", None)
+                declared[attr.handles_event] = sorted(event_type.name for event_type in types) if types else []
+
+    assert {name: sorted(types) for name, types in manifest["events"].items()} == declared
+
+
+ISOLATED_SOURCE = '''
+import os
+from steward.plugins._base_plugin import BasePlugin
+from steward.decorators import is_event_handler
+from steward.codecs import decode_event
+from steward.event import StewardEvent, EventType
+
+class PluginPid(BasePlugin):
+    def __init__(self, logger=None, client=None):
+        super().__init__()
+        self.name = "Pid"
+        self.mqtt_client = client
+
+    @is_event_handler("PID", EventType.QUERY)
+    def on_pid(self, event, message=None):
+        self.send_response_event(message, StewardEvent(EventType.RESPONSE, "PID", trigger_event=event, payload=os.getpid()))
+
+    @is_event_handler("CRASH", EventType.COMMAND)
+    def on_crash(self, event, message=None):
+        os._exit(3)
+'''
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_isolated_plugin_runs_in_worker_and_restarts(monkeypatch, tmp_path):
+    plugin_dir = tmp_path / "plugins" / "pid_plugin"
+    plugin_dir.mkdir(parents=True)
+    (plugin_dir / "main.py").write_text(ISOLATED_SOURCE)
+    (plugin_dir / "manifest.json").write_text(json.dumps({"isolated": True, "events": {"PID": ["QUERY"], "CRASH": ["COMMAND"]}}))
+    monkeypatch.setattr(steward_plugins, "PLUGINS_DIR", str(tmp_path / "plugins"))
+
+    client = MagicMock()
+    manager = StewardPlugins(client=client)
+    manager.scan()
+    agent = MessageAgent(workers=0)
+    manager.register_handlers(agent)
+    assert "pid_plugin" in manager.isolated and not manager.plugins
+
+    def ask_pid():
+        client.publish.reset_mock()
+        query = StewardEvent(EventType.QUERY, "PID")
+        agent.message_processor(None, None, make_message(query))
+        wait_for(lambda: client.publish.called)
+        topic, payload = client.publish.call_args.args
+        reply = decode_event(payload)
+        assert (topic, reply.name, reply.causation_id) == ("steward/a", "PID", query.id)
+        return reply.payload
+
+    try:
+        first = ask_pid()
+        assert first != os.getpid()
+
+        worker = manager.isolated["pid_plugin"].workers[0]
+        agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "CRASH")))
+        wait_for(lambda: worker.restarts == 1)
+
+        assert ask_pid() not in (first, os.getpid())
+    finally:
+        manager.stop()
+
+
+def test_isolated_plugin_forwards_frames_undecoded(monkeypatch, tmp_path):
+    """
+    Events go to the worker as the frames they arrived in, without decoding their payload
+    """
+    plugin = IsolatedPlugin(StewardPlugins(), "pid_plugin", str(tmp_path), {"events": {"PID": ["QUERY"]}})
+    plugin.running = True
+    worker = plugin.workers[0] = MagicMock()
+    agent = MessageAgent(workers=0)
+    plugin.register(agent)
+
+    frames = [DEFAULT_CODEC.encode(StewardEvent(EventType.QUERY, "PID", payload={"n": n})) for n in range(2)]
+    message = MagicMock(topic="steward/a", payload=DEFAULT_CODEC.encode_batch(frames))
+    monkeypatch.setattr(LazyStewardEvent, "_decode", MagicMock(side_effect=AssertionError("payload decoded")))
+    agent.message_processor(None, None, message)
+
+    assert [call.args for call in worker.send.call_args_list] == [("steward/a", frame) for frame in frames]
+
+
+def test_changed_plugin_is_reloaded(plugins_dir):
+    (plugins_dir / "manifest.json").unlink()
+    (plugins_dir / "helper.py").write_text("TAG = 'v1'\n")
+    (plugins_dir / "main.py").write_text("from helper import TAG\n" + PLUGIN_SOURCE.replace("self.seen.append(event.payload)", "self.seen.append(TAG)"))
+
+    manager = StewardPlugins()
+    manager.scan()
+    agent = MessageAgent(workers=0)
+    manager.register_handlers(agent)
+    manager._fingerprints = manager.fingerprints()
+
+    old = manager.plugins["echo_plugin"]
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO")))
+    assert old.seen == ["v1"]
+
+    (plugins_dir / "helper.py").write_text("TAG = 'v2.0'\n")
+    assert manager.check_for_changes() == ["echo_plugin"]
+    assert manager.check_for_changes() == []
+
+    new = manager.plugins["echo_plugin"]
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO")))
+    assert new is not old and new.seen == ["v2.0"] and old.seen == ["v1"]
+    assert [handler.__self__ for handler in agent.dispatch_index[("ECHO", EventType.COMMAND)]] == [new]
+    assert str(plugins_dir) not in sys.path
+    sys.modules.pop("helper", None)
+
+
+def test_broken_reload_keeps_running_plugin(plugins_dir):
+    (plugins_dir / "manifest.json").unlink()
+    manager = StewardPlugins()
+    manager.scan()
+    agent = MessageAgent(workers=0)
+    manager.register_handlers(agent)
+    manager._fingerprints = manager.fingerprints()
+    old = manager.plugins["echo_plugin"]
+
+    (plugins_dir / "main.py").write_text(PLUGIN_SOURCE + "\nthis is not python\n")
+    assert manager.check_for_changes() == []
+
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO", payload="still here")))
+    assert manager.plugins["echo_plugin"] is old and old.seen == ["still here"]
+
+
+def test_reloaded_manifest_plugin_is_lazy_again(plugins_dir):
+    manager = StewardPlugins()
+    manager.scan()
+    agent = MessageAgent(workers=0)
+    manager.register_handlers(agent)
+    agent.message_processor(None, None, make_message(StewardEvent(EventType.COMMAND, "ECHO", payload="one")))
+    assert "echo_plugin" in manager.plugins
+
+    assert manager.reload_plugin("echo_plugin")
+    assert "echo_plugin" not in manager.plugins
+    assert [handler.__self__ for handler in agent.dispatch_index[("ECHO", EventType.COMMAND)]] == [manager.stubs["echo_plugin"]]
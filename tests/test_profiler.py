@@ -0,0 +1,45 @@
+import json
+import sys
+
+from steward.profiler import BootProfiler
+
+
+def test_phases_nest_and_count_imports(tmp_path, monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    profiler = BootProfiler()
+
+    with profiler.phase("outer"):
+        with profiler.phase("load_plugin", plugin="demo"):
+            import colorsys  # noqa: F401
+
+    report = profiler.report()
+    outer, inner = report["phases"]
+    assert (outer["phase"], outer["depth"]) == ("outer", 0)
+    assert (inner["phase"], inner["depth"], inner["plugin"]) == ("load_plugin", 1, "demo")
+    assert inner["new_modules"] >= 1
+    assert outer["wall_ms"] >= inner["wall_ms"]
+
+    path = tmp_path / "profile" / "boot.json"
+    profiler.write(str(path))
+    assert json.loads(path.read_text())["phases"][1]["plugin"] == "demo"
+
+
+def test_enabled_from_env(monkeypatch):
+    profiler = BootProfiler()
+    monkeypatch.delenv("STEWARD_BOOT_PROFILE", raising=False)
+    assert not profiler.enabled
+    monkeypatch.setenv("STEWARD_BOOT_PROFILE", "1")
+    assert profiler.enabled
+
+
+def test_nothing_recorded_after_finish():
+    profiler = BootProfiler()
+    with profiler.phase("boot"):
+        pass
+    profiler.finish()
+    elapsed = profiler.report()["elapsed_ms"]
+
+    with profiler.phase("find_event_handlers", target="Client"):
+        pass
+    assert [record["phase"] for record in profiler.report()["phases"]] == ["boot"]
+    assert profiler.report()["elapsed_ms"] == elapsed
@@ -0,0 +1,109 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from steward.codecs import BinaryCodec, JSONCodec, decode_events
+from steward.event import StewardEvent, EventType
+from steward.message_agent import MessageAgent
+from steward.publisher import BatchingPublisher
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_disabled_publishes_immediately():
+    client = MagicMock()
+    publisher = BatchingPublisher(client, window_ms=0)
+
+    publisher.publish_event("steward/a", StewardEvent(EventType.RESPONSE, "GET_TIME"))
+
+    client.publish.assert_called_once()
+
+
+@pytest.mark.parametrize("codec", [JSONCodec(), BinaryCodec()])
+def test_events_coalesce_into_one_batch(codec):
+    client = MagicMock()
+    publisher = BatchingPublisher(client, window_ms=50, max_events=100)
+    events = [StewardEvent(EventType.RESPONSE, "FILE_READ_CONTENTS", payload={"n": n, "text": "a,\nb"}) for n in range(10)]
+
+    for event in events:
+        publisher.publish_event("steward/a", event, codec)
+    assert client.publish.call_count == 0
+
+    time.sleep(0.2)
+    client.publish.assert_called_once()
+    topic, payload = client.publish.call_args[0]
+    assert topic == "steward/a"
+    assert [event.payload["n"] for event in decode_events(payload)] == list(range(10))
+    publisher.stop()
+
+
+def test_size_limit_and_exclusions():
+    client = MagicMock()
+    publisher = BatchingPublisher(client, window_ms=10000, max_events=3, exclude=["GET_TIME"])
+
+    publisher.publish_event("steward/a", StewardEvent(EventType.RESPONSE, "GET_TIME"))
+    assert client.publish.call_count == 1
+
+    for _ in range(3):
+        publisher.publish_event("steward/a", StewardEvent(EventType.NOTICE, "CLIENT_REGISTER"))
+    assert client.publish.call_count == 2
+    assert publisher.events_batched == 3
+
+
+def test_message_agent_unpacks_batches():
+    agent = MessageAgent(workers=0)
+    handler = MagicMock()
+    agent.add_handler("COUNT", handler)
+    codec = BinaryCodec()
+    frames = [codec.encode(StewardEvent(EventType.NOTICE, "COUNT", payload=n)) for n in range(5)]
+
+    message = MagicMock()
+    message.topic = "steward/a"
+    message.payload = codec.encode_batch(frames)
+    agent.message_processor(None, None, message)
+
+    assert [call.args[0].payload for call in handler.call_args_list] == [0, 1, 2, 3, 4]
+
+
+def test_stop_sends_the_open_batch_and_later_events_directly():
+    client = MagicMock()
+    publisher = BatchingPublisher(client, window_ms=10000, max_events=100)
+
+    for n in range(1, 4):
+        publisher.publish_event("steward/a", StewardEvent(EventType.NOTICE, "COUNT", payload=n))
+    assert client.publish.call_count == 0
+
+    publisher.stop()
+    client.publish.assert_called_once()
+    assert [event.payload for event in decode_events(client.publish.call_args[0][1])] == [1, 2, 3]
+
+    publisher.publish_event("steward/a", StewardEvent(EventType.NOTICE, "COUNT", payload=4))
+    assert client.publish.call_count == 2
+    assert [event.payload for event in decode_events(client.publish.call_args[0][1])] == [4]
+    assert not publisher._batches
+
+
+def test_full_batch_waits_for_the_one_being_sent():
+    sent = []
+
+    def slow_publish(topic, payload):
+        events = decode_events(payload)
+        if events[0].payload == 1:
+            # the flusher is still sending the first batch when the second one fills up
+            time.sleep(0.2)
+        sent.append([event.payload for event in events])
+
+    client = MagicMock()
+    client.publish.side_effect = slow_publish
+    publisher = BatchingPublisher(client, window_ms=20, max_events=3)
+
+    publisher.publish_event("steward/a", StewardEvent(EventType.NOTICE, "COUNT", payload=1))
+    time.sleep(0.1)
+    for n in range(2, 5):
+        publisher.publish_event("steward/a", StewardEvent(EventType.NOTICE, "COUNT", payload=n))
+
+    publisher.stop()
+    assert sent == [[1], [2, 3, 4]]
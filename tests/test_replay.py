@@ -0,0 +1,76 @@
+import argparse
+import time
+from concurrent.futures import Future
+
+from steward.event import StewardEvent, EventType
+from steward.journal import EventJournal
+from steward.replay import Replayer, add_arguments, percentile, skipped_names
+
+
+class FakeClient:
+    """
+    Answers every request immediately; ERROR for names starting with BAD.
+    """
+    def __init__(self):
+        self.sent = []
+
+    def request(self, name, payload=None, timeout=30, event_type=EventType.COMMAND):
+        self.sent.append((name, payload, event_type))
+        future = Future()
+        future.latency = 0.002
+        future.set_result(StewardEvent(EventType.ERROR if name.startswith("BAD") else EventType.RESPONSE, name))
+        return future
+
+
+def record_traffic(tmp_path, monkeypatch):
+    clock = [0]
+    monkeypatch.setattr("steward.journal.time.time", lambda: clock[0] / 1000)
+    journal = EventJournal(directory=str(tmp_path))
+    for n, (topic, name) in enumerate([("steward/a", "GET_TIME"), ("steward/b", "BAD_THING"), ("steward/a", "GET_TIME")]):
+        clock[0] = 1000 + n * 100
+        event = StewardEvent(EventType.COMMAND, name, payload={"n": n})
+        journal.append(topic, event, event.toJSON())
+    return journal
+
+
+def test_replay_reports_per_event(tmp_path, monkeypatch):
+    journal = record_traffic(tmp_path, monkeypatch)
+    clients = [FakeClient(), FakeClient()]
+
+    report = Replayer(clients, speed=None).run(journal.query())
+    summary = report.summary()
+
+    assert summary["sent"] == summary["completed"] == 3
+    assert summary["events"]["GET_TIME"]["ok"] == 2
+    assert summary["events"]["GET_TIME"]["p99_ms"] == 2.0
+    assert summary["events"]["BAD_THING"]["errors"] == 1
+    # each recorded topic keeps one identity
+    assert clients[0].sent == [("GET_TIME", {"n": 0}, EventType.COMMAND), ("GET_TIME", {"n": 2}, EventType.COMMAND)]
+    assert [name for name, _, _ in clients[1].sent] == ["BAD_THING"]
+
+
+def test_replay_keeps_recorded_pace(tmp_path, monkeypatch):
+    journal = record_traffic(tmp_path, monkeypatch)
+    records = list(journal.query())
+
+    start = time.perf_counter()
+    Replayer([FakeClient()], speed=2).run(records)
+    # 200ms of recorded traffic at double speed
+    assert 0.09 <= time.perf_counter() - start < 0.5
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert (percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)) == (50, 95, 99)
+    assert percentile([], 0.5) is None
+
+
+def test_writes_are_skipped_unless_asked():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+
+    skipped = skipped_names(parser.parse_args([]))
+    assert {"CLIENT_REGISTER", "FILE_WRITE_CONTENTS", "FILE_MOVE_FILE", "FILE_CREATE_DIRECTORY", "FILE_BATCH"} <= skipped
+    assert "FILE_READ_CONTENTS" not in skipped
+
+    assert skipped_names(parser.parse_args(["--include-writes", "--exclude", "GET_TIME"])) == {"GET_TIME"}
@@ -0,0 +1,69 @@
+import threading
+import pytest
+
+from steward.event import StewardEvent, EventType
+from steward.replay import ReplayClient
+from steward.server import StewardServer
+from steward.transport import LoopbackBroker, LoopbackClient, topic_matches
+
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize("topic_filter, topic, expected", [
+    ("steward/#", "steward/abc", True),
+    ("steward/#", "steward", True),
+    ("steward/#", "other/abc", False),
+    ("steward/+", "steward/abc", True),
+    ("steward/+", "steward/abc/def", False),
+    ("steward/+/def", "steward/abc/def", True),
+    ("steward/abc", "steward/abc", True),
+    ("steward/abc", "steward/abcd", False),
+])
+def test_topic_matches(topic_filter, topic, expected):
+    assert topic_matches(topic_filter, topic) is expected
+
+
+def test_loopback_delivers_objects_in_order():
+    broker = LoopbackBroker()
+    received = []
+    done = threading.Event()
+
+    subscriber = LoopbackClient("sub", broker=broker)
+    subscriber.on_message = lambda client, userdata, message: (received.append((message.topic, message.payload)), len(received) == 3 and done.set())
+    subscriber.connect()
+    subscriber.subscribe([("steward/#", 0)])
+    subscriber.loop_start()
+
+    publisher = LoopbackClient("pub", broker=broker)
+    events = [StewardEvent(EventType.NOTICE, "PING", payload=n) for n in range(3)]
+    for event in events:
+        publisher.publish("steward/a", event)
+    publisher.publish("other/a", "ignored")
+
+    assert done.wait(5)
+    assert received == [("steward/a", event) for event in events]
+    assert received[0][1] is events[0]
+
+    subscriber.disconnect()
+    subscriber.loop_stop()
+    assert broker.subscribers("steward/a") == ()
+
+
+def test_server_and_client_over_loopback():
+    broker = LoopbackBroker()
+    server = StewardServer(transport=broker)
+    server_thread = threading.Thread(target=server.connect, daemon=True)
+    server_thread.start()
+
+    client = ReplayClient(transport=broker)
+    client.connect(blocking=False)
+    try:
+        reply = client.request("GET_TIME", timeout=5).result(5)
+        assert reply.is_response and reply.name == "GET_TIME" and reply.payload
+    finally:
+        client.disconnect()
+        server.disconnect()
+        server_thread.join(5)